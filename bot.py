@@ -1,11 +1,7 @@
-import os, discord, asyncio
-from discord.ext import commands
-from games.connections import ConnectionsCommandHandler
-from games.pips import PipsCommandHandler
-from games.strands import StrandsCommandHandler
-from games.wordle import WordleCommandHandler
-from utils.bot_utilities import BotUtilities
-from utils.help_handler import HelpMenuHandler
+import os, asyncio
+
+# Spawned render workers re-import this module as __mp_main__, so it only
+# defines functions: the bot, its games and their imports are built in main().
 
 
 def load_env_file(path: str | None = None, override: bool = False) -> None:
@@ -34,39 +30,75 @@ def load_env_file(path: str | None = None, override: bool = False) -> None:
         pass
 
 
-# load .env (won't override real environment vars unless override=True)
-load_env_file()
+def create_bot():
+    """Build the bot with its utilities, help menu and game handlers."""
+    import discord
+    from discord.ext import commands
+    from games.connections import ConnectionsCommandHandler
+    from games.pips import PipsCommandHandler
+    from games.strands import StrandsCommandHandler
+    from games.wordle import WordleCommandHandler
+    from utils.bot_utilities import BotUtilities
+    from utils.help_handler import HelpMenuHandler
+
+    # parse environment variables
+    guild_id = os.getenv("GUILD_ID")
 
-# turn off logging for webdriver manager
-os.environ["WDM_LOG_LEVEL"] = "0"
+    # build Discord client
+    intents = discord.Intents.all()
+    intents.members = True
+    client = discord.Client(intents=intents)
+    activity = discord.Game(name="?help")
 
-# parse environment variables
-token = os.getenv("DISCORD_TOKEN")
-guild_id = os.getenv("GUILD_ID")
+    # set up the bot
+    bot = commands.Bot(
+        command_prefix="?", intents=intents, activity=activity, help_command=None
+    )
+    bot.guild_id = int(guild_id) if guild_id.isnumeric() else -1
+    bot.utils = BotUtilities(client, bot)
+    bot.help_menu = HelpMenuHandler()
 
-# build Discord client
-intents = discord.Intents.all()
-intents.members = True
-client = discord.Client(intents=intents)
-activity = discord.Game(name="?help")
+    # create games
+    bot.connections = ConnectionsCommandHandler(bot.utils)
+    bot.strands = StrandsCommandHandler(bot.utils)
+    bot.wordle = WordleCommandHandler(bot.utils)
+    bot.pips = PipsCommandHandler(bot.utils)
 
-# set up the bot
-bot = commands.Bot(
-    command_prefix="?", intents=intents, activity=activity, help_command=None
-)
-bot.guild_id = int(guild_id) if guild_id.isnumeric() else -1
-bot.utils = BotUtilities(client, bot)
-bot.help_menu = HelpMenuHandler()
+    # load the database when ready
+    @bot.event
+    async def on_ready():
+        try:
+            await bot.connections.connect()
+            await bot.strands.connect()
+            await bot.wordle.connect()
+            await bot.pips.connect()
+            print("Database loaded & successfully logged in.")
+        except Exception as e:
+            print(f"Failed to load database: {e}")
+        try:
+            bot.utils.index_members()
+        except Exception as e:
+            print(f"Failed to index guild members: {e}")
+        for game in [bot.connections, bot.strands, bot.wordle, bot.pips]:
+            game.start_precompute()
+        try:
+            await asyncio.to_thread(bot.utils.warm_up)
+        except Exception as e:
+            print(f"Failed to warm up Chrome drivers: {e}")
 
-# create games
-bot.connections = ConnectionsCommandHandler(bot.utils)
-bot.strands = StrandsCommandHandler(bot.utils)
-bot.wordle = WordleCommandHandler(bot.utils)
-bot.pips = PipsCommandHandler(bot.utils)
+    return bot
 
 
 # load the cogs
 async def main():
+    # load .env (won't override real environment vars unless override=True)
+    load_env_file()
+
+    # turn off logging for webdriver manager
+    os.environ["WDM_LOG_LEVEL"] = "0"
+
+    token = os.getenv("DISCORD_TOKEN")
+    bot = create_bot()
     try:
         async with bot:
             for extension in ["cogs.members", "cogs.owner"]:
@@ -77,20 +109,16 @@ async def main():
             await bot.start(token, reconnect=True)
     except asyncio.exceptions.CancelledError as e:
         print("\nCaught user exit, exiting...")
+    finally:
+        for game in [bot.connections, bot.strands, bot.wordle, bot.pips]:
+            try:
+                await game.close()
+            except Exception as e:
+                print(f"Failed to flush queued entries: {e}")
+        bot.utils.chrome_pool.close()
+        bot.utils.render_pool.close()
 
 
-# load the database when ready
-@bot.event
-async def on_ready():
-    try:
-        bot.connections.connect()
-        bot.strands.connect()
-        bot.wordle.connect()
-        bot.pips.connect()
-        print("Database loaded & successfully logged in.")
-    except Exception as e:
-        print(f"Failed to load database: {e}")
-
-
-# run the bot
-asyncio.run(main())
+# run the bot (only the parent process, render workers just import this module)
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -56,7 +56,7 @@ class MembersCog(commands.Cog, name="Normal Members Commands"):
                     first_line
                 ):
                     content = "\n".join(message.content.splitlines()[1:])
-                    if self.wordle.add_entry(user_id, first_line, content):
+                    if await self.wordle.add_entry(user_id, first_line, content):
                         if self.confirm_entries:
                             await message.add_reaction("✅")
                     else:
@@ -66,7 +66,9 @@ class MembersCog(commands.Cog, name="Normal Members Commands"):
                     and self.utils.is_connections_submission(first_two_lines)
                 ):
                     content = "\n".join(message.content.splitlines()[2:])
-                    if self.connections.add_entry(user_id, first_two_lines, content):
+                    if await self.connections.add_entry(
+                        user_id, first_two_lines, content
+                    ):
                         if self.confirm_entries:
                             await message.add_reaction("✅")
                     else:
@@ -75,14 +77,14 @@ class MembersCog(commands.Cog, name="Normal Members Commands"):
                     first_two_lines
                 ):
                     content = "\n".join(message.content.splitlines()[2:])
-                    if self.strands.add_entry(user_id, first_two_lines, content):
+                    if await self.strands.add_entry(user_id, first_two_lines, content):
                         if self.confirm_entries:
                             await message.add_reaction("✅")
                     else:
                         await message.add_reaction("❌")
                 elif "Pips" in first_line and self.utils.is_pips_submission(first_line):
                     content = "\n".join(message.content.splitlines()[1:])
-                    if self.pips.add_entry(user_id, first_line, content):
+                    if await self.pips.add_entry(user_id, first_line, content):
                         if self.confirm_entries:
                             await message.add_reaction("✅")
                     else:
@@ -101,6 +103,28 @@ class MembersCog(commands.Cog, name="Normal Members Commands"):
         else:
             await ctx.reply("Couldn't understand command. Try `?help <command>`.")
 
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member) -> None:
+        self.utils.set_member_name(member)
+
+    @commands.Cog.listener()
+    async def on_member_update(
+        self, before: discord.Member, after: discord.Member
+    ) -> None:
+        self.utils.set_member_name(after)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member) -> None:
+        self.utils.remove_member_name(member)
+
+    @commands.Cog.listener()
+    async def on_user_update(self, before: discord.User, after: discord.User) -> None:
+        # global display name changes don't fire on_member_update
+        guild = self.bot.get_guild(self.bot.guild_id)
+        member = guild.get_member(after.id) if guild is not None else None
+        if member is not None:
+            self.utils.set_member_name(member)
+
     @commands.guild_only()
     @commands.command(name="ranks", help="Show ranks of players in the server")
     async def get_ranks(self, ctx: commands.Context, *args: str) -> None:
@@ -111,6 +135,16 @@ class MembersCog(commands.Cog, name="Normal Members Commands"):
             print(f"Caught exception: {e}")
             traceback.print_exception(e)
 
+    @commands.guild_only()
+    @commands.command(name="rank", help="Show where a player ranks on today's puzzle")
+    async def get_rank(self, ctx: commands.Context, *args: str) -> None:
+        try:
+            [handler, handler_args] = self.get_command_handler_and_args(ctx, args)
+            await handler.get_rank(ctx, *handler_args)
+        except Exception as e:
+            print(f"Caught exception: {e}")
+            traceback.print_exception(e)
+
     @commands.guild_only()
     @commands.command(
         name="missing", help="Show all players missing an entry for a puzzle"
@@ -188,11 +222,17 @@ class MembersCog(commands.Cog, name="Normal Members Commands"):
             usage="`?ranks (today|weekly|10-day|all-time)`\n`?ranks <MM/DD/YYYY>`\n`?ranks <puzzle #>`",
             notes="- `?ranks` will default to `?ranks weekly`.\n- When using MM/DD/YYYY format, the date must be a Sunday. If the channel does not have the game type in its name, the command will need the game type specified as the first argument.",
         )
+        self.help_menu.add(
+            "rank",
+            explanation="See where you (or another player) rank on today's puzzle, who you're tied with and who's just ahead and behind.",
+            usage="`?rank [me|<player>]`",
+            notes="If the channel does not have the game type in its name, the command will need the game type specified as the first argument.",
+        )
         self.help_menu.add(
             "missing",
             explanation="View and mention all players who have not yet submitted a puzzle.",
-            usage="`?missing [<puzzle #>]`",
-            notes="`?missing` will default to today's puzzle. If the channel does not have the game type in its name, the command will need the game type specified as the first argument.",
+            usage="`?missing [<puzzle #>]`\n`?missing week`",
+            notes="`?missing` will default to today's puzzle. `?missing week` lists players missing any puzzle so far this week. If the channel does not have the game type in its name, the command will need the game type specified as the first argument.",
         )
         self.help_menu.add(
             "entries",
@@ -226,6 +266,13 @@ class MembersCog(commands.Cog, name="Normal Members Commands"):
             owner_only=True,
             notes="If the channel does not have the game type in its name, the command will need the game type specified as the first argument.",
         )
+        self.help_menu.add(
+            "rebuild",
+            explanation="Recompute all-time stats from every recorded entry.",
+            usage="`?rebuild`",
+            owner_only=True,
+            notes="All-time stats are kept up to date as entries are added and removed, so this is only needed if they drift (e.g. after editing the database by hand). If the channel does not have the game type in its name, the command will need the game type specified as the first argument.",
+        )
 
 
 async def setup(bot: commands.Bot):
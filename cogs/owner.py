@@ -38,6 +38,12 @@ class OwnerCog(commands.Cog, name="Owner-Only Commands"):
         [handler, handler_args] = self.get_command_handler_and_args(ctx, args)
         await handler.add_score(ctx, *handler_args)
 
+    @commands.has_permissions(administrator=True)
+    @commands.command(name="rebuild", help="Recomputes all-time stats from every entry")
+    async def rebuild_aggregates(self, ctx: commands.Context, *args: str) -> None:
+        [handler, handler_args] = self.get_command_handler_and_args(ctx, args)
+        await handler.rebuild_aggregates(ctx, *handler_args)
+
     def get_command_handler_and_args(
         self, ctx: commands.Context, args: tuple[str]
     ) -> tuple[BaseCommandHandler, tuple[str]]:
@@ -1,14 +1,90 @@
-from datetime import date
-from typing import Protocol
-from mysql.connector import MySQLConnection, connect
+import asyncio, functools, json, os, threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from enum import Enum, auto
+from typing import Any, Awaitable, Callable, Iterator, Protocol
 from mysql.connector.cursor import MySQLCursor
+from mysql.connector.errors import DataError, IntegrityError
+from data.connection_pool import ConnectionPool, PooledConnection, get_pool
+from data.entry_store import EntryStore
+from data.participation import ParticipationIndex
+from data.write_queue import QueuedEntry, WriteBehindQueue
 from utils.bot_utilities import BotUtilities
 
+# shared, bounded pool of threads that run blocking mysql-connector calls
+_db_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("DB_EXECUTOR_WORKERS", "4")),
+    thread_name_prefix="db",
+)
+
+# pasted results are acknowledged once journaled and written in batches
+_write_queue_enabled = os.environ.get("WRITE_QUEUE_ENABLED", "True").lower() in (
+    "true",
+    "1",
+    "t",
+)
+
+# read commands are answered from an in-memory copy of each entries table
+_entry_store_enabled = os.environ.get("ENTRY_STORE_ENABLED", "True").lower() in (
+    "true",
+    "1",
+    "t",
+)
+
+# missed-game and missing-player queries use in-memory participation bitsets
+_participation_index_enabled = os.environ.get(
+    "PARTICIPATION_INDEX_ENABLED", "True"
+).lower() in ("true", "1", "t")
+
+
+class EntryWriteResult(Enum):
+    INSERTED = auto()
+    UPDATED = auto()
+    UNCHANGED = auto()
+    QUEUED = auto()
+    FAILED = auto()
+
+    def __bool__(self) -> bool:
+        # anything but a failed parse/write counts as the entry being recorded
+        return self is not EntryWriteResult.FAILED
+
+
+# refresh the stored name unless the member could not be found
+_UPSERT_USER_UPDATE = (
+    "on duplicate key update name = if(values(name) = '?', name, values(name))"
+)
+_UPSERT_USER_SQL = (
+    f"insert into users (user_id, name) values (%s, %s) {_UPSERT_USER_UPDATE}"
+)
+
+# user_aggregates field counting every entry a player has
+_ENTRY_COUNT_FIELD = "entries"
+
+# (count, sum, sum of squares) of one field for one player
+Aggregate = tuple[int, int, int]
+
 
 class BaseDatabaseHandler(Protocol):
+    # entries columns read back for each entry, in PuzzleEntry argument order
+    ENTRY_COLUMNS: list[str] = []
+    ENTRY_TEXT_COLUMNS: list[str] = []
+    ENTRY_REAL_COLUMNS: list[str] = []
+    # entries rewritten per statement by _backfill_entries
+    BACKFILL_BATCH_SIZE: int = 500
+    # integer fields kept per player in user_aggregates (see _aggregate_values),
+    # and the ones also counted per value in user_histograms
+    AGGREGATE_FIELDS: list[str] = []
+    HISTOGRAM_FIELDS: list[str] = []
+
     _utils: BotUtilities
-    _db: MySQLConnection
-    _cur: MySQLCursor
+    _pool: ConnectionPool
+    _write_queue: WriteBehindQueue
+    _store: EntryStore
+    _participation: ParticipationIndex
+    data_version: int
+    archive_version: int
     _arbitrary_date: date
     _arbitrary_date_puzzle: int
     _mysql_host: str
@@ -18,61 +94,540 @@ class BaseDatabaseHandler(Protocol):
 
     def __init__(self, utils: BotUtilities) -> None:
         self._utils = utils
-        self._db = None
-        self._cur = None
+        self._pool = None
+        self._write_queue = None
+        self._store = None
+        self._participation = None
+        # bumped after every write, so derived results can tell they're stale
+        self.data_version = 0
+        # bumped only when an archived leaderboard is written or dropped
+        self.archive_version = 0
+        self._version_lock = threading.Lock()
+        # last puzzle of the newest archived leaderboard (None until read at connect)
+        self._archived_through: int = None
+        # called with the user_ids of each batch of queued entries once it's written
+        self.on_entries_written: Callable[[list[str]], Awaitable[None]] = None
 
     ####################
     # ABSTRACT METHODS #
     ####################
 
-    def add_entry(self, user_id: str, title: str, puzzle: str) -> bool:
+    def _parse_entry(self, title: str, puzzle: str) -> dict[str, Any] | None:
+        """
+        Parse a pasted result into the entries columns to write, including
+        puzzle_id. Return None if the result can't be parsed.
+        """
+        pass
+
+    def _entry_from_row(self, user_id: str, row: tuple) -> object:
+        """Build a PuzzleEntry from (puzzle_id, *ENTRY_COLUMNS)."""
+        pass
+
+    def _aggregate_values(self, entry: object) -> dict[str, int | None]:
+        """
+        The value an entry adds to each of AGGREGATE_FIELDS, or None to leave
+        it out of that field. Override for fields derived from the entry.
+        """
+        return {field: getattr(entry, field) for field in self.AGGREGATE_FIELDS}
+
+    def _stats_from_aggregates(
+        self, user_id: str, missed_games: int, aggregates: dict[str, Aggregate]
+    ) -> object:
+        """
+        Build a player's PlayerStats from their user_aggregates rows, keyed by
+        field (including the "entries" count). Override in subclasses.
+        """
         pass
 
     ####################
     #   BASE METHODS   #
     ####################
 
+    def add_entry(self, user_id: str, title: str, puzzle: str) -> EntryWriteResult:
+        row = self._parse_entry(title, puzzle)
+        if not row:
+            return EntryWriteResult.FAILED
+        return self._upsert_entry(user_id, row)
+
     def remove_entry(self, user_id: str, puzzle_id: int) -> bool:
-        if not self._db.is_connected():
-            self.connect()
-        self._cur.execute(
-            f"delete from entries where user_id = {user_id} and puzzle_id = {puzzle_id}"
-        )
-        self._db.commit()
-        return self._cur.rowcount > 0
+        with self._transaction() as tx:
+            cur = tx.cnx.cursor(buffered=True)
+            try:
+                old_rows = self.__lock_entries(cur, [(user_id, int(puzzle_id))])
+                invalidated = self.__invalidate_archive(cur, [int(puzzle_id)])
+                cur.execute(
+                    "delete from entries where user_id = %s and puzzle_id = %s",
+                    (user_id, puzzle_id),
+                )
+                removed = cur.rowcount > 0
+                aggregates, histograms = {}, {}
+                for (entry_user_id, _), old_row in old_rows.items():
+                    self.__add_aggregates(
+                        aggregates, histograms, entry_user_id, old_row, -1
+                    )
+                self.__apply_aggregates(cur, aggregates, histograms)
+            finally:
+                cur.close()
+        if self._store is not None:
+            self._store.remove(user_id, puzzle_id)
+        if self._participation is not None:
+            self._participation.remove(user_id, puzzle_id)
+        self._bump_data_version()
+        if invalidated:
+            self._bump_archive_version()
+        return removed
 
     def user_exists(self, user_id: str) -> bool:
-        if not self._db.is_connected():
-            self.connect()
-        self._cur.execute(f"select * from users where user_id = {user_id}")
-        return self._cur.rowcount > 0
+        if self._participation is not None:
+            return self._participation.has_user(user_id)
+        if self._store is not None:
+            return self._store.has_user(user_id)
+        with self._cursor() as cur:
+            cur.execute("select 1 from users where user_id = %s", (user_id,))
+            return cur.rowcount > 0
 
     def entry_exists(self, user_id: str, puzzle_id: int) -> bool:
-        if not self._db.is_connected():
-            self.connect()
-        self._cur.execute(
-            f"select * from entries where user_id = {user_id} and puzzle_id = {puzzle_id}"
-        )
-        return self._cur.rowcount > 0
+        if self._store is not None:
+            return self._store.has_entry(user_id, puzzle_id)
+        with self._cursor() as cur:
+            cur.execute(
+                "select 1 from entries where user_id = %s and puzzle_id = %s",
+                (user_id, puzzle_id),
+            )
+            return cur.rowcount > 0
 
     def connect(self) -> None:
         if not self._mysql_host:
             raise Exception("Environment variable for MySQL HOST cannot be empty/null")
 
-        self._db = connect(
-            host=self._mysql_host,
-            user=self._mysql_user,
-            password=self._mysql_pass,
-            database=self._mysql_db_name,
-        )
-        self._db.autocommit = True
-        self._cur = self._db.cursor(buffered=True)
-        self._init_tables()
+        # handlers pointing at the same server with the same credentials share a pool
+        self._pool = get_pool(self._mysql_host, self._mysql_user, self._mysql_pass)
+        with self._cursor() as cur:
+            self._init_tables(cur)
+            self.__init_aggregate_tables(cur)
+            self.__init_archive_table(cur)
+            cur.execute("select max(period_end) from leaderboard_archive")
+            self._archived_through = cur.fetchone()[0] or 0
+            cur.execute("select exists(select 1 from user_aggregates)")
+            has_aggregates = cur.fetchone()[0]
+            cur.execute("select exists(select 1 from entries)")
+            has_entries = cur.fetchone()[0]
+        if has_entries and not has_aggregates:
+            # first start since the aggregate tables were added
+            print(f"Backfilling all-time stats for {self._mysql_db_name}")
+            self.rebuild_aggregates()
 
-    def _init_tables(self) -> None:
+    def _init_tables(self, cur: MySQLCursor) -> None:
         """Create tables if they don't exist. Override in subclasses."""
         pass
 
+    def _add_entry_columns(self, cur: MySQLCursor, columns: dict[str, str]) -> None:
+        """Add entries columns (name -> SQL type) that older tables don't have yet."""
+        cur.execute(
+            "select column_name from information_schema.columns "
+            + "where table_schema = database() and table_name = 'entries'"
+        )
+        existing = {row[0].lower() for row in cur.fetchall()}
+        missing = [col for col in columns if col not in existing]
+        if missing:
+            cur.execute(
+                "alter table entries "
+                + ", ".join(f"add column {col} {columns[col]}" for col in missing)
+            )
+
+    def _backfill_entries(
+        self,
+        cur: MySQLCursor,
+        condition: str,
+        source_columns: list[str],
+        derive: Callable[[tuple], dict[str, Any]],
+    ) -> int:
+        """
+        Rewrite the entries matching condition, BACKFILL_BATCH_SIZE at a time,
+        with the columns derive returns for each row of source_columns.
+        Returns the number of entries rewritten.
+        """
+        last_id, filled = 0, 0
+        while True:
+            cur.execute(
+                f"select id, puzzle_id, user_id, {', '.join(source_columns)} from entries "
+                + f"where id > %s and ({condition}) order by id limit %s",
+                (last_id, self.BACKFILL_BATCH_SIZE),
+            )
+            rows = cur.fetchall()
+            if not rows:
+                return filled
+            derived = [derive(row[3:]) for row in rows]
+            columns = list(derived[0].keys())
+            row_sql = f"({', '.join(['%s'] * (len(columns) + 3))})"
+            cur.execute(
+                f"insert into entries (id, puzzle_id, user_id, {', '.join(columns)}) values "
+                + ", ".join([row_sql] * len(rows))
+                + " on duplicate key update "
+                + ", ".join(f"{col} = values({col})" for col in columns),
+                [
+                    value
+                    for row, values in zip(rows, derived)
+                    for value in (*row[:3], *values.values())
+                ],
+            )
+            last_id = rows[-1][0]
+            filled += len(rows)
+
+    def __init_archive_table(self, cur: MySQLCursor) -> None:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS leaderboard_archive (
+                period_start INT NOT NULL,
+                period_end INT NOT NULL,
+                ranks JSON NOT NULL,
+                image MEDIUMBLOB,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (period_start, period_end)
+            )
+        """)
+
+    def __init_aggregate_tables(self, cur: MySQLCursor) -> None:
+        # totals are DECIMAL since sums of squares (and fixed-point floats) overflow BIGINT
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS user_aggregates (
+                user_id BIGINT NOT NULL,
+                field VARCHAR(32) NOT NULL,
+                n INT NOT NULL DEFAULT 0,
+                total DECIMAL(65, 0) NOT NULL DEFAULT 0,
+                total_sq DECIMAL(65, 0) NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, field)
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS user_histograms (
+                user_id BIGINT NOT NULL,
+                field VARCHAR(32) NOT NULL,
+                bucket BIGINT NOT NULL,
+                n INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, field, bucket)
+            )
+        """)
+
+    def load_entry_store(self) -> None:
+        """Read the users and entries tables into a fresh in-memory store."""
+        store = EntryStore(
+            self.ENTRY_COLUMNS, self.ENTRY_TEXT_COLUMNS, self.ENTRY_REAL_COLUMNS
+        )
+        with self._cursor() as cur:
+            cur.execute("select user_id from users")
+            user_ids = [str(row[0]) for row in cur.fetchall()]
+            # like participation, skip ids saved before they were validated
+            cur.execute(
+                f"select e.user_id, e.puzzle_id, {', '.join(f'e.{col}' for col in self.ENTRY_COLUMNS)} "
+                + "from entries e join users u on u.user_id = e.user_id "
+                + "where e.puzzle_id between 1 and %s order by e.id",
+                (self._get_last_valid_puzzle(),),
+            )
+            rows = cur.fetchall()
+        store.load(user_ids, rows)
+        self._store = store
+        self._bump_data_version()
+
+    def load_participation(self) -> None:
+        """Read who submitted what into a fresh participation index."""
+        participation = ParticipationIndex()
+        with self._cursor() as cur:
+            cur.execute("select user_id from users")
+            user_ids = [str(row[0]) for row in cur.fetchall()]
+            # skip ids saved before they were validated, they can't be real puzzles
+            cur.execute(
+                "select e.user_id, e.puzzle_id from entries e "
+                + "join users u on u.user_id = e.user_id "
+                + "where e.puzzle_id between 1 and %s order by e.puzzle_id",
+                (self._get_last_valid_puzzle(),),
+            )
+            rows = cur.fetchall()
+        participation.load(user_ids, rows)
+        self._participation = participation
+        self._bump_data_version()
+
+    def _bump_data_version(self) -> None:
+        with self._version_lock:
+            self.data_version += 1
+
+    def _bump_archive_version(self) -> int:
+        with self._version_lock:
+            self.archive_version += 1
+            return self.archive_version
+
+    @contextmanager
+    def _cursor(self) -> Iterator[MySQLCursor]:
+        """Check a connection for this game's database out of the pool."""
+        if self._pool is None:
+            self.connect()
+        with self._pool.connection(self._mysql_db_name) as pooled:
+            cur = pooled.cnx.cursor(buffered=True)
+            try:
+                yield cur
+            finally:
+                cur.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[PooledConnection]:
+        """Check out a connection and commit everything run on it, or roll it all back."""
+        if self._pool is None:
+            self.connect()
+        with self._pool.connection(self._mysql_db_name) as pooled:
+            pooled.cnx.start_transaction()
+            try:
+                yield pooled
+            except Exception:
+                pooled.cnx.rollback()
+                raise
+            pooled.cnx.commit()
+
+    def _upsert_entry(self, user_id: str, row: dict[str, Any]) -> EntryWriteResult:
+        """
+        Write the user and the entry in one transaction. Only the columns in
+        row are overwritten when the entry already exists.
+        """
+        columns = list(row.keys())
+        updates = [f"{col} = values({col})" for col in columns if col != "puzzle_id"]
+        entry_sql = (
+            f"insert into entries (user_id, {', '.join(columns)}) "
+            + f"values ({', '.join(['%s'] * (len(columns) + 1))}) "
+            + f"on duplicate key update {', '.join(updates)}"
+        )
+
+        key = (user_id, int(row["puzzle_id"]))
+        with self._transaction() as tx:
+            tx.prepared(_UPSERT_USER_SQL).execute(
+                _UPSERT_USER_SQL, (user_id, self._utils.get_nickname(user_id))
+            )
+            aggregates_cur = tx.cnx.cursor(buffered=True)
+            try:
+                old_row = self.__lock_entries(aggregates_cur, [key]).get(key)
+                invalidated = self.__invalidate_archive(aggregates_cur, [key[1]])
+                cur = tx.prepared(entry_sql)
+                cur.execute(entry_sql, (user_id, *row.values()))
+                affected = cur.rowcount
+
+                aggregates, histograms = {}, {}
+                self.__add_aggregates(aggregates, histograms, user_id, old_row, -1)
+                self.__add_aggregates(
+                    aggregates, histograms, user_id, {**(old_row or {}), **row}, 1
+                )
+                self.__apply_aggregates(aggregates_cur, aggregates, histograms)
+            finally:
+                aggregates_cur.close()
+        if self._store is not None:
+            self._store.upsert(user_id, row)
+        if self._participation is not None:
+            self._participation.add(user_id, key[1])
+        self._bump_data_version()
+        if invalidated:
+            self._bump_archive_version()
+
+        # mysql reports 1 for a new row, 2 for a changed row and 0 for no change
+        if affected == 1:
+            return EntryWriteResult.INSERTED
+        elif affected == 2:
+            return EntryWriteResult.UPDATED
+        elif affected == 0:
+            return EntryWriteResult.UNCHANGED
+        return EntryWriteResult.FAILED
+
+    def upsert_entries(self, batch: list[QueuedEntry]) -> None:
+        """
+        Write a batch of queued entries in one transaction, as one multi-row
+        upsert for the users and one per distinct set of entries columns.
+        Later entries for the same puzzle and user win.
+        """
+        names: dict[str, str] = {}
+        groups: dict[tuple[str, ...], list[tuple]] = {}
+        keys: dict[tuple[str, int], None] = {}
+        for user_id, row in batch:
+            names[user_id] = self._utils.get_nickname(user_id)
+            groups.setdefault(tuple(row.keys()), []).append((user_id, *row.values()))
+            keys[(user_id, int(row["puzzle_id"]))] = None
+
+        with self._transaction() as tx:
+            cur = tx.cnx.cursor(buffered=True)
+            try:
+                old_rows = self.__lock_entries(cur, list(keys))
+                invalidated = self.__invalidate_archive(cur, [key[1] for key in keys])
+                cur.execute(
+                    "insert into users (user_id, name) values "
+                    + ", ".join(["(%s, %s)"] * len(names))
+                    + f" {_UPSERT_USER_UPDATE}",
+                    [value for item in names.items() for value in item],
+                )
+                for columns, values in groups.items():
+                    updates = [
+                        f"{col} = values({col})"
+                        for col in columns
+                        if col != "puzzle_id"
+                    ]
+                    row_sql = f"({', '.join(['%s'] * (len(columns) + 1))})"
+                    cur.execute(
+                        f"insert into entries (user_id, {', '.join(columns)}) values "
+                        + ", ".join([row_sql] * len(values))
+                        + f" on duplicate key update {', '.join(updates)}",
+                        [value for row in values for value in row],
+                    )
+
+                # replay the batch over the old rows to get each entry's final values
+                new_rows = dict(old_rows)
+                for user_id, row in batch:
+                    key = (user_id, int(row["puzzle_id"]))
+                    new_rows[key] = {**new_rows.get(key, {}), **row}
+                aggregates, histograms = {}, {}
+                for (user_id, _), old_row in old_rows.items():
+                    self.__add_aggregates(aggregates, histograms, user_id, old_row, -1)
+                for (user_id, _), new_row in new_rows.items():
+                    self.__add_aggregates(aggregates, histograms, user_id, new_row, 1)
+                self.__apply_aggregates(cur, aggregates, histograms)
+            finally:
+                cur.close()
+        if self._participation is not None:
+            for user_id, puzzle_id in keys:
+                self._participation.add(user_id, puzzle_id)
+        self._bump_data_version()
+        if invalidated:
+            self._bump_archive_version()
+
+    def rebuild_aggregates(self) -> int:
+        """
+        Recompute user_aggregates and user_histograms from the entries table.
+        Returns the number of entries read.
+        """
+        with self._transaction() as tx:
+            cur = tx.cnx.cursor(buffered=True)
+            try:
+                cur.execute(
+                    f"select user_id, puzzle_id, {', '.join(self.ENTRY_COLUMNS)} "
+                    + "from entries where puzzle_id between 1 and %s for update",
+                    (self._get_last_valid_puzzle(),),
+                )
+                rows = cur.fetchall()
+                aggregates, histograms = {}, {}
+                for row in rows:
+                    self.__add_aggregates(
+                        aggregates,
+                        histograms,
+                        str(row[0]),
+                        dict(zip(["puzzle_id", *self.ENTRY_COLUMNS], row[1:])),
+                        1,
+                    )
+                cur.execute("delete from user_aggregates")
+                cur.execute("delete from user_histograms")
+                self.__apply_aggregates(cur, aggregates, histograms)
+            finally:
+                cur.close()
+        self._bump_data_version()
+        return len(rows)
+
+    def __restore_entries(self, entries: list[QueuedEntry]) -> None:
+        """
+        Reset the store and participation index for queued entries the
+        database rejected, back to whatever it holds for them.
+        """
+        keys = list(
+            {(user_id, int(row["puzzle_id"])): None for user_id, row in entries}
+        )
+        columns = ["puzzle_id", *self.ENTRY_COLUMNS]
+        with self._cursor() as cur:
+            cur.execute(
+                f"select user_id, {', '.join(columns)} from entries "
+                + f"where (user_id, puzzle_id) in ({', '.join(['(%s, %s)'] * len(keys))})",
+                [value for key in keys for value in key],
+            )
+            rows = {
+                (str(row[0]), int(row[1])): dict(zip(columns, row[1:]))
+                for row in cur.fetchall()
+            }
+        for user_id, puzzle_id in keys:
+            row = rows.get((user_id, puzzle_id))
+            if self._store is not None:
+                if row is not None:
+                    self._store.upsert(user_id, row)
+                else:
+                    self._store.remove(user_id, puzzle_id)
+            if self._participation is not None and row is None:
+                self._participation.remove(user_id, puzzle_id)
+        self._bump_data_version()
+
+    def __lock_entries(
+        self, cur: MySQLCursor, keys: list[tuple[str, int]]
+    ) -> dict[tuple[str, int], dict[str, Any]]:
+        """Read (and lock) the current entries for (user_id, puzzle_id) keys."""
+        if not keys:
+            return {}
+        columns = ["puzzle_id", *self.ENTRY_COLUMNS]
+        cur.execute(
+            f"select user_id, {', '.join(columns)} from entries "
+            + f"where (user_id, puzzle_id) in ({', '.join(['(%s, %s)'] * len(keys))}) "
+            + "for update",
+            [value for key in keys for value in key],
+        )
+        return {
+            (str(row[0]), int(row[1])): dict(zip(columns, row[1:]))
+            for row in cur.fetchall()
+        }
+
+    def __add_aggregates(
+        self,
+        aggregates: dict[tuple[str, str], list[int]],
+        histograms: dict[tuple[str, str, int], int],
+        user_id: str,
+        row: dict[str, Any] | None,
+        sign: int,
+    ) -> None:
+        """Add (sign 1) or take away (sign -1) an entry row's share of the aggregates."""
+        # rows with impossible puzzle ids are left out, as in rebuild_aggregates
+        if row is None or not self._is_valid_puzzle_id(int(row["puzzle_id"])):
+            return
+        entry = self._entry_from_row(
+            user_id, (row["puzzle_id"], *[row.get(col) for col in self.ENTRY_COLUMNS])
+        )
+        values = {_ENTRY_COUNT_FIELD: 1, **self._aggregate_values(entry)}
+        for field, value in values.items():
+            if value is None:
+                continue
+            value = int(value)
+            aggregate = aggregates.setdefault((user_id, field), [0, 0, 0])
+            aggregate[0] += sign
+            aggregate[1] += sign * value
+            aggregate[2] += sign * value * value
+            if field in self.HISTOGRAM_FIELDS:
+                key = (user_id, field, value)
+                histograms[key] = histograms.get(key, 0) + sign
+
+    def __apply_aggregates(
+        self,
+        cur: MySQLCursor,
+        aggregates: dict[tuple[str, str], list[int]],
+        histograms: dict[tuple[str, str, int], int],
+    ) -> None:
+        """Add the deltas to user_aggregates and user_histograms."""
+        # totals are sent as strings, they can be too large for a BIGINT parameter
+        aggregate_rows = [
+            (user_id, field, n, str(total), str(total_sq))
+            for (user_id, field), (n, total, total_sq) in aggregates.items()
+            if n or total or total_sq
+        ]
+        if aggregate_rows:
+            cur.execute(
+                "insert into user_aggregates (user_id, field, n, total, total_sq) values "
+                + ", ".join(["(%s, %s, %s, %s, %s)"] * len(aggregate_rows))
+                + " on duplicate key update n = n + values(n), "
+                + "total = total + values(total), total_sq = total_sq + values(total_sq)",
+                [value for row in aggregate_rows for value in row],
+            )
+        histogram_rows = [(*key, n) for key, n in histograms.items() if n]
+        if histogram_rows:
+            cur.execute(
+                "insert into user_histograms (user_id, field, bucket, n) values "
+                + ", ".join(["(%s, %s, %s, %s)"] * len(histogram_rows))
+                + " on duplicate key update n = n + values(n)",
+                [value for row in histogram_rows for value in row],
+            )
+
     ####################
     #  PUZZLE METHODS  #
     ####################
@@ -80,6 +635,20 @@ class BaseDatabaseHandler(Protocol):
     def get_puzzle_by_date(self, query_date: date) -> int:
         return self._arbitrary_date_puzzle + (query_date - self._arbitrary_date).days
 
+    def _get_last_valid_puzzle(self) -> int:
+        """Tomorrow's puzzle, the newest anyone in any timezone can have played."""
+        tomorrow = self._utils.get_todays_date() + timedelta(days=1)
+        return self.get_puzzle_by_date(tomorrow)
+
+    def _is_valid_puzzle_id(self, puzzle_id: int) -> bool:
+        """Whether puzzle_id could be a real puzzle: from #1 up to tomorrow's."""
+        return 1 <= puzzle_id <= self._get_last_valid_puzzle()
+
+    def get_date_by_puzzle(self, puzzle_id: int) -> date:
+        return self._arbitrary_date + timedelta(
+            days=puzzle_id - self._arbitrary_date_puzzle
+        )
+
     def get_puzzles_by_week(self, query_date: date) -> list[int]:
         if self._utils.is_sunday(query_date):
             sunday_puzzle_id = self.get_puzzle_by_date(query_date)
@@ -117,38 +686,436 @@ class BaseDatabaseHandler(Protocol):
         return []
 
     def get_all_puzzles(self) -> list[int]:
-        if not self._db.is_connected():
-            self.connect()
-        self._cur.execute("select distinct puzzle_id from entries")
-        return [row[0] for row in self._cur.fetchall()]
+        if self._participation is not None:
+            return self._participation.get_puzzles()
+        if self._store is not None:
+            return self._store.get_puzzles()
+        with self._cursor() as cur:
+            cur.execute(
+                "select distinct puzzle_id from entries where puzzle_id between 1 and %s",
+                (self._get_last_valid_puzzle(),),
+            )
+            return [row[0] for row in cur.fetchall()]
 
     ####################
     #  PLAYER METHODS  #
     ####################
 
     def get_all_players(self) -> list[str]:
-        if not self._db.is_connected():
-            self.connect()
-        self._cur.execute("select distinct user_id from users")
-        return [str(row[0]) for row in self._cur.fetchall()]
+        if self._participation is not None:
+            return self._participation.get_users()
+        if self._store is not None:
+            return self._store.get_users()
+        with self._cursor() as cur:
+            cur.execute("select distinct user_id from users")
+            return [str(row[0]) for row in cur.fetchall()]
+
+    def get_user_names(self) -> dict[str, str]:
+        with self._cursor() as cur:
+            cur.execute("select user_id, name from users")
+            return {str(row[0]): row[1] for row in cur.fetchall()}
 
     def get_puzzles_by_player(self, user_id) -> list[int]:
-        if not self._db.is_connected():
-            self.connect()
-        self._cur.execute(
-            f"select distinct puzzle_id from entries where user_id = {user_id}"
-        )
-        return [row[0] for row in self._cur.fetchall()]
+        if self._store is not None:
+            return self._store.get_puzzles_by_user(user_id)
+        with self._cursor() as cur:
+            cur.execute(
+                "select distinct puzzle_id from entries where user_id = %s",
+                (user_id,),
+            )
+            return [row[0] for row in cur.fetchall()]
 
     def get_players_by_puzzle_id(self, puzzle_id: int) -> list[str]:
-        if not self._db.is_connected():
-            self.connect()
-        self._cur.execute(
-            f"select distinct user_id from entries where puzzle_id = {puzzle_id}"
-        )
-        return [str(row[0]) for row in self._cur.fetchall()]
+        if self._participation is not None:
+            return self._participation.get_users_by_puzzle(puzzle_id)
+        if self._store is not None:
+            return self._store.get_users_by_puzzle(puzzle_id)
+        with self._cursor() as cur:
+            cur.execute(
+                "select distinct user_id from entries where puzzle_id = %s",
+                (puzzle_id,),
+            )
+            return [str(row[0]) for row in cur.fetchall()]
+
+    def get_players_missing_puzzle(self, puzzle_id: int) -> list[str]:
+        """Tracked players without an entry for puzzle_id, in user_id order."""
+        if self._participation is not None:
+            return self._participation.get_missing(puzzle_id)
+        if self._store is not None:
+            user_ids, counts = self._store.count_by_user([puzzle_id])
+            return [user_id for user_id, n in zip(user_ids, counts) if n == 0]
+        with self._cursor() as cur:
+            cur.execute(
+                "select u.user_id from users u where not exists ("
+                + "select 1 from entries e where e.user_id = u.user_id and e.puzzle_id = %s"
+                + ") order by u.user_id",
+                (puzzle_id,),
+            )
+            return [str(row[0]) for row in cur.fetchall()]
+
+    def get_players_missing_any(self, puzzle_list: list[int]) -> list[tuple[str, int]]:
+        """
+        Tracked players without an entry for at least one puzzle in puzzle_list,
+        with how many of them they are missing, in user_id order.
+        """
+        if not puzzle_list:
+            return []
+        counts = None
+        if self._participation is not None:
+            counts = self._participation.count_by_user(puzzle_list)
+        elif self._store is not None:
+            counts = self._store.count_by_user(puzzle_list)
+        if counts is not None:
+            return [
+                (user_id, len(puzzle_list) - int(n))
+                for user_id, n in zip(*counts)
+                if n < len(puzzle_list)
+            ]
+        with self._cursor() as cur:
+            cur.execute(
+                "select u.user_id, count(e.puzzle_id) from users u "
+                + "left join entries e on e.user_id = u.user_id "
+                + f"and e.puzzle_id in ({', '.join(['%s'] * len(puzzle_list))}) "
+                + "group by u.user_id having count(e.puzzle_id) < %s "
+                + "order by u.user_id",
+                list(puzzle_list) + [len(puzzle_list)],
+            )
+            return [(str(row[0]), len(puzzle_list) - row[1]) for row in cur.fetchall()]
 
     def get_entries_by_player(
         self, user_id: str, puzzle_list: list[int] = []
     ) -> list[object]:
+        if self._store is not None:
+            rows = self._store.get_rows_by_user(user_id, puzzle_list)
+        else:
+            query = f"select puzzle_id, {', '.join(self.ENTRY_COLUMNS)} from entries where user_id = %s"
+            params = [user_id]
+            if puzzle_list and len(puzzle_list) > 0:
+                query += f" and puzzle_id in ({', '.join(['%s'] * len(puzzle_list))})"
+                params += puzzle_list
+            with self._cursor() as cur:
+                cur.execute(query, params)
+                rows = cur.fetchall()
+        return [self._entry_from_row(user_id, row) for row in rows]
+
+    def get_player_stats(self, puzzle_list: list[int]) -> list[object]:
+        """
+        Stats for every player with at least one entry in puzzle_list, in
+        user_id order. Override in subclasses.
+        """
         pass
+
+    def _get_window_aggregates(
+        self, aggregates: list[str], puzzle_list: list[int]
+    ) -> list[tuple]:
+        """
+        One grouped query over the puzzle window. Returns a row per player with
+        entries in the window: (user_id, entry count, *aggregates).
+        """
+        if not puzzle_list:
+            return []
+        with self._cursor() as cur:
+            cur.execute(
+                f"select e.user_id, count(*), {', '.join(aggregates)} "
+                + "from entries e join users u on u.user_id = e.user_id "
+                + f"where e.puzzle_id in ({', '.join(['%s'] * len(puzzle_list))}) "
+                + "group by e.user_id order by e.user_id",
+                list(puzzle_list),
+            )
+            rows = cur.fetchall()
+        # sums of integer columns come back as Decimal
+        return [
+            tuple(int(v) if isinstance(v, Decimal) else v for v in row) for row in rows
+        ]
+
+    def get_all_time_stats(self, user_ids: list[str] = None) -> list[object]:
+        """
+        All-time stats read from user_aggregates, in user_id order, for user_ids
+        (or every player) with at least one entry. missed_games counts the
+        puzzles anyone has played that the player hasn't.
+        """
+        query = (
+            "select a.user_id, a.field, a.n, a.total, a.total_sq from user_aggregates a "
+            + "join users u on u.user_id = a.user_id"
+        )
+        params = []
+        if user_ids is not None:
+            if not user_ids:
+                return []
+            query += f" where a.user_id in ({', '.join(['%s'] * len(user_ids))})"
+            params = list(user_ids)
+        with self._cursor() as cur:
+            cur.execute(query + " order by a.user_id", params)
+            rows = cur.fetchall()
+
+        players: dict[str, dict[str, Aggregate]] = {}
+        for row in rows:
+            players.setdefault(str(row[0]), {})[row[1]] = (
+                int(row[2]),
+                int(row[3]),
+                int(row[4]),
+            )
+        puzzle_count = len(self.get_all_puzzles())
+        stats = []
+        for user_id, aggregates in players.items():
+            count = aggregates.get(_ENTRY_COUNT_FIELD, (0, 0, 0))[0]
+            if count > 0:
+                # aggregates built before the puzzle id range was enforced can
+                # still count rows the puzzle list skips, until they're rebuilt
+                stats.append(
+                    self._stats_from_aggregates(
+                        user_id, max(0, puzzle_count - count), aggregates
+                    )
+                )
+        return stats
+
+    def get_histograms(
+        self, user_ids: list[str], field: str
+    ) -> dict[str, dict[int, int]]:
+        """How many entries each player has for every value of field, from user_histograms."""
+        histograms: dict[str, dict[int, int]] = {user_id: {} for user_id in user_ids}
+        if not user_ids:
+            return histograms
+        with self._cursor() as cur:
+            cur.execute(
+                "select user_id, bucket, n from user_histograms "
+                + f"where field = %s and user_id in ({', '.join(['%s'] * len(user_ids))})",
+                [field, *user_ids],
+            )
+            for row in cur.fetchall():
+                histograms.setdefault(str(row[0]), {})[int(row[1])] = int(row[2])
+        return histograms
+
+    ####################
+    # ARCHIVE METHODS  #
+    ####################
+
+    def get_archived_ranks(
+        self, period_start: int, period_end: int
+    ) -> tuple[bool, bytes | None] | None:
+        """
+        The frozen leaderboard for the puzzles period_start..period_end, as
+        (found any players, png), or None if it isn't archived.
+        """
+        with self._cursor() as cur:
+            cur.execute(
+                "select ranks, image from leaderboard_archive "
+                + "where period_start = %s and period_end = %s",
+                (period_start, period_end),
+            )
+            row = cur.fetchone()
+        if row is None:
+            return None
+        return len(json.loads(row[0])) > 0, row[1]
+
+    def archive_ranks(
+        self,
+        period_start: int,
+        period_end: int,
+        ranks: list[tuple],
+        image: bytes | None,
+    ) -> int:
+        """
+        Freeze a finished period's leaderboard: a (rank, user_id, missed games,
+        *stats) row per player, in rank order, and the rendered table. Returns
+        the archive_version it was written at.
+        """
+        with self._cursor() as cur:
+            cur.execute(
+                "insert into leaderboard_archive (period_start, period_end, ranks, image) "
+                + "values (%s, %s, %s, %s) on duplicate key update "
+                + "ranks = values(ranks), image = values(image)",
+                (
+                    period_start,
+                    period_end,
+                    # NumPy scalars from the windowed stats aren't JSON types
+                    json.dumps(ranks, default=lambda v: v.item()),
+                    image,
+                ),
+            )
+        self._archived_through = max(self._archived_through or 0, period_end)
+        return self._bump_archive_version()
+
+    def __invalidate_archive(self, cur: MySQLCursor, puzzle_ids: list[int]) -> bool:
+        """
+        Drop archived leaderboards for periods containing any of puzzle_ids.
+        Returns whether any could have been dropped: the caller bumps
+        archive_version once the transaction commits.
+        """
+        if self._archived_through is not None:
+            puzzle_ids = [p for p in puzzle_ids if p <= self._archived_through]
+        if not puzzle_ids:
+            return False
+        cur.execute(
+            "delete from leaderboard_archive where "
+            + " or ".join(
+                ["(period_start <= %s and period_end >= %s)"] * len(puzzle_ids)
+            ),
+            [p for puzzle_id in puzzle_ids for p in (puzzle_id, puzzle_id)],
+        )
+        return True
+
+    ####################
+    #  ASYNC METHODS   #
+    ####################
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run blocking database work on the shared executor. Every query checks
+        its own connection out of the pool, so calls can run in parallel.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_db_executor, functools.partial(func, *args))
+
+    async def connect_async(self) -> None:
+        await self.run(self.connect)
+        if _write_queue_enabled and self._write_queue is None:
+            self._write_queue = WriteBehindQueue(
+                self.__write_batch,
+                os.path.join(
+                    os.environ.get("WRITE_QUEUE_DIR", "journal"),
+                    f"{self._mysql_db_name}.jsonl",
+                ),
+                flush_ms=int(os.environ.get("WRITE_QUEUE_FLUSH_MS", "500")),
+                flush_rows=int(os.environ.get("WRITE_QUEUE_FLUSH_ROWS", "50")),
+                row_errors=(DataError, IntegrityError),
+                on_dead_letter=lambda entries: self.run(
+                    self.__restore_entries, entries
+                ),
+            )
+            await self._write_queue.start()
+        if _entry_store_enabled and self._store is None:
+            # write anything replayed from the journal before taking the snapshot
+            await self.flush_entries_async()
+            await self.run(self.load_entry_store)
+        if _participation_index_enabled and self._participation is None:
+            await self.flush_entries_async()
+            await self.run(self.load_participation)
+
+    async def close_async(self) -> None:
+        if self._write_queue is not None:
+            await self._write_queue.close()
+
+    async def __write_batch(self, batch: list[QueuedEntry]) -> None:
+        await self.run(self.upsert_entries, batch)
+        if self.on_entries_written is not None:
+            try:
+                await self.on_entries_written(
+                    list({user_id: None for user_id, _ in batch})
+                )
+            except Exception as e:
+                # the batch is written, don't let the queue retry it
+                print(f"Failed to handle written entries: {e}")
+
+    async def queue_entry_async(
+        self, user_id: str, title: str, puzzle: str
+    ) -> EntryWriteResult:
+        """
+        Record a pasted result. With the write queue enabled this returns
+        QUEUED as soon as the entry is journaled; it is written with the next batch.
+        """
+        if self._write_queue is None:
+            return await self.add_entry_async(user_id, title, puzzle)
+        row = self._parse_entry(title, puzzle)
+        if not row:
+            return EntryWriteResult.FAILED
+        await self._write_queue.put(user_id, row)
+        if self._store is not None:
+            # visible to reads right away, the database catches up with the batch
+            self._store.upsert(user_id, row)
+        if self._participation is not None:
+            self._participation.add(user_id, row["puzzle_id"])
+        # even without the store the entry changes what reads should see
+        self._bump_data_version()
+        return EntryWriteResult.QUEUED
+
+    async def flush_entries_async(self) -> None:
+        if self._write_queue is not None:
+            await self._write_queue.flush()
+
+    def has_entry_store(self) -> bool:
+        """Whether reads see queued entries before they reach the database."""
+        return self._store is not None
+
+    async def add_entry_async(
+        self, user_id: str, title: str, puzzle: str
+    ) -> EntryWriteResult:
+        # write anything queued first, so it can't overwrite this entry later
+        await self.flush_entries_async()
+        return await self.run(self.add_entry, user_id, title, puzzle)
+
+    async def remove_entry_async(self, user_id: str, puzzle_id: int) -> bool:
+        await self.flush_entries_async()
+        return await self.run(self.remove_entry, user_id, puzzle_id)
+
+    async def user_exists_async(self, user_id: str) -> bool:
+        return await self.run(self.user_exists, user_id)
+
+    async def entry_exists_async(self, user_id: str, puzzle_id: int) -> bool:
+        return await self.run(self.entry_exists, user_id, puzzle_id)
+
+    async def get_all_puzzles_async(self) -> list[int]:
+        return await self.run(self.get_all_puzzles)
+
+    async def get_all_players_async(self) -> list[str]:
+        return await self.run(self.get_all_players)
+
+    async def get_user_names_async(self) -> dict[str, str]:
+        return await self.run(self.get_user_names)
+
+    async def get_puzzles_by_player_async(self, user_id) -> list[int]:
+        return await self.run(self.get_puzzles_by_player, user_id)
+
+    async def get_players_by_puzzle_id_async(self, puzzle_id: int) -> list[str]:
+        return await self.run(self.get_players_by_puzzle_id, puzzle_id)
+
+    async def get_players_missing_puzzle_async(self, puzzle_id: int) -> list[str]:
+        return await self.run(self.get_players_missing_puzzle, puzzle_id)
+
+    async def get_players_missing_any_async(
+        self, puzzle_list: list[int]
+    ) -> list[tuple[str, int]]:
+        return await self.run(self.get_players_missing_any, puzzle_list)
+
+    async def get_entries_by_player_async(
+        self, user_id: str, puzzle_list: list[int] = []
+    ) -> list[object]:
+        return await self.run(self.get_entries_by_player, user_id, puzzle_list)
+
+    async def get_player_stats_async(self, puzzle_list: list[int]) -> list[object]:
+        return await self.run(self.get_player_stats, puzzle_list)
+
+    async def get_all_time_stats_async(
+        self, user_ids: list[str] = None
+    ) -> list[object]:
+        # queued entries only reach user_aggregates once they're written
+        await self.flush_entries_async()
+        return await self.run(self.get_all_time_stats, user_ids)
+
+    async def get_histograms_async(
+        self, user_ids: list[str], field: str
+    ) -> dict[str, dict[int, int]]:
+        await self.flush_entries_async()
+        return await self.run(self.get_histograms, user_ids, field)
+
+    async def rebuild_aggregates_async(self) -> int:
+        await self.flush_entries_async()
+        return await self.run(self.rebuild_aggregates)
+
+    async def get_archived_ranks_async(
+        self, period_start: int, period_end: int
+    ) -> tuple[bool, bytes | None] | None:
+        # no flush: a queued late entry drops its period's archive (and bumps
+        # archive_version) when its batch is written
+        return await self.run(self.get_archived_ranks, period_start, period_end)
+
+    async def archive_ranks_async(
+        self,
+        period_start: int,
+        period_end: int,
+        ranks: list[tuple],
+        image: bytes | None,
+    ) -> int:
+        return await self.run(
+            self.archive_ranks, period_start, period_end, ranks, image
+        )
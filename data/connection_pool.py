@@ -0,0 +1,174 @@
+import os, queue, threading, time
+from contextlib import contextmanager
+from typing import Iterator
+from mysql.connector import MySQLConnection, connect
+from mysql.connector.constants import ClientFlag
+from mysql.connector.cursor import MySQLCursorPrepared
+from mysql.connector.errors import InterfaceError, OperationalError
+
+
+class PooledConnection:
+    def __init__(self, cnx: MySQLConnection, database: str) -> None:
+        self.cnx = cnx
+        self.database = database
+        self.last_used = time.monotonic()
+        self._statements: dict[tuple[str, str], MySQLCursorPrepared] = {}
+
+    def prepared(self, sql: str) -> MySQLCursorPrepared:
+        """
+        Return a prepared cursor for this statement, preparing it on first use.
+        Statements are prepared against the current database, so the cache is
+        keyed on both.
+        """
+        key = (self.database, sql)
+        cur = self._statements.get(key)
+        if cur is None:
+            cur = self.cnx.cursor(prepared=True)
+            self._statements[key] = cur
+        return cur
+
+
+class ConnectionPool:
+    """
+    A fixed-size pool of MySQL connections to one server. Connections are not
+    tied to a database; each checkout switches to the requested database only
+    when it differs from the one the connection last used. Idle connections
+    are pinged once they have been unused for idle_check_seconds, instead of
+    pinging before every query.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        user: str,
+        password: str,
+        size: int = 5,
+        idle_check_seconds: float = 60.0,
+        checkout_timeout: float = 30.0,
+    ) -> None:
+        self._host = host
+        self._user = user
+        self._password = password
+        self._size = max(1, size)
+        self._idle_check_seconds = idle_check_seconds
+        self._checkout_timeout = checkout_timeout
+        self._idle: queue.LifoQueue[PooledConnection] = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._live = 0
+
+    @contextmanager
+    def connection(self, database: str) -> Iterator[PooledConnection]:
+        pooled = self.__checkout(database)
+        try:
+            yield pooled
+        except (InterfaceError, OperationalError):
+            # connection-level failure, don't hand this connection out again
+            self.__discard(pooled)
+            raise
+        except Exception:
+            self.__release(pooled)
+            raise
+        else:
+            self.__release(pooled)
+
+    def close(self) -> None:
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self.__discard(pooled)
+
+    ####################
+    #  HELPER METHODS  #
+    ####################
+
+    def __checkout(self, database: str) -> PooledConnection:
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                if self.__reserve_slot():
+                    return self.__open(database)
+                try:
+                    pooled = self._idle.get(timeout=self._checkout_timeout)
+                except queue.Empty:
+                    raise TimeoutError("Timed out waiting for a MySQL connection")
+
+            try:
+                if time.monotonic() - pooled.last_used > self._idle_check_seconds:
+                    pooled.cnx.ping()
+                if pooled.database != database:
+                    pooled.cnx.cmd_init_db(database)
+                    pooled.database = database
+                return pooled
+            except Exception:
+                # dead or unusable connection, drop it and try the next one
+                self.__discard(pooled)
+
+    def __open(self, database: str) -> PooledConnection:
+        try:
+            cnx = connect(
+                host=self._host,
+                user=self._user,
+                password=self._password,
+                database=database,
+                # report 0 affected rows for an upsert that changed nothing,
+                # so inserted/updated/unchanged can be told apart
+                client_flags=[-ClientFlag.FOUND_ROWS],
+            )
+            cnx.autocommit = True
+            return PooledConnection(cnx, database)
+        except Exception:
+            self.__release_slot()
+            raise
+
+    def __release(self, pooled: PooledConnection) -> None:
+        try:
+            if pooled.cnx.in_transaction:
+                pooled.cnx.rollback()
+        except Exception:
+            self.__discard(pooled)
+            return
+        pooled.last_used = time.monotonic()
+        self._idle.put(pooled)
+
+    def __discard(self, pooled: PooledConnection) -> None:
+        try:
+            pooled.cnx.close()
+        except Exception:
+            pass
+        self.__release_slot()
+
+    def __reserve_slot(self) -> bool:
+        with self._lock:
+            if self._live < self._size:
+                self._live += 1
+                return True
+            return False
+
+    def __release_slot(self) -> None:
+        with self._lock:
+            self._live -= 1
+
+
+_pools: dict[tuple[str, str, str], ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(host: str, user: str, password: str) -> ConnectionPool:
+    """Return the pool for this server and credentials, creating it on first use."""
+    key = (host, user, password)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(
+                host,
+                user,
+                password,
+                size=int(os.environ.get("MYSQL_POOL_SIZE", "5")),
+                idle_check_seconds=float(
+                    os.environ.get("MYSQL_POOL_IDLE_CHECK_SECONDS", "60")
+                ),
+                checkout_timeout=float(os.environ.get("MYSQL_POOL_TIMEOUT", "30")),
+            )
+        return _pools[key]
@@ -1,12 +1,19 @@
 import os, re
 from collections import Counter
 from datetime import date
-from data.base_data_handler import BaseDatabaseHandler
-from models.connections import ConnectionsPuzzleEntry
+from typing import Any
+from mysql.connector.cursor import MySQLCursor
+from data.base_data_handler import Aggregate, BaseDatabaseHandler
+from models.connections import ConnectionsPlayerStats, ConnectionsPuzzleEntry
 from utils.bot_utilities import BotUtilities
 
 
 class ConnectionsDatabaseHandler(BaseDatabaseHandler):
+    ENTRY_COLUMNS = ["score", "grid", "puzzle_str"]
+    ENTRY_TEXT_COLUMNS = ["grid", "puzzle_str"]
+    AGGREGATE_FIELDS = ["score"]
+    HISTOGRAM_FIELDS = ["score"]
+
     def __init__(self, utils: BotUtilities) -> None:
         # init
         super().__init__(utils)
@@ -21,9 +28,9 @@ class ConnectionsDatabaseHandler(BaseDatabaseHandler):
         self._mysql_pass = os.environ.get("CONNECTIONS_MYSQL_PASS", "")
         self._mysql_db_name = os.environ.get("CONNECTIONS_MYSQL_DB_NAME", "connections")
 
-    def _init_tables(self) -> None:
+    def _init_tables(self, cur: MySQLCursor) -> None:
         """Create tables if they don't exist."""
-        self._cur.execute("""
+        cur.execute("""
             CREATE TABLE IF NOT EXISTS users (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 user_id BIGINT NOT NULL,
@@ -31,12 +38,13 @@ class ConnectionsDatabaseHandler(BaseDatabaseHandler):
                 UNIQUE KEY uq_user_id(user_id)
             )
         """)
-        self._cur.execute("""
+        cur.execute("""
             CREATE TABLE IF NOT EXISTS entries (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 puzzle_id INT NOT NULL,
                 user_id BIGINT NOT NULL,
                 score INT,
+                grid VARBINARY(16),
                 puzzle_str TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 UNIQUE KEY uq_puzzle_user(puzzle_id, user_id),
@@ -44,70 +52,69 @@ class ConnectionsDatabaseHandler(BaseDatabaseHandler):
                 INDEX idx_user_id(user_id)
             )
         """)
+        self._add_entry_columns(cur, {"grid": "VARBINARY(16)"})
+        filled = self._backfill_entries(
+            cur,
+            "grid is null and puzzle_str is not null",
+            ["puzzle_str"],
+            lambda row: self.__encode_grid(row[0]),
+        )
+        if filled > 0:
+            print(f"Encoded Connections grids for {filled} entries")
 
     ####################
     #  PUZZLE METHODS  #
     ####################
 
-    def add_entry(self, user_id: str, title: str, puzzle: str) -> bool:
+    def _parse_entry(self, title: str, puzzle: str) -> dict[str, Any] | None:
         puzzle_id_title = re.findall(r"[\d,]+", title)
         score = self.__get_score_from_puzzle(puzzle)
 
         if puzzle_id_title:
             puzzle_id = int(str(puzzle_id_title[0]).replace(",", ""))
         else:
-            return False
-
-        if not self._db.is_connected():
-            self.connect()
+            return None
+        if not self._is_valid_puzzle_id(puzzle_id):
+            return None
 
-        if not self.user_exists(user_id):
-            user_name = self._utils.get_nickname(user_id)
-            self._cur.execute(
-                "insert into users (user_id, name) values ('{}', '{}')".format(
-                    user_id, user_name
-                )
-            )
+        return {"puzzle_id": puzzle_id, "score": score, **self.__encode_grid(puzzle)}
 
-        if self.entry_exists(user_id, puzzle_id):
-            self._cur.execute(
-                f"update entries set score = {score}, puzzle_str = '{puzzle}' "
-                + f"where user_id = '{user_id}' and puzzle_id = '{puzzle_id}'"
-            )
-            self._db.commit()
-            return True
-        else:
-            self._cur.execute(
-                "insert into entries (puzzle_id, user_id, score, puzzle_str) "
-                + f"values ({puzzle_id}, {user_id}, {score}, '{puzzle}')"
-            )
-            self._db.commit()
-            return self._cur.rowcount > 0
+    def _entry_from_row(self, user_id: str, row: tuple) -> ConnectionsPuzzleEntry:
+        return ConnectionsPuzzleEntry(row[0], user_id, *row[1:])
 
     ####################
     #  PLAYER METHODS  #
     ####################
 
-    def get_entries_by_player(
-        self, user_id: str, puzzle_list: list[int] = []
-    ) -> list[ConnectionsPuzzleEntry]:
-        if not self._db.is_connected():
-            self.connect()
-        if not puzzle_list or len(puzzle_list) == 0:
-            query = f"select puzzle_id, score, puzzle_str from entries where user_id = {user_id}"
-        else:
-            puzzle_list_str = ",".join([str(p_id) for p_id in puzzle_list])
-            query = f"select puzzle_id, score, puzzle_str from entries where user_id = {user_id} and puzzle_id in ({puzzle_list_str})"
-        self._cur.execute(query)
-        entries: list[ConnectionsPuzzleEntry] = []
-        for row in self._cur.fetchall():
-            entries.append(ConnectionsPuzzleEntry(row[0], user_id, row[1], row[2]))
-        return entries
+    def get_player_stats(self, puzzle_list: list[int]) -> list[ConnectionsPlayerStats]:
+        if self._store is not None:
+            return ConnectionsPlayerStats.from_arrays(
+                *self._store.get_window(puzzle_list), len(puzzle_list)
+            )
+        rows = self._get_window_aggregates(["sum(e.score)"], puzzle_list)
+        return [
+            ConnectionsPlayerStats.from_aggregates(
+                str(row[0]), len(puzzle_list) - row[1], row[1], row[2]
+            )
+            for row in rows
+        ]
+
+    def _stats_from_aggregates(
+        self, user_id: str, missed_games: int, aggregates: dict[str, Aggregate]
+    ) -> ConnectionsPlayerStats:
+        return ConnectionsPlayerStats.from_aggregates(
+            user_id, missed_games, aggregates["entries"][0], aggregates["score"][1]
+        )
 
     ####################
     #  HELPER METHODS  #
     ####################
 
+    def __encode_grid(self, puzzle: str) -> dict[str, Any]:
+        """The grid and puzzle_str columns, keeping the text only if it can't be packed."""
+        grid = ConnectionsPuzzleEntry.encode_grid(puzzle)
+        return {"grid": grid, "puzzle_str": puzzle if grid is None else None}
+
     def __get_score_from_puzzle(self, puzzle: str) -> int:
         puzzle_lines = puzzle.split("\n")
         if len(Counter(puzzle_lines[-1]).keys()) == 1:
@@ -0,0 +1,286 @@
+import threading
+import numpy as np
+from typing import Any
+
+
+class EntryStore:
+    """
+    In-memory, columnar copy of one game's entries table.
+    - columns: the entries columns kept, in the order rows are returned
+    - text_columns: the subset of columns stored as Python objects instead of
+      float64 (NULL is stored as NaN for the numeric columns)
+    - real_columns: the numeric columns read back as floats instead of ints
+
+    Rows live in growable NumPy arrays in insertion order. The per-user and
+    per-puzzle indexes are CSR-style (a sort order plus offsets) and are
+    rebuilt lazily on the first read after a write.
+    """
+
+    INITIAL_CAPACITY: int = 1024
+
+    def __init__(
+        self,
+        columns: list[str],
+        text_columns: list[str] = [],
+        real_columns: list[str] = [],
+    ) -> None:
+        self.columns = list(columns)
+        self._text_columns = set(text_columns)
+        self._real_columns = set(real_columns)
+        self._lock = threading.RLock()
+        self.__reset(self.INITIAL_CAPACITY)
+
+    def load(self, user_ids: list[str], rows: list[tuple]) -> None:
+        """Replace the contents with rows of (user_id, puzzle_id, *columns)."""
+        with self._lock:
+            self.__reset(max(self.INITIAL_CAPACITY, len(rows)))
+            for user_id in user_ids:
+                self.__user_index(str(user_id))
+            for row in rows:
+                self.upsert(
+                    str(row[0]),
+                    {"puzzle_id": row[1], **dict(zip(self.columns, row[2:]))},
+                )
+
+    ####################
+    #  WRITE METHODS   #
+    ####################
+
+    def add_user(self, user_id: str) -> None:
+        with self._lock:
+            self.__user_index(str(user_id))
+
+    def upsert(self, user_id: str, row: dict[str, Any]) -> None:
+        """Insert or update an entry. Only the columns present in row are written."""
+        with self._lock:
+            user_idx = self.__user_index(str(user_id))
+            key = (user_idx, int(row["puzzle_id"]))
+            index = self._row_of.get(key)
+            if index is None:
+                index = self.__append_row(user_idx, key[1])
+                self._row_of[key] = index
+            for column, value in row.items():
+                if column == "puzzle_id":
+                    continue
+                if column in self._text_columns:
+                    self._values[column][index] = value
+                else:
+                    self._values[column][index] = np.nan if value is None else value
+            self._dirty = True
+
+    def remove(self, user_id: str, puzzle_id: int) -> bool:
+        with self._lock:
+            user_idx = self._user_of.get(str(user_id))
+            index = self._row_of.pop((user_idx, int(puzzle_id)), None)
+            if index is None:
+                return False
+            self._alive[index] = False
+            self._dirty = True
+            return True
+
+    ####################
+    #   READ METHODS   #
+    ####################
+
+    def has_user(self, user_id: str) -> bool:
+        return str(user_id) in self._user_of
+
+    def has_entry(self, user_id: str, puzzle_id: int) -> bool:
+        user_idx = self._user_of.get(str(user_id))
+        return (user_idx, int(puzzle_id)) in self._row_of
+
+    def get_users(self) -> list[str]:
+        """Every tracked player, in user_id order."""
+        with self._lock:
+            self.__reindex()
+            return list(self._users_sorted)
+
+    def get_puzzles(self) -> list[int]:
+        with self._lock:
+            self.__reindex()
+            return self._puzzles.tolist()
+
+    def get_puzzles_by_user(self, user_id: str) -> list[int]:
+        with self._lock:
+            rows = self.__user_rows(user_id)
+            return self._puzzle_ids[rows].tolist()
+
+    def get_users_by_puzzle(self, puzzle_id: int) -> list[str]:
+        with self._lock:
+            self.__reindex()
+            i = np.searchsorted(self._puzzles, puzzle_id)
+            if i >= len(self._puzzles) or self._puzzles[i] != puzzle_id:
+                return []
+            rows = self._by_puzzle[
+                self._puzzle_offsets[i] : self._puzzle_offsets[i + 1]
+            ]
+            return [self._users[u] for u in self._user_idx[rows]]
+
+    def get_rows_by_user(
+        self, user_id: str, puzzle_list: list[int] = []
+    ) -> list[tuple]:
+        """A player's entries as (puzzle_id, *columns), with NULLs as None."""
+        with self._lock:
+            rows = self.__user_rows(user_id)
+            if puzzle_list:
+                rows = rows[np.isin(self._puzzle_ids[rows], puzzle_list)]
+            return self.__to_tuples(rows)
+
+    def get_window(
+        self, puzzle_list: list[int]
+    ) -> tuple[list[str], np.ndarray, dict[str, np.ndarray]]:
+        """
+        Every entry for the puzzles in puzzle_list, as columns.
+        Returns (user_ids, positions, columns): user_ids are the players with at
+        least one entry in the window in user_id order, positions maps each row
+        to its player in user_ids, and columns holds puzzle_id plus the entry
+        columns. Rows are grouped by player, oldest first.
+        """
+        with self._lock:
+            self.__reindex()
+            size = self._size
+            mask = self._alive[:size] & np.isin(self._puzzle_ids[:size], puzzle_list)
+            rows = np.flatnonzero(mask)
+            ranks = self._user_rank[self._user_idx[rows]]
+            order = np.argsort(ranks, kind="stable")
+            rows, ranks = rows[order], ranks[order]
+            unique_ranks, positions = np.unique(ranks, return_inverse=True)
+            user_ids = [self._users_sorted[r] for r in unique_ranks]
+            columns = {"puzzle_id": self._puzzle_ids[rows]}
+            for column in self.columns:
+                columns[column] = self._values[column][rows]
+            return user_ids, positions.reshape(-1), columns
+
+    def get_by_users(
+        self, user_ids: list[str]
+    ) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        """
+        Every entry of the players in user_ids, as columns. Returns (positions,
+        columns): positions maps each row to its player in user_ids and columns
+        holds puzzle_id plus the entry columns.
+        """
+        with self._lock:
+            user_rows = [self.__user_rows(user_id) for user_id in user_ids]
+            rows = np.concatenate([np.zeros(0, dtype=np.int64), *user_rows])
+            positions = np.repeat(
+                np.arange(len(user_ids)), [len(r) for r in user_rows]
+            ).astype(np.int64)
+            columns = {"puzzle_id": self._puzzle_ids[rows]}
+            for column in self.columns:
+                columns[column] = self._values[column][rows]
+            return positions, columns
+
+    def count_by_user(self, puzzle_list: list[int]) -> tuple[list[str], np.ndarray]:
+        """Every tracked player in user_id order, with their entry count in the window."""
+        with self._lock:
+            self.__reindex()
+            size = self._size
+            mask = self._alive[:size] & np.isin(self._puzzle_ids[:size], puzzle_list)
+            ranks = self._user_rank[self._user_idx[:size][mask]]
+            counts = np.bincount(ranks, minlength=len(self._users_sorted))
+            return list(self._users_sorted), counts
+
+    ####################
+    #  HELPER METHODS  #
+    ####################
+
+    def __reset(self, capacity: int) -> None:
+        self._size = 0
+        self._puzzle_ids = np.zeros(capacity, dtype=np.int64)
+        self._user_idx = np.zeros(capacity, dtype=np.int64)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._values: dict[str, np.ndarray] = {
+            column: (
+                np.empty(capacity, dtype=object)
+                if column in self._text_columns
+                else np.full(capacity, np.nan)
+            )
+            for column in self.columns
+        }
+        self._users: list[str] = []
+        self._user_of: dict[str, int] = {}
+        self._row_of: dict[tuple[int, int], int] = {}
+        self._dirty = True
+
+    def __grow(self) -> None:
+        capacity = len(self._puzzle_ids) * 2
+        self._puzzle_ids = np.resize(self._puzzle_ids, capacity)
+        self._user_idx = np.resize(self._user_idx, capacity)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: self._size] = self._alive[: self._size]
+        self._alive = alive
+        for column, values in self._values.items():
+            grown = (
+                np.empty(capacity, dtype=object)
+                if column in self._text_columns
+                else np.full(capacity, np.nan)
+            )
+            grown[: self._size] = values[: self._size]
+            self._values[column] = grown
+
+    def __append_row(self, user_idx: int, puzzle_id: int) -> int:
+        if self._size == len(self._puzzle_ids):
+            self.__grow()
+        index = self._size
+        self._puzzle_ids[index] = puzzle_id
+        self._user_idx[index] = user_idx
+        self._alive[index] = True
+        self._size += 1
+        return index
+
+    def __user_index(self, user_id: str) -> int:
+        user_idx = self._user_of.get(user_id)
+        if user_idx is None:
+            user_idx = len(self._users)
+            self._users.append(user_id)
+            self._user_of[user_id] = user_idx
+            self._dirty = True
+        return user_idx
+
+    def __user_rows(self, user_id: str) -> np.ndarray:
+        self.__reindex()
+        user_idx = self._user_of.get(str(user_id))
+        if user_idx is None:
+            return np.zeros(0, dtype=np.int64)
+        start, end = self._user_offsets[user_idx], self._user_offsets[user_idx + 1]
+        return self._by_user[start:end]
+
+    def __reindex(self) -> None:
+        if not self._dirty:
+            return
+        rows = np.flatnonzero(self._alive[: self._size])
+
+        # per-user: rows grouped by user index, oldest first within a user
+        self._by_user = rows[np.argsort(self._user_idx[rows], kind="stable")]
+        self._user_offsets = np.searchsorted(
+            self._user_idx[self._by_user], np.arange(len(self._users) + 1)
+        )
+
+        # per-puzzle: rows grouped by puzzle id
+        self._by_puzzle = rows[np.argsort(self._puzzle_ids[rows], kind="stable")]
+        sorted_puzzles = self._puzzle_ids[self._by_puzzle]
+        self._puzzles = np.unique(sorted_puzzles)
+        self._puzzle_offsets = np.searchsorted(
+            sorted_puzzles, np.append(self._puzzles, np.iinfo(np.int64).max)
+        )
+
+        # user_id order, used for every per-player listing
+        order = sorted(range(len(self._users)), key=lambda u: int(self._users[u]))
+        self._users_sorted = [self._users[u] for u in order]
+        self._user_rank = np.zeros(len(self._users), dtype=np.int64)
+        self._user_rank[order] = np.arange(len(order))
+        self._dirty = False
+
+    def __to_tuples(self, rows: np.ndarray) -> list[tuple]:
+        columns = [self._puzzle_ids[rows].tolist()]
+        for column in self.columns:
+            values = self._values[column][rows]
+            if column in self._text_columns:
+                columns.append(values.tolist())
+            elif column in self._real_columns:
+                columns.append([None if np.isnan(v) else v for v in values.tolist()])
+            else:
+                columns.append(
+                    [None if np.isnan(v) else int(v) for v in values.tolist()]
+                )
+        return list(zip(*columns))
@@ -0,0 +1,173 @@
+import threading
+
+
+class ParticipationIndex:
+    """
+    Which players submitted which puzzles, kept as bitsets.
+
+    Every player gets a slot. Each puzzle maps to an int with a bit set per
+    slot that submitted it, and each slot maps to an int with a bit set per
+    puzzle it submitted (offset from the oldest puzzle seen). Window counts
+    are then an AND plus a popcount per player, and "who's missing" is an AND
+    NOT against everyone. Years of history for hundreds of players take well
+    under a megabyte.
+
+    Per-slot bits only cover MAX_SPAN puzzles from the oldest one, so a stray
+    far-off puzzle id can't make every row huge. Puzzles outside that span
+    are kept in the per-puzzle bitsets only.
+    """
+
+    MAX_SPAN: int = 1 << 15
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self.__reset()
+
+    def load(self, user_ids: list[str], rows: list[tuple]) -> None:
+        """Replace the contents with the tracked players and (user_id, puzzle_id) rows."""
+        with self._lock:
+            self.__reset()
+            for user_id in user_ids:
+                self.__slot(str(user_id))
+            for user_id, puzzle_id in rows:
+                self.add(str(user_id), puzzle_id)
+
+    ####################
+    #  WRITE METHODS   #
+    ####################
+
+    def add_user(self, user_id: str) -> None:
+        with self._lock:
+            self.__slot(str(user_id))
+
+    def add(self, user_id: str, puzzle_id: int) -> None:
+        with self._lock:
+            slot = self.__slot(str(user_id))
+            puzzle_id = int(puzzle_id)
+            self._by_puzzle[puzzle_id] = self._by_puzzle.get(puzzle_id, 0) | (1 << slot)
+            if self._base is None:
+                self._base = puzzle_id
+                self._end = puzzle_id + 1
+            elif puzzle_id < self._base:
+                if self._end - puzzle_id > self.MAX_SPAN:
+                    self._outliers.add(puzzle_id)
+                    return
+                # rare: an entry older than any seen, shift every row up
+                shift = self._base - puzzle_id
+                self._by_user = [bits << shift for bits in self._by_user]
+                self._base = puzzle_id
+            elif puzzle_id >= self._end:
+                if puzzle_id - self._base >= self.MAX_SPAN:
+                    self._outliers.add(puzzle_id)
+                    return
+                self._end = puzzle_id + 1
+            if puzzle_id not in self._outliers:
+                self._by_user[slot] |= 1 << (puzzle_id - self._base)
+
+    def remove(self, user_id: str, puzzle_id: int) -> None:
+        with self._lock:
+            slot = self._slot_of.get(str(user_id))
+            puzzle_id = int(puzzle_id)
+            if slot is None or puzzle_id not in self._by_puzzle:
+                return
+            bits = self._by_puzzle[puzzle_id] & ~(1 << slot)
+            if bits:
+                self._by_puzzle[puzzle_id] = bits
+            else:
+                del self._by_puzzle[puzzle_id]
+            if puzzle_id in self._outliers:
+                if not bits:
+                    self._outliers.discard(puzzle_id)
+            else:
+                self._by_user[slot] &= ~(1 << (puzzle_id - self._base))
+
+    ####################
+    #   READ METHODS   #
+    ####################
+
+    def has_user(self, user_id: str) -> bool:
+        return str(user_id) in self._slot_of
+
+    def get_users(self) -> list[str]:
+        """Every tracked player, in user_id order."""
+        with self._lock:
+            return [self._users[slot] for slot in self.__get_order()]
+
+    def get_puzzles(self) -> list[int]:
+        """Every puzzle with at least one entry, oldest first."""
+        with self._lock:
+            return sorted(self._by_puzzle)
+
+    def get_users_by_puzzle(self, puzzle_id: int) -> list[str]:
+        """Players who submitted puzzle_id, in user_id order."""
+        with self._lock:
+            return self.__users_in(self._by_puzzle.get(int(puzzle_id), 0))
+
+    def get_missing(self, puzzle_id: int) -> list[str]:
+        """Tracked players who haven't submitted puzzle_id, in user_id order."""
+        with self._lock:
+            return self.__users_in(
+                self._everyone & ~self._by_puzzle.get(int(puzzle_id), 0)
+            )
+
+    def count_by_user(self, puzzle_list: list[int]) -> tuple[list[str], list[int]]:
+        """Every tracked player in user_id order, with their entry count in the window."""
+        with self._lock:
+            mask = 0
+            # outliers aren't in the per-slot bits, count them per puzzle
+            extra = [0] * len(self._users)
+            for puzzle_id in set(int(p) for p in puzzle_list):
+                if puzzle_id in self._outliers:
+                    bits = self._by_puzzle[puzzle_id]
+                    for slot in range(len(self._users)):
+                        extra[slot] += bits >> slot & 1
+                elif puzzle_id in self._by_puzzle:
+                    mask |= 1 << (puzzle_id - self._base)
+            order = self.__get_order()
+            return (
+                [self._users[slot] for slot in order],
+                [
+                    (self._by_user[slot] & mask).bit_count() + extra[slot]
+                    for slot in order
+                ],
+            )
+
+    ####################
+    #  HELPER METHODS  #
+    ####################
+
+    def __reset(self) -> None:
+        self._users: list[str] = []
+        self._slot_of: dict[str, int] = {}
+        # a bit per slot, per puzzle and for every tracked player
+        self._by_puzzle: dict[int, int] = {}
+        self._everyone = 0
+        # a bit per puzzle from _base, per slot, for puzzles in [_base, _end)
+        self._by_user: list[int] = []
+        self._base: int = None
+        self._end: int = None
+        # puzzles too far from the rest for the per-slot bits
+        self._outliers: set[int] = set()
+        # slots in user_id order, rebuilt when a player is added
+        self._order: list[int] = None
+
+    def __slot(self, user_id: str) -> int:
+        slot = self._slot_of.get(user_id)
+        if slot is None:
+            slot = len(self._users)
+            self._users.append(user_id)
+            self._slot_of[user_id] = slot
+            self._by_user.append(0)
+            self._everyone |= 1 << slot
+            self._order = None
+        return slot
+
+    def __get_order(self) -> list[int]:
+        if self._order is None:
+            self._order = sorted(
+                range(len(self._users)), key=lambda slot: int(self._users[slot])
+            )
+        return self._order
+
+    def __users_in(self, bits: int) -> list[str]:
+        return [self._users[slot] for slot in self.__get_order() if bits >> slot & 1]
@@ -1,7 +1,9 @@
 import os, re
 from datetime import date
-from data.base_data_handler import BaseDatabaseHandler
-from models.pips import PipsPuzzleEntry
+from typing import Any
+from mysql.connector.cursor import MySQLCursor
+from data.base_data_handler import Aggregate, BaseDatabaseHandler
+from models.pips import PipsPlayerStats, PipsPuzzleEntry
 from utils.bot_utilities import BotUtilities
 from enum import Enum, auto
 
@@ -14,6 +16,28 @@ class PipsLevel(Enum):
 
 
 class PipsDatabaseHandler(BaseDatabaseHandler):
+    ENTRY_COLUMNS = [
+        "easy_seconds",
+        "medium_seconds",
+        "hard_seconds",
+        "easy_cookie",
+        "medium_cookie",
+        "hard_cookie",
+    ]
+    AGGREGATE_FIELDS = [
+        "easy_seconds",
+        "medium_seconds",
+        "hard_seconds",
+        "easy_cookie",
+        "medium_cookie",
+        "hard_cookie",
+        "easy_timed_cookie",
+        "medium_timed_cookie",
+        "hard_timed_cookie",
+        "total_seconds",
+    ]
+    HISTOGRAM_FIELDS = ["easy_cookie", "medium_cookie", "hard_cookie"]
+
     def __init__(self, utils: BotUtilities) -> None:
         # init
         super().__init__(utils)
@@ -28,9 +52,9 @@ class PipsDatabaseHandler(BaseDatabaseHandler):
         self._mysql_pass = os.environ.get("PIPS_MYSQL_PASS", "")
         self._mysql_db_name = os.environ.get("PIPS_MYSQL_DB_NAME", "pips")
 
-    def _init_tables(self) -> None:
+    def _init_tables(self, cur: MySQLCursor) -> None:
         """Create tables if they don't exist."""
-        self._cur.execute("""
+        cur.execute("""
             CREATE TABLE IF NOT EXISTS users (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 user_id BIGINT NOT NULL,
@@ -38,7 +62,7 @@ class PipsDatabaseHandler(BaseDatabaseHandler):
                 UNIQUE KEY uq_user_id(user_id)
             )
         """)
-        self._cur.execute("""
+        cur.execute("""
             CREATE TABLE IF NOT EXISTS entries (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 puzzle_id INT NOT NULL,
@@ -60,69 +84,95 @@ class PipsDatabaseHandler(BaseDatabaseHandler):
     #  PUZZLE METHODS  #
     ####################
 
-    def add_entry(self, user_id: str, title: str, puzzle: str) -> bool:
+    def _parse_entry(self, title: str, puzzle: str) -> dict[str, Any] | None:
         puzzle_id_title = re.findall(r"[\d,]+", title)
         cookie = puzzle.find("🍪") != -1
         level = self.__get_level_from_title(title).value
         seconds = self.__mm_ss_to_seconds(puzzle.replace("🍪", "").strip())
 
         if level == PipsLevel.UNKNOWN.value:
-            return False
+            return None
 
         if puzzle_id_title:
             puzzle_id = int(str(puzzle_id_title[0]).replace(",", ""))
         else:
-            return False
-
-        if not self._db.is_connected():
-            self.connect()
-
-        if not self.user_exists(user_id):
-            user_name = self._utils.get_nickname(user_id)
-            self._cur.execute(
-                "insert into users (user_id, name) values ('{}', '{}')".format(
-                    user_id, user_name
-                )
-            )
+            return None
+        if not self._is_valid_puzzle_id(puzzle_id):
+            return None
 
-        if self.entry_exists(user_id, puzzle_id):
-            self._cur.execute(
-                f"update entries set {level}_cookie = {cookie}, {level}_seconds = {seconds} "
-                + f"where user_id = '{user_id}' and puzzle_id = '{puzzle_id}'"
-            )
-            self._db.commit()
-            return True
-        else:
-            self._cur.execute(
-                f"insert into entries (puzzle_id, user_id, {level}_cookie, {level}_seconds) "
-                + f"values ({puzzle_id}, {user_id}, {cookie}, {seconds})"
+        # only this level's columns, so the other levels of the puzzle are kept
+        return {
+            "puzzle_id": puzzle_id,
+            f"{level}_cookie": cookie,
+            f"{level}_seconds": seconds,
+        }
+
+    def _entry_from_row(self, user_id: str, row: tuple) -> PipsPuzzleEntry:
+        return PipsPuzzleEntry(
+            row[0], user_id, row[1], row[2], row[3], row[4], row[5], row[6]
+        )
+
+    def _aggregate_values(self, entry: PipsPuzzleEntry) -> dict[str, int | None]:
+        values = {}
+        for level in ["easy", "medium", "hard"]:
+            seconds = getattr(entry, f"{level}_seconds")
+            cookie = getattr(entry, f"{level}_cookie")
+            values[f"{level}_seconds"] = seconds
+            values[f"{level}_cookie"] = cookie
+            # only cookies on a timed level count towards the cookie rate
+            values[f"{level}_timed_cookie"] = (
+                bool(cookie) if seconds is not None else None
             )
-            self._db.commit()
-            return self._cur.rowcount > 0
+        levels = [entry.easy_seconds, entry.medium_seconds, entry.hard_seconds]
+        values["total_seconds"] = sum(levels) if None not in levels else None
+        return values
 
     ####################
     #  PLAYER METHODS  #
     ####################
 
-    def get_entries_by_player(
-        self, user_id: str, puzzle_list: list[int] = []
-    ) -> list[PipsPuzzleEntry]:
-        if not self._db.is_connected():
-            self.connect()
-        if not puzzle_list or len(puzzle_list) == 0:
-            query = f"select puzzle_id, easy_seconds, medium_seconds, hard_seconds, easy_cookie, medium_cookie, hard_cookie from entries where user_id = {user_id}"
-        else:
-            puzzle_list_str = ",".join([str(p_id) for p_id in puzzle_list])
-            query = f"select puzzle_id, easy_seconds, medium_seconds, hard_seconds, easy_cookie, medium_cookie, hard_cookie from entries where user_id = {user_id} and puzzle_id in ({puzzle_list_str})"
-        self._cur.execute(query)
-        entries: list[PipsPuzzleEntry] = []
-        for row in self._cur.fetchall():
-            entries.append(
-                PipsPuzzleEntry(
-                    row[0], user_id, row[1], row[2], row[3], row[4], row[5], row[6]
-                )
+    def get_player_stats(self, puzzle_list: list[int]) -> list[PipsPlayerStats]:
+        if self._store is not None:
+            return PipsPlayerStats.from_arrays(
+                *self._store.get_window(puzzle_list), len(puzzle_list)
+            )
+        aggregates = []
+        for level in ["easy", "medium", "hard"]:
+            aggregates += [
+                f"count(e.{level}_seconds)",
+                f"sum(e.{level}_seconds)",
+                f"sum(e.{level}_seconds is not null and e.{level}_cookie)",
+            ]
+        all_levels = "e.easy_seconds is not null and e.medium_seconds is not null and e.hard_seconds is not null"
+        aggregates += [
+            f"sum({all_levels})",
+            f"sum(if({all_levels}, e.easy_seconds + e.medium_seconds + e.hard_seconds, 0))",
+        ]
+        rows = self._get_window_aggregates(aggregates, puzzle_list)
+        return [
+            PipsPlayerStats.from_aggregates(
+                str(row[0]),
+                len(puzzle_list) - row[1],
+                (row[2], row[3], row[4]),
+                (row[5], row[6], row[7]),
+                (row[8], row[9], row[10]),
+                (row[11], row[12]),
             )
-        return entries
+            for row in rows
+        ]
+
+    def _stats_from_aggregates(
+        self, user_id: str, missed_games: int, aggregates: dict[str, Aggregate]
+    ) -> PipsPlayerStats:
+        levels = []
+        for level in ["easy", "medium", "hard"]:
+            seconds = aggregates.get(f"{level}_seconds", (0, 0, 0))
+            cookies = aggregates.get(f"{level}_timed_cookie", (0, 0, 0))
+            levels.append((seconds[0], seconds[1], cookies[1]))
+        total = aggregates.get("total_seconds", (0, 0, 0))
+        return PipsPlayerStats.from_aggregates(
+            user_id, missed_games, *levels, (total[0], total[1])
+        )
 
     ####################
     #  HELPER METHODS  #
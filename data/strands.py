@@ -1,11 +1,30 @@
 import os, re
+import numpy as np
 from datetime import date
-from data.base_data_handler import BaseDatabaseHandler
-from models.strands import StrandsPuzzleEntry
+from typing import Any
+from mysql.connector.cursor import MySQLCursor
+from data.base_data_handler import Aggregate, BaseDatabaseHandler
+from models.base_game import to_fixed_point
+from models.strands import StrandsPlayerStats, StrandsPuzzleEntry
 from utils.bot_utilities import BotUtilities
 
 
 class StrandsDatabaseHandler(BaseDatabaseHandler):
+    ENTRY_COLUMNS = [
+        "hints",
+        "grid",
+        "puzzle_str",
+        "spangram_index",
+        "word_count",
+        "rating",
+    ]
+    ENTRY_TEXT_COLUMNS = ["grid", "puzzle_str"]
+    ENTRY_REAL_COLUMNS = ["rating"]
+    # derived from puzzle_str when an entry is written
+    METRIC_COLUMNS = {"spangram_index": "INT", "word_count": "INT", "rating": "DOUBLE"}
+    AGGREGATE_FIELDS = ["hints", "spangram_index", "rating"]
+    HISTOGRAM_FIELDS = ["hints"]
+
     def __init__(self, utils: BotUtilities) -> None:
         # init
         super().__init__(utils)
@@ -20,9 +39,9 @@ class StrandsDatabaseHandler(BaseDatabaseHandler):
         self._mysql_pass = os.environ.get("STRANDS_MYSQL_PASS", "")
         self._mysql_db_name = os.environ.get("STRANDS_MYSQL_DB_NAME", "strands")
 
-    def _init_tables(self) -> None:
+    def _init_tables(self, cur: MySQLCursor) -> None:
         """Create tables if they don't exist."""
-        self._cur.execute("""
+        cur.execute("""
             CREATE TABLE IF NOT EXISTS users (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 user_id BIGINT NOT NULL,
@@ -30,75 +49,142 @@ class StrandsDatabaseHandler(BaseDatabaseHandler):
                 UNIQUE KEY uq_user_id(user_id)
             )
         """)
-        self._cur.execute("""
+        cur.execute("""
             CREATE TABLE IF NOT EXISTS entries (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 puzzle_id INT NOT NULL,
                 user_id BIGINT NOT NULL,
                 hints INT,
+                grid VARBINARY(32),
                 puzzle_str TEXT,
+                spangram_index INT,
+                word_count INT,
+                rating DOUBLE,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 UNIQUE KEY uq_puzzle_user(puzzle_id, user_id),
                 INDEX idx_puzzle_id(puzzle_id),
                 INDEX idx_user_id(user_id)
             )
         """)
+        self._add_entry_columns(cur, {**self.METRIC_COLUMNS, "grid": "VARBINARY(32)"})
+        filled = self._backfill_entries(
+            cur,
+            "rating is null",
+            ["hints", "puzzle_str"],
+            lambda row: dict(
+                zip(
+                    self.METRIC_COLUMNS,
+                    StrandsPuzzleEntry.get_metrics(row[0] or 0, row[1] or ""),
+                )
+            ),
+        )
+        if filled > 0:
+            print(f"Backfilled Strands metrics for {filled} entries")
+        filled = self._backfill_entries(
+            cur,
+            "grid is null and puzzle_str is not null",
+            ["puzzle_str"],
+            lambda row: self.__encode_grid(row[0]),
+        )
+        if filled > 0:
+            print(f"Encoded Strands grids for {filled} entries")
 
     ####################
     #  PUZZLE METHODS  #
     ####################
 
-    def add_entry(self, user_id: str, title: str, puzzle: str) -> bool:
+    def _parse_entry(self, title: str, puzzle: str) -> dict[str, Any] | None:
         puzzle_id_title = re.findall(r"[\d,]+", title)
         hints = puzzle.count("💡")
 
         if puzzle_id_title:
             puzzle_id = int(str(puzzle_id_title[0]).replace(",", ""))
         else:
-            return False
+            return None
+        if not self._is_valid_puzzle_id(puzzle_id):
+            return None
 
-        if not self._db.is_connected():
-            self.connect()
+        spangram_index, word_count, rating = StrandsPuzzleEntry.get_metrics(
+            hints, puzzle
+        )
+        return {
+            "puzzle_id": puzzle_id,
+            "hints": hints,
+            **self.__encode_grid(puzzle),
+            "spangram_index": spangram_index,
+            "word_count": word_count,
+            "rating": rating,
+        }
 
-        if not self.user_exists(user_id):
-            user_name = self._utils.get_nickname(user_id)
-            self._cur.execute(
-                "insert into users (user_id, name) values ('{}', '{}')".format(
-                    user_id, user_name
-                )
-            )
+    def _entry_from_row(self, user_id: str, row: tuple) -> StrandsPuzzleEntry:
+        return StrandsPuzzleEntry(row[0], user_id, *row[1:])
 
-        if self.entry_exists(user_id, puzzle_id):
-            self._cur.execute(
-                f"update entries set hints = {hints}, puzzle_str = '{puzzle}' "
-                + f"where user_id = '{user_id}' and puzzle_id = '{puzzle_id}'"
-            )
-            self._db.commit()
-            return True
-        else:
-            self._cur.execute(
-                "insert into entries (puzzle_id, user_id, hints, puzzle_str) "
-                + f"values ({puzzle_id}, {user_id}, {hints}, '{puzzle}')"
-            )
-            self._db.commit()
-            return self._cur.rowcount > 0
+    def _aggregate_values(self, entry: StrandsPuzzleEntry) -> dict[str, int | None]:
+        return {
+            "hints": entry.hints,
+            "spangram_index": (
+                entry.spangram_index if entry.spangram_index > 0 else None
+            ),
+            # kept in fixed point so the all-time mean is rounded once
+            "rating": to_fixed_point(entry.rating),
+        }
 
     ####################
     #  PLAYER METHODS  #
     ####################
 
-    def get_entries_by_player(
-        self, user_id: str, puzzle_list: list[int] = []
-    ) -> list[StrandsPuzzleEntry]:
-        if not self._db.is_connected():
-            self.connect()
-        if not puzzle_list or len(puzzle_list) == 0:
-            query = f"select puzzle_id, hints, puzzle_str from entries where user_id = {user_id}"
-        else:
-            puzzle_list_str = ",".join([str(p_id) for p_id in puzzle_list])
-            query = f"select puzzle_id, hints, puzzle_str from entries where user_id = {user_id} and puzzle_id in ({puzzle_list_str})"
-        self._cur.execute(query)
-        entries: list[StrandsPuzzleEntry] = []
-        for row in self._cur.fetchall():
-            entries.append(StrandsPuzzleEntry(row[0], user_id, row[1], row[2]))
-        return entries
+    def get_player_stats(self, puzzle_list: list[int]) -> list[StrandsPlayerStats]:
+        # ratings are summed in fixed point, so reduce the window's rows here
+        # rather than with SQL sums
+        if not puzzle_list:
+            return []
+        if self._store is not None:
+            return StrandsPlayerStats.from_arrays(
+                *self._store.get_window(puzzle_list), len(puzzle_list)
+            )
+        user_ids, positions, rows = [], [], self.__get_window_rows(puzzle_list)
+        for row in rows:
+            user_id = str(row[0])
+            if not user_ids or user_ids[-1] != user_id:
+                user_ids.append(user_id)
+            positions.append(len(user_ids) - 1)
+        columns = {
+            column: np.array([row[i + 1] for row in rows], dtype=np.float64)
+            for i, column in enumerate(["hints", "spangram_index", "rating"])
+        }
+        return StrandsPlayerStats.from_arrays(
+            user_ids, np.array(positions, dtype=np.int64), columns, len(puzzle_list)
+        )
+
+    def _stats_from_aggregates(
+        self, user_id: str, missed_games: int, aggregates: dict[str, Aggregate]
+    ) -> StrandsPlayerStats:
+        spangram = aggregates.get("spangram_index", (0, 0, 0))
+        return StrandsPlayerStats.from_aggregates(
+            user_id,
+            missed_games,
+            aggregates["entries"][0],
+            aggregates["hints"][1],
+            (spangram[0], spangram[1]),
+            aggregates["rating"][1],
+        )
+
+    ####################
+    #  HELPER METHODS  #
+    ####################
+
+    def __encode_grid(self, puzzle: str) -> dict[str, Any]:
+        """The grid and puzzle_str columns, keeping the text only if it can't be packed."""
+        grid = StrandsPuzzleEntry.encode_grid(puzzle)
+        return {"grid": grid, "puzzle_str": puzzle if grid is None else None}
+
+    def __get_window_rows(self, puzzle_list: list[int]) -> list[tuple]:
+        with self._cursor() as cur:
+            cur.execute(
+                "select e.user_id, e.hints, e.spangram_index, e.rating "
+                + "from entries e join users u on u.user_id = e.user_id "
+                + f"where e.puzzle_id in ({', '.join(['%s'] * len(puzzle_list))}) "
+                + "order by e.user_id",
+                list(puzzle_list),
+            )
+            return cur.fetchall()
@@ -1,11 +1,20 @@
 import os, re
+import numpy as np
 from datetime import date
-from data.base_data_handler import BaseDatabaseHandler
-from models.wordle import WordlePuzzleEntry
+from typing import Any
+from mysql.connector.cursor import MySQLCursor
+from data.base_data_handler import Aggregate, BaseDatabaseHandler
+from models.wordle import WordleGridStats, WordlePlayerStats, WordlePuzzleEntry
 from utils.bot_utilities import BotUtilities
 
 
 class WordleDatabaseHandler(BaseDatabaseHandler):
+    ENTRY_COLUMNS = ["score", "green", "yellow", "other", "grid"]
+    # packed grids use up to 60 bits, more than a float64 holds exactly
+    ENTRY_TEXT_COLUMNS = ["grid"]
+    AGGREGATE_FIELDS = ["score", "green", "yellow", "other"]
+    HISTOGRAM_FIELDS = ["score"]
+
     def __init__(self, utils: BotUtilities) -> None:
         # init
         super().__init__(utils)
@@ -20,9 +29,9 @@ class WordleDatabaseHandler(BaseDatabaseHandler):
         self._mysql_pass = os.environ.get("WORDLE_MYSQL_PASS", "")
         self._mysql_db_name = os.environ.get("WORDLE_MYSQL_DB_NAME", "wordle")
 
-    def _init_tables(self) -> None:
+    def _init_tables(self, cur: MySQLCursor) -> None:
         """Create tables if they don't exist."""
-        self._cur.execute("""
+        cur.execute("""
             CREATE TABLE IF NOT EXISTS users (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 user_id BIGINT NOT NULL,
@@ -30,7 +39,7 @@ class WordleDatabaseHandler(BaseDatabaseHandler):
                 UNIQUE KEY uq_user_id(user_id)
             )
         """)
-        self._cur.execute("""
+        cur.execute("""
             CREATE TABLE IF NOT EXISTS entries (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 puzzle_id INT NOT NULL,
@@ -39,25 +48,28 @@ class WordleDatabaseHandler(BaseDatabaseHandler):
                 green INT,
                 yellow INT,
                 other INT,
+                grid BIGINT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 UNIQUE KEY uq_puzzle_user(puzzle_id, user_id),
                 INDEX idx_puzzle_id(puzzle_id),
                 INDEX idx_user_id(user_id)
             )
         """)
+        # older entries only kept the tile counts, so there's nothing to backfill
+        self._add_entry_columns(cur, {"grid": "BIGINT"})
 
     ####################
     #  PUZZLE METHODS  #
     ####################
 
-    def add_entry(self, user_id: str, title: str, puzzle: str) -> bool:
+    def _parse_entry(self, title: str, puzzle: str) -> dict[str, Any] | None:
         if "X/6" in title:
             reg_match = re.search(r"\d{1,3}(,\d{3})*", title)
             if reg_match:
                 puzzle_id = reg_match.group(0).replace(",", "")
                 score = 7
             else:
-                return False
+                return None
         else:
             reg_match = re.search(r"\d{1,3}(,\d{3})*", title)
             if reg_match:
@@ -66,61 +78,80 @@ class WordleDatabaseHandler(BaseDatabaseHandler):
                 if reg_match:
                     score = reg_match.group(1)
                 else:
-                    return False
+                    return None
             else:
-                return False
+                return None
 
         puzzle_id = int(puzzle_id)
-        score = int(score)
+        if not self._is_valid_puzzle_id(puzzle_id):
+            return None
 
-        total_green = puzzle.count("🟩")
-        total_yellow = puzzle.count("🟨")
-        total_other = puzzle.count("⬜") + puzzle.count("⬛")
+        return {
+            "puzzle_id": puzzle_id,
+            "score": int(score),
+            "green": puzzle.count("🟩"),
+            "yellow": puzzle.count("🟨"),
+            "other": puzzle.count("⬜") + puzzle.count("⬛"),
+            "grid": WordlePuzzleEntry.encode_grid(puzzle),
+        }
 
-        if not self._db.is_connected():
-            self.connect()
+    def _entry_from_row(self, user_id: str, row: tuple) -> WordlePuzzleEntry:
+        return WordlePuzzleEntry(row[0], user_id, *row[1:])
 
-        if not self.user_exists(user_id):
-            user_name = self._utils.get_nickname(user_id)
-            self._cur.execute(
-                "insert into users (user_id, name) values ('{}', '{}')".format(
-                    user_id, user_name
-                )
-            )
+    ####################
+    #  PLAYER METHODS  #
+    ####################
 
-        if self.entry_exists(user_id, puzzle_id):
-            self._cur.execute(
-                f"update entries set score = {score}, green = {total_green}, yellow = {total_yellow}, other = {total_other} "
-                + f"where user_id = '{user_id}' and puzzle_id = '{puzzle_id}'"
+    def get_player_stats(self, puzzle_list: list[int]) -> list[WordlePlayerStats]:
+        if self._store is not None:
+            return WordlePlayerStats.from_arrays(
+                *self._store.get_window(puzzle_list), len(puzzle_list)
             )
-            self._db.commit()
-            return True
-        else:
-            self._cur.execute(
-                "insert into entries (puzzle_id, user_id, score, green, yellow, other) "
-                + f"values ({puzzle_id}, {user_id}, {score}, {total_green}, {total_yellow}, {total_other})"
+        rows = self._get_window_aggregates(
+            ["sum(e.score)", "sum(e.green)", "sum(e.yellow)", "sum(e.other)"],
+            puzzle_list,
+        )
+        return [
+            WordlePlayerStats.from_aggregates(
+                str(row[0]), len(puzzle_list) - row[1], *row[1:]
             )
-            self._db.commit()
-            return self._cur.rowcount > 0
+            for row in rows
+        ]
 
-    ####################
-    #  PLAYER METHODS  #
-    ####################
+    def _stats_from_aggregates(
+        self, user_id: str, missed_games: int, aggregates: dict[str, Aggregate]
+    ) -> WordlePlayerStats:
+        return WordlePlayerStats.from_aggregates(
+            user_id,
+            missed_games,
+            aggregates["entries"][0],
+            *[aggregates.get(field, (0, 0, 0))[1] for field in self.AGGREGATE_FIELDS],
+        )
 
-    def get_entries_by_player(
-        self, user_id: str, puzzle_list: list[int] = []
-    ) -> list[WordlePuzzleEntry]:
-        if not self._db.is_connected():
-            self.connect()
-        if not puzzle_list or len(puzzle_list) == 0:
-            query = f"select puzzle_id, score, green, yellow, other from entries where user_id = {user_id}"
+    def get_grid_stats(self, user_ids: list[str]) -> dict[str, WordleGridStats]:
+        """Per-guess stats for each player with at least one recorded grid."""
+        if not user_ids:
+            return {}
+        if self._store is not None:
+            positions, columns = self._store.get_by_users(user_ids)
+            found = np.not_equal(columns["grid"], None)
+            positions = positions[found]
+            grids = columns["grid"][found].astype(np.int64)
         else:
-            puzzle_list_str = ",".join([str(p_id) for p_id in puzzle_list])
-            query = f"select puzzle_id, score, green, yellow, other from entries where user_id = {user_id} and puzzle_id in ({puzzle_list_str})"
-        self._cur.execute(query)
-        entries: list[WordlePuzzleEntry] = []
-        for row in self._cur.fetchall():
-            entries.append(
-                WordlePuzzleEntry(row[0], user_id, row[1], row[2], row[3], row[4])
-            )
-        return entries
+            with self._cursor() as cur:
+                cur.execute(
+                    "select user_id, grid from entries where grid is not null "
+                    + f"and user_id in ({', '.join(['%s'] * len(user_ids))})",
+                    list(user_ids),
+                )
+                rows = cur.fetchall()
+            index = {user_id: i for i, user_id in enumerate(user_ids)}
+            positions = np.array([index[str(row[0])] for row in rows], dtype=np.int64)
+            grids = np.array([row[1] for row in rows], dtype=np.int64)
+        return WordleGridStats.from_grids(user_ids, positions, grids)
+
+    async def get_grid_stats_async(
+        self, user_ids: list[str]
+    ) -> dict[str, WordleGridStats]:
+        await self.flush_entries_async()
+        return await self.run(self.get_grid_stats, user_ids)
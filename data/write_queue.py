@@ -0,0 +1,208 @@
+import asyncio, json, os, threading
+from typing import Any, Awaitable, Callable
+
+# a queued entry: (user_id, entries columns to write)
+QueuedEntry = tuple[str, dict[str, Any]]
+
+
+def _encode_value(value: Any) -> Any:
+    # binary columns (encoded grids) are journaled as tagged hex
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": bytes(value).hex()}
+    raise TypeError(f"Can't journal {type(value).__name__}")
+
+
+def _decode_value(record: dict[str, Any]) -> Any:
+    if len(record) == 1 and "__bytes__" in record:
+        return bytes.fromhex(record["__bytes__"])
+    return record
+
+
+class WriteBehindQueue:
+    """
+    Buffers parsed entries and writes them in batches.
+    - flush: coroutine that writes a batch of entries, in order
+    - journal_path: JSON-lines file every queued entry is appended to (and
+      fsynced) before it is acknowledged, replayed by start() after a crash
+    - flush_ms: longest an entry waits before its batch is written
+    - flush_rows: write as soon as this many entries are waiting
+    - row_errors: exceptions from flush that mean an entry itself was rejected
+    - on_dead_letter: coroutine told about entries that were rejected
+    If a batch fails its entries are written one at a time, and any rejected
+    with one of row_errors are moved to a .dead.jsonl file next to the
+    journal instead of holding up everything queued behind them.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[list[QueuedEntry]], Awaitable[None]],
+        journal_path: str,
+        flush_ms: int = 500,
+        flush_rows: int = 50,
+        row_errors: tuple[type[Exception], ...] = (),
+        on_dead_letter: Callable[[list[QueuedEntry]], Awaitable[None]] = None,
+    ) -> None:
+        self._flush = flush
+        self._journal_path = journal_path
+        self._dead_letter_path = f"{os.path.splitext(journal_path)[0]}.dead.jsonl"
+        self._row_errors = row_errors
+        self._on_dead_letter = on_dead_letter
+        self._flush_seconds = max(flush_ms, 1) / 1000
+        self._flush_rows = max(flush_rows, 1)
+        self._pending: list[QueuedEntry] = []
+        # guards _pending and the journal file, which are touched from threads
+        self._lock = threading.Lock()
+        self._flush_lock: asyncio.Lock = None
+        self._wake: asyncio.Event = None
+        self._task: asyncio.Task = None
+
+    async def start(self) -> None:
+        """Replay anything left in the journal and start the background flusher."""
+        if self._task is not None:
+            return
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        replayed = await asyncio.to_thread(self.__load_journal)
+        if replayed > 0:
+            print(f"Replaying {replayed} journaled entries from {self._journal_path}")
+            self._wake.set()
+        self._task = asyncio.create_task(self.__run())
+
+    async def put(self, user_id: str, row: dict[str, Any]) -> None:
+        """Journal the entry, then queue it. Returns once the entry is durable."""
+        await asyncio.to_thread(self.__append, (user_id, row))
+        if len(self._pending) >= self._flush_rows:
+            self._wake.set()
+
+    async def flush(self) -> None:
+        """Write everything queued so far."""
+        if self._flush_lock is None:
+            return
+        async with self._flush_lock:
+            with self._lock:
+                batch = self._pending
+                self._pending = []
+            if not batch:
+                return
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                if len(batch) == 1 and not isinstance(e, self._row_errors):
+                    # keep the entry (it's still in the journal) and retry next tick
+                    with self._lock:
+                        self._pending = batch + self._pending
+                    raise
+                # find the entries at fault instead of retrying the batch forever
+                await self.__flush_each(batch)
+                return
+            await asyncio.to_thread(self.__rewrite_journal)
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush()
+
+    ####################
+    #  HELPER METHODS  #
+    ####################
+
+    async def __flush_each(self, batch: list[QueuedEntry]) -> None:
+        dead: list[tuple[QueuedEntry, Exception]] = []
+        error = None
+        for i, entry in enumerate(batch):
+            try:
+                await self._flush([entry])
+            except self._row_errors as e:
+                dead.append((entry, e))
+            except Exception as e:
+                # not the entry's fault (e.g. the database is down), retry the rest
+                with self._lock:
+                    self._pending = batch[i:] + self._pending
+                error = e
+                break
+        if dead:
+            await asyncio.to_thread(self.__write_dead_letters, dead)
+        await asyncio.to_thread(self.__rewrite_journal)
+        if dead:
+            print(
+                f"Moved {len(dead)} rejected entries to {self._dead_letter_path}: "
+                + "; ".join(str(e) for _, e in dead)
+            )
+            if self._on_dead_letter is not None:
+                await self._on_dead_letter([entry for entry, _ in dead])
+        if error is not None:
+            raise error
+
+    async def __run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self._flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Failed to flush queued entries: {e}")
+
+    def __append(self, entry: QueuedEntry) -> None:
+        record = json.dumps(
+            {"user_id": entry[0], "row": entry[1]},
+            ensure_ascii=False,
+            default=_encode_value,
+        )
+        with self._lock:
+            with open(self._journal_path, "a", encoding="utf-8") as fh:
+                fh.write(record + "\n")
+                fh.flush()
+                os.fsync(fh.fileno())
+            self._pending.append(entry)
+
+    def __write_dead_letters(self, dead: list[tuple[QueuedEntry, Exception]]) -> None:
+        with open(self._dead_letter_path, "a", encoding="utf-8") as fh:
+            for (user_id, row), error in dead:
+                record = {"user_id": user_id, "row": row, "error": str(error)}
+                fh.write(
+                    json.dumps(record, ensure_ascii=False, default=_encode_value) + "\n"
+                )
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def __rewrite_journal(self) -> None:
+        """Replace the journal with whatever was queued while the last batch was written."""
+        with self._lock:
+            tmp_path = f"{self._journal_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                for user_id, row in self._pending:
+                    record = {"user_id": user_id, "row": row}
+                    fh.write(
+                        json.dumps(record, ensure_ascii=False, default=_encode_value)
+                        + "\n"
+                    )
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp_path, self._journal_path)
+
+    def __load_journal(self) -> int:
+        os.makedirs(os.path.dirname(self._journal_path) or ".", exist_ok=True)
+        entries: list[QueuedEntry] = []
+        try:
+            with open(self._journal_path, "r", encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        record = json.loads(line, object_hook=_decode_value)
+                        entries.append((record["user_id"], record["row"]))
+                    except (ValueError, KeyError):
+                        # a write cut short by a crash, nothing was acknowledged for it
+                        print(f"Skipping unreadable journal line: {line!r}")
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._pending = entries + self._pending
+        return len(entries)
@@ -1,11 +1,29 @@
+import asyncio, os, re
+import pandas as pd
+from collections import OrderedDict
+from datetime import timedelta
 from discord.ext import commands
 from typing import Protocol
-from data.base_data_handler import BaseDatabaseHandler
+from data.base_data_handler import BaseDatabaseHandler, EntryWriteResult
+from models.base_game import PuzzleQueryType
+from models.live_board import LiveBoard
 from utils.bot_utilities import BotUtilities
+from utils.single_flight import SingleFlight
+
+# keep the default ?ranks views rendered ahead of time
+_ranks_precompute_enabled = os.environ.get(
+    "RANKS_PRECOMPUTE_ENABLED", "True"
+).lower() in ("true", "1", "t")
 
 
 class BaseCommandHandler(Protocol):
     MAX_DATAFRAME_ROWS: int = 10
+    # ?ranks arguments rendered at every rollover and after each submission
+    PRECOMPUTED_RANKS: list[tuple[str, ...]] = [(), ("today",), ("week",)]
+    # rendered ?ranks windows kept, most recently used first
+    RANKS_CACHE_SIZE: int = 16
+    # wait this long after a submission for more before re-rendering
+    PRECOMPUTE_DELAY_SECONDS: float = 2.0
 
     db: BaseDatabaseHandler
     utils: BotUtilities
@@ -13,22 +31,150 @@ class BaseCommandHandler(Protocol):
     def __init__(self, utils: BotUtilities, db: BaseDatabaseHandler) -> None:
         self.utils = utils
         self.db = db
+        # (query type, puzzles) -> (version it was rendered at, png or None if no players)
+        self._ranks_cache: OrderedDict[
+            tuple[PuzzleQueryType, tuple[int, ...]],
+            tuple[tuple[bool, int, int], bytes | None],
+        ] = OrderedDict()
+        # concurrent identical ?ranks queries share one render
+        self._ranks_flight = SingleFlight()
+        # ...and concurrent identical ?stats queries one fetch and render
+        self._stats_flight = SingleFlight()
+        self._ranks_stale = asyncio.Event()
+        self._precompute_task: asyncio.Task = None
+        # today's puzzle, ranked as entries come in (built on first use each day)
+        self._live_board: LiveBoard = None
+        self._live_board_lock = asyncio.Lock()
+        self.db.on_entries_written = self.__on_entries_written
+
+    async def connect(self) -> None:
+        await self.db.connect_async()
+        self.utils.add_stored_names(await self.db.get_user_names_async())
+
+    def start_precompute(self) -> None:
+        """Start rendering the default ?ranks views in the background."""
+        if _ranks_precompute_enabled and self._precompute_task is None:
+            self._precompute_task = asyncio.create_task(self.__precompute_ranks())
 
-    def connect(self) -> None:
-        self.db.connect()
+    async def close(self) -> None:
+        if self._precompute_task is not None:
+            self._precompute_task.cancel()
+            try:
+                await self._precompute_task
+            except asyncio.CancelledError:
+                pass
+            self._precompute_task = None
+        await self.db.close_async()
 
     ######################
     #   MEMBER METHODS   #
     ######################
 
-    def add_entry(self, user_id: str, title: str, puzzle: str) -> bool:
-        return self.db.add_entry(user_id, title, puzzle)
+    async def add_entry(
+        self, user_id: str, title: str, puzzle: str
+    ) -> EntryWriteResult:
+        result = await self.db.queue_entry_async(user_id, title, puzzle)
+        if result:
+            self._ranks_stale.set()
+            # without the store, live stats come from MySQL: the board picks
+            # the entry up once its batch is written
+            if result != EntryWriteResult.QUEUED or self.db.has_entry_store():
+                await self._update_live_board(user_id)
+        return result
 
     async def get_ranks(self, ctx: commands.Context, *args: str) -> None:
-        pass
+        window = await self._get_ranks_window(ctx, *args)
+        if window is None:
+            return
+        valid_puzzles, explanation_str, query_type = window
+
+        found, ranks_png = await self._get_ranks_png(valid_puzzles, query_type)
+        if not found:
+            await ctx.reply(f"Sorry, no users could be found for this query.")
+        elif ranks_png is not None:
+            await ctx.send(
+                f"Leaderboard 🧩: {explanation_str}",
+                file=self.utils.get_file_from_png(ranks_png),
+            )
+        else:
+            await ctx.reply(
+                "Sorry, there was an issue fetching ranks. Please try again later."
+            )
+
+    async def get_rank(self, ctx: commands.Context, *args: str) -> None:
+        if len(args) == 0 or (len(args) == 1 and args[0] == "me"):
+            user_id = str(ctx.author.id)
+        elif len(args) == 1 and self.utils.is_user(args[0]):
+            user_id = args[0].strip("<@!> ")
+        else:
+            await ctx.reply("Couldn't understand command. Try `?help rank`.")
+            return
+
+        async with self._live_board_lock:
+            board = await self.__get_live_board()
+        name = self.utils.get_nickname(user_id)
+        rank = board.get_rank(user_id)
+        if rank is None:
+            await ctx.reply(f"{name} hasn't submitted Puzzle #{board.puzzle_id} yet.")
+            return
+
+        message = (
+            f"{name} is ranked #{rank} of {len(board)} for Puzzle #{board.puzzle_id}"
+        )
+        ties = board.get_ties(user_id)
+        if len(ties) > 0:
+            names = self.utils.get_nicknames(p.user_id for p in ties)
+            message += f", tied with {', '.join(names.values())}"
+        above, below = board.get_neighbors(user_id)
+        if above is not None:
+            message += f". Next up: {self.utils.get_nickname(above.user_id)} (#{board.get_rank(above.user_id)})"
+        if below is not None:
+            message += f". Right behind: {self.utils.get_nickname(below.user_id)} (#{board.get_rank(below.user_id)})"
+        await ctx.reply(message + ".")
 
     async def get_missing(self, ctx: commands.Context, *args: str) -> None:
-        pass
+        if len(args) == 1 and args[0] in ["week", "weekly"]:
+            # MISSING ANY PUZZLE THIS WEEK (SO FAR)
+            start_of_week = self.utils.get_week_start(self.utils.get_todays_date())
+            todays_puzzle_id = self.db.get_puzzle_by_date(self.utils.get_todays_date())
+            week_puzzles = [
+                p_id
+                for p_id in self.db.get_puzzles_by_week(start_of_week)
+                if p_id <= todays_puzzle_id
+            ]
+            missing = await self.db.get_players_missing_any_async(week_puzzles)
+            if len(missing) == 0:
+                await ctx.reply(
+                    "All tracked players have submitted every puzzle this week!"
+                )
+            else:
+                await ctx.reply(
+                    "The following players are missing puzzles this week: {}".format(
+                        ", ".join(
+                            f"<@{user_id}> ({missed_games})"
+                            for user_id, missed_games in missing
+                        )
+                    )
+                )
+            return
+
+        if len(args) == 0:
+            puzzle_id = self.db.get_puzzle_by_date(self.utils.get_todays_date())
+        elif len(args) == 1 and re.match(r"^[#]?\d+$", args[0]):
+            puzzle_id = int(args[0].strip("# "))
+        else:
+            await ctx.reply("Couldn't understand command. Try `?help missing`")
+            return
+
+        missing_ids = await self.db.get_players_missing_puzzle_async(puzzle_id)
+        if len(missing_ids) == 0:
+            await ctx.reply(f"All tracked players have submitted Puzzle #{puzzle_id}!")
+        else:
+            await ctx.reply(
+                "The following players are missing Puzzle #{}: <@{}>".format(
+                    puzzle_id, ">, <@".join(map(str, missing_ids))
+                )
+            )
 
     async def get_entries(self, ctx: commands.Context, *args: str) -> None:
         pass
@@ -39,6 +185,294 @@ class BaseCommandHandler(Protocol):
     async def get_stats(self, ctx: commands.Context, *args: str) -> None:
         pass
 
+    async def _build_stats(
+        self, user_ids: list[str]
+    ) -> tuple[pd.DataFrame, dict | None]:
+        """The ?stats table and optional bar_chart_spec for players. Override in subclasses."""
+        pass
+
+    async def _get_stats_png(self, user_ids: list[str]) -> bytes | None:
+        """
+        The rendered ?stats table for players. Concurrent calls for the same
+        players at the same data version share one fetch and render.
+        """
+        version = (self.db.data_version, self.utils.names_version)
+        return await self._stats_flight.run(
+            (tuple(user_ids), version), lambda: self.__render_stats(user_ids)
+        )
+
+    async def __render_stats(self, user_ids: list[str]) -> bytes | None:
+        stats_df, chart = await self._build_stats(user_ids)
+        return await self.utils.get_png_from_df_async(stats_df, chart)
+
+    ######################
+    #   RANKS METHODS    #
+    ######################
+
+    async def _get_ranks_window(
+        self, ctx: commands.Context, *args: str
+    ) -> tuple[list[int], str, PuzzleQueryType] | None:
+        """
+        Resolve ?ranks arguments to (puzzles, title, query type). Replies to ctx
+        and returns None if they can't be understood.
+        """
+        if len(args) == 0 or (len(args) == 1 and args[0] in ["month", "monthly"]):
+            valid_puzzles = self.db.get_puzzles_by_month(self.utils.get_todays_date())
+            explanation_str = "This Month (so far)"
+            query_type = PuzzleQueryType.MULTI_PUZZLE
+        elif len(args) == 1 and args[0] in ["alltime", "all-time"]:
+            # ALL TIME
+            valid_puzzles = await self.db.get_all_puzzles_async()
+            explanation_str = "All-time"
+            query_type = PuzzleQueryType.ALL_TIME
+        elif len(args) == 1 and args[0] in ["week", "weekly"]:
+            # WEEKLY
+            start_of_week = self.utils.get_week_start(self.utils.get_todays_date())
+            todays_puzzle_id = self.db.get_puzzle_by_date(self.utils.get_todays_date())
+            valid_puzzles = [
+                p_id
+                for p_id in self.db.get_puzzles_by_week(start_of_week)
+                if p_id <= todays_puzzle_id
+            ]
+            explanation_str = "This Week (so far)"
+            query_type = PuzzleQueryType.MULTI_PUZZLE
+        elif len(args) == 1 and args[0] in ["10day", "10-day"]:
+            # 10-DAY AVERAGE
+            seven_days_ago_puzzle = self.db.get_puzzle_by_date(
+                self.utils.get_todays_date() - timedelta(days=10)
+            )
+            valid_puzzles = list(
+                range(seven_days_ago_puzzle, seven_days_ago_puzzle + 10)
+            )
+            explanation_str = "Last 10 Days"
+            query_type = PuzzleQueryType.MULTI_PUZZLE
+        elif len(args) == 1 and args[0] == "today":
+            # TODAY ONLY
+            valid_puzzles = [self.db.get_puzzle_by_date(self.utils.get_todays_date())]
+            explanation_str = f"Puzzle #{valid_puzzles[0]}"
+            query_type = PuzzleQueryType.SINGLE_PUZZLE
+        elif len(args) == 1 and re.match(r"^[#]?\d+$", args[0]):
+            # SPECIFIC PUZZLE ONLY
+            valid_puzzles = [int(args[0].strip("# "))]
+            explanation_str = f"Puzzle #{valid_puzzles[0]}"
+            query_type = PuzzleQueryType.SINGLE_PUZZLE
+        elif len(args) == 1 and self.utils.is_date(args[0]):
+            # WEEKLY (BY SPECIFIC DATE)
+            query_date = self.utils.get_date_from_str(args[0])
+            todays_puzzle_id = self.db.get_puzzle_by_date(self.utils.get_todays_date())
+            if self.utils.is_sunday(query_date):
+                valid_puzzles = [
+                    p_id
+                    for p_id in self.db.get_puzzles_by_week(query_date)
+                    if p_id <= todays_puzzle_id
+                ]
+                explanation_str = (
+                    f"Week of {self.utils.convert_date_to_str(query_date)}"
+                )
+                query_type = PuzzleQueryType.MULTI_PUZZLE
+            else:
+                await ctx.reply("Query date is not a Sunday. Try `?help ranks`.")
+                return None
+        else:
+            await ctx.reply("Couldn't understand your command. Try `?help ranks`.")
+            return None
+
+        return valid_puzzles, explanation_str, query_type
+
+    def _ranks_sort_key(self, p: object, query_type: PuzzleQueryType) -> tuple:
+        """Key players are ranked by, lowest first. Override in subclasses."""
+        pass
+
+    def _get_live_stats(self, user_id: str, puzzle_id: int) -> object:
+        """A player's stats for a single puzzle. Override in subclasses."""
+        pass
+
+    def _build_ranks_df(
+        self,
+        stats: list[object],
+        valid_puzzles: list[int],
+        query_type: PuzzleQueryType,
+    ) -> pd.DataFrame:
+        """Rank the players' stats and lay out the ?ranks table. Override in subclasses."""
+        pass
+
+    async def _get_ranks_png(
+        self, valid_puzzles: list[int], query_type: PuzzleQueryType
+    ) -> tuple[bool, bytes | None]:
+        """
+        The rendered ?ranks table for a window, as (found any players, png).
+        Reuses the last render if no entries or names have changed since (for
+        a finished week or month, if its archive hasn't changed), and
+        concurrent calls for the same window share one render.
+        """
+        key = (query_type, tuple(valid_puzzles))
+        # finished weeks and months are rendered once and kept in the archive
+        archived = (
+            query_type == PuzzleQueryType.MULTI_PUZZLE
+            and self._is_closed_period(valid_puzzles)
+        )
+        version = self.__ranks_version(archived)
+        cached = self._ranks_cache.get(key)
+        if cached is not None and cached[0] == version:
+            self._ranks_cache.move_to_end(key)
+            # failed renders aren't cached, so None means there were no players
+            return cached[1] is not None, cached[1]
+
+        return await self._ranks_flight.run(
+            (key, version),
+            lambda: self.__render_ranks(key, version, valid_puzzles, query_type),
+        )
+
+    def __ranks_version(self, archived: bool) -> tuple[bool, int, int]:
+        # submissions bump data_version, but only change an archived period
+        # when they drop its archive
+        if archived:
+            return (True, self.db.archive_version, self.utils.names_version)
+        return (False, self.db.data_version, self.utils.names_version)
+
+    async def __render_ranks(
+        self,
+        key: tuple[PuzzleQueryType, tuple[int, ...]],
+        version: tuple[bool, int, int],
+        valid_puzzles: list[int],
+        query_type: PuzzleQueryType,
+    ) -> tuple[bool, bytes | None]:
+        archived = version[0]
+        data_version = self.db.data_version
+        if archived:
+            found = await self.db.get_archived_ranks_async(
+                valid_puzzles[0], valid_puzzles[-1]
+            )
+            if found is not None:
+                self.__cache_ranks(key, version, found[1])
+                return found
+
+        if query_type == PuzzleQueryType.ALL_TIME:
+            stats = await self.db.get_all_time_stats_async()
+        else:
+            stats = await self.db.get_player_stats_async(valid_puzzles)
+
+        ranks_png = None
+        if len(stats) > 0:
+            df = self._build_ranks_df(stats, valid_puzzles, query_type)
+            ranks_png = await self.utils.get_png_from_df_async(df)
+            if ranks_png is None:
+                # failed to render, try again next time
+                return True, None
+
+        if archived:
+            # skip the archive (and the cache, as that change may not bump
+            # archive_version) if an entry changed mid-render, the next query retries
+            if self.db.data_version != data_version:
+                return len(stats) > 0, ranks_png
+            archive_version = await self.db.archive_ranks_async(
+                valid_puzzles[0],
+                valid_puzzles[-1],
+                [
+                    (p.rank, p.user_id, p.missed_games, *p.get_stat_list())
+                    for p in stats
+                ],
+                ranks_png,
+            )
+            # writing the archive bumped archive_version, this render matches it
+            version = (True, archive_version, version[2])
+        self.__cache_ranks(key, version, ranks_png)
+        return len(stats) > 0, ranks_png
+
+    def _is_closed_period(self, valid_puzzles: list[int]) -> bool:
+        """Whether the puzzles are a whole week or month that's already over."""
+        todays_puzzle_id = self.db.get_puzzle_by_date(self.utils.get_todays_date())
+        if len(valid_puzzles) == 0 or valid_puzzles[-1] >= todays_puzzle_id:
+            return False
+        start = self.db.get_date_by_puzzle(valid_puzzles[0])
+        return valid_puzzles == self.db.get_puzzles_by_week(start) or (
+            start.day == 1 and valid_puzzles == self.db.get_puzzles_by_month(start)
+        )
+
+    def _get_closed_periods(self) -> list[list[int]]:
+        """The puzzles of last week and last month, frozen at rollover."""
+        today = self.utils.get_todays_date()
+        last_sunday = self.utils.get_week_start(today) - timedelta(days=7)
+        last_month = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+        return [
+            self.db.get_puzzles_by_week(last_sunday),
+            self.db.get_puzzles_by_month(last_month),
+        ]
+
+    def __cache_ranks(
+        self,
+        key: tuple[PuzzleQueryType, tuple[int, ...]],
+        version: tuple[bool, int, int],
+        ranks_png: bytes | None,
+    ) -> None:
+        self._ranks_cache[key] = (version, ranks_png)
+        self._ranks_cache.move_to_end(key)
+        while len(self._ranks_cache) > self.RANKS_CACHE_SIZE:
+            self._ranks_cache.popitem(last=False)
+
+    async def _update_live_board(self, user_id: str) -> None:
+        """Re-rank one player on today's board after their entries change."""
+        try:
+            async with self._live_board_lock:
+                board = await self.__get_live_board()
+                player_stats = await self.db.run(
+                    self._get_live_stats, user_id, board.puzzle_id
+                )
+                if player_stats.missed_games == 0:
+                    board.update(player_stats)
+                else:
+                    board.remove(user_id)
+        except Exception as e:
+            print(f"Failed to update live board: {e}")
+
+    async def __on_entries_written(self, user_ids: list[str]) -> None:
+        if not self.db.has_entry_store():
+            for user_id in user_ids:
+                await self._update_live_board(user_id)
+
+    async def __get_live_board(self) -> LiveBoard:
+        """Today's board, rebuilt when the day rolls over. Call with the lock held."""
+        puzzle_id = self.db.get_puzzle_by_date(self.utils.get_todays_date())
+        if self._live_board is None or self._live_board.puzzle_id != puzzle_id:
+            board = LiveBoard(
+                puzzle_id,
+                lambda p: self._ranks_sort_key(p, PuzzleQueryType.SINGLE_PUZZLE),
+            )
+            for player_stats in await self.db.get_player_stats_async([puzzle_id]):
+                board.update(player_stats)
+            self._live_board = board
+        return self._live_board
+
+    async def __precompute_ranks(self) -> None:
+        while True:
+            try:
+                async with self._live_board_lock:
+                    await self.__get_live_board()
+            except Exception as e:
+                print(f"Failed to build live board: {e}")
+            for args in self.PRECOMPUTED_RANKS:
+                try:
+                    window = await self._get_ranks_window(None, *args)
+                    await self._get_ranks_png(window[0], window[2])
+                except Exception as e:
+                    print(f"Failed to precompute ranks {args}: {e}")
+            for period in self._get_closed_periods():
+                try:
+                    await self._get_ranks_png(period, PuzzleQueryType.MULTI_PUZZLE)
+                except Exception as e:
+                    print(f"Failed to archive ranks {period[0]}-{period[-1]}: {e}")
+
+            # sleep until the puzzles roll over or someone submits a result
+            try:
+                await asyncio.wait_for(
+                    self._ranks_stale.wait(),
+                    timeout=self.utils.get_seconds_until_rollover(),
+                )
+                await asyncio.sleep(self.PRECOMPUTE_DELAY_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._ranks_stale.clear()
+
     ######################
     #   OWNER METHODS    #
     ######################
@@ -48,3 +482,7 @@ class BaseCommandHandler(Protocol):
 
     async def add_score(self, ctx: commands.Context, *args: str) -> None:
         pass
+
+    async def rebuild_aggregates(self, ctx: commands.Context, *args: str) -> None:
+        entry_count = await self.db.rebuild_aggregates_async()
+        await ctx.reply(f"Rebuilt all-time stats from {entry_count} entries.")
@@ -1,14 +1,12 @@
-import discord, io, re
-import matplotlib.pyplot as plt
+import re
 import pandas as pd
-import seaborn as sns
-from datetime import timedelta
 from discord.ext import commands
 from data.strands import StrandsDatabaseHandler
 from games.base_command_handler import BaseCommandHandler
 from models.base_game import PuzzleQueryType
 from models.strands import StrandsPlayerStats, StrandsPuzzleEntry
 from utils.bot_utilities import BotUtilities
+from utils.charts import bar_chart_spec
 
 
 class StrandsCommandHandler(BaseCommandHandler):
@@ -19,86 +17,27 @@ class StrandsCommandHandler(BaseCommandHandler):
     #   MEMBER METHODS   #
     ######################
 
-    async def get_ranks(self, ctx: commands.Context, *args: str) -> None:
-        if len(args) == 0 or (len(args) == 1 and args[0] in ["month", "monthly"]):
-            valid_puzzles = self.db.get_puzzles_by_month(self.utils.get_todays_date())
-            explanation_str = "This Month (so far)"
-            query_type = PuzzleQueryType.MULTI_PUZZLE
-        elif len(args) == 1 and args[0] in ["alltime", "all-time"]:
-            # ALL TIME
-            valid_puzzles = self.db.get_all_puzzles()
-            explanation_str = "All-time"
-            query_type = PuzzleQueryType.ALL_TIME
-        elif len(args) == 1 and args[0] in ["week", "weekly"]:
-            # WEEKLY
-            start_of_week = self.utils.get_week_start(self.utils.get_todays_date())
-            todays_puzzle_id = self.db.get_puzzle_by_date(self.utils.get_todays_date())
-            valid_puzzles = [
-                p_id
-                for p_id in self.db.get_puzzles_by_week(start_of_week)
-                if p_id <= todays_puzzle_id
-            ]
-            explanation_str = "This Week (so far)"
-            query_type = PuzzleQueryType.MULTI_PUZZLE
-        elif len(args) == 1 and args[0] in ["10day", "10-day"]:
-            # 10-DAY AVERAGE
-            seven_days_ago_puzzle = self.db.get_puzzle_by_date(
-                self.utils.get_todays_date() - timedelta(days=10)
-            )
-            valid_puzzles = list(
-                range(seven_days_ago_puzzle, seven_days_ago_puzzle + 10)
-            )
-            explanation_str = "Last 10 Days"
-            query_type = PuzzleQueryType.MULTI_PUZZLE
-        elif len(args) == 1 and args[0] == "today":
-            # TODAY ONLY
-            valid_puzzles = [self.db.get_puzzle_by_date(self.utils.get_todays_date())]
-            explanation_str = f"Puzzle #{valid_puzzles[0]}"
-            query_type = PuzzleQueryType.SINGLE_PUZZLE
-        elif len(args) == 1 and re.match(r"^[#]?\d+$", args[0]):
-            # SPECIFIC PUZZLE ONLY
-            valid_puzzles = [int(args[0].strip("# "))]
-            explanation_str = f"Puzzle #{valid_puzzles[0]}"
-            query_type = PuzzleQueryType.SINGLE_PUZZLE
-        elif len(args) == 1 and self.utils.is_date(args[0]):
-            # WEEKLY (BY SPECIFIC DATE)
-            query_date = self.utils.get_date_from_str(args[0])
-            todays_puzzle_id = self.db.get_puzzle_by_date(self.utils.get_todays_date())
-            if self.utils.is_sunday(query_date):
-                valid_puzzles = [
-                    p_id
-                    for p_id in self.db.get_puzzles_by_week(query_date)
-                    if p_id <= todays_puzzle_id
-                ]
-                explanation_str = (
-                    f"Week of {self.utils.convert_date_to_str(query_date)}"
-                )
-                query_type = PuzzleQueryType.MULTI_PUZZLE
-            else:
-                await ctx.reply("Query date is not a Sunday. Try `?help ranks`.")
-                return
-        else:
-            await ctx.reply("Couldn't understand your command. Try `?help ranks`.")
-            return
-
-        stats: list[StrandsPlayerStats] = []
-        for user_id in self.db.get_all_players():
-            player_puzzles = self.db.get_puzzles_by_player(user_id)
-            intersection = list(set(player_puzzles).intersection(valid_puzzles))
-            if len(intersection) > 0:
-                stats.append(StrandsPlayerStats(user_id, valid_puzzles, self.db))
-
-        if len(stats) == 0:
-            await ctx.reply(f"Sorry, no users could be found for this query.")
-            return
+    def _get_live_stats(self, user_id: str, puzzle_id: int) -> StrandsPlayerStats:
+        return StrandsPlayerStats(user_id, [puzzle_id], self.db)
 
+    def _ranks_sort_key(
+        self, p: StrandsPlayerStats, query_type: PuzzleQueryType
+    ) -> tuple:
         if query_type != PuzzleQueryType.ALL_TIME:
             # for all queries except 'All-time', we rank based on the adjusted rating
-            stats.sort(key=lambda p: (p.avg_rating_adj))
-        else:
-            # for all-time queries, we must rank on the raw rating (since adj. will be skewed)
-            stats.sort(key=lambda p: (p.avg_rating_raw))
+            return (p.avg_rating_adj,)
+        # for all-time queries, we must rank on the raw rating (since adj. will be skewed)
+        return (p.avg_rating_raw,)
+
+    def _build_ranks_df(
+        self,
+        stats: list[StrandsPlayerStats],
+        valid_puzzles: list[int],
+        query_type: PuzzleQueryType,
+    ) -> pd.DataFrame:
+        stats.sort(key=lambda p: self._ranks_sort_key(p, query_type))
 
+        names = self.utils.get_nicknames(p.user_id for p in stats)
         if query_type == PuzzleQueryType.SINGLE_PUZZLE:
             # stats for just 1 puzzle
             df = pd.DataFrame(columns=["Rank", "User", "Rating", "Hints", "🟡 Index"])
@@ -114,7 +53,7 @@ class StrandsCommandHandler(BaseCommandHandler):
                 if i <= self.MAX_DATAFRAME_ROWS:
                     df.loc[i] = [
                         player_stats.rank,
-                        self.utils.get_nickname(player_stats.user_id),
+                        names[player_stats.user_id],
                         f"{player_stats.avg_rating_raw:.3f}",
                         f"{player_stats.avg_hints:d}",
                         f"{player_stats.avg_spangram_index:d}",
@@ -143,7 +82,7 @@ class StrandsCommandHandler(BaseCommandHandler):
                 if i <= self.MAX_DATAFRAME_ROWS:
                     df.loc[i] = [
                         player_stats.rank,
-                        self.utils.get_nickname(player_stats.user_id),
+                        names[player_stats.user_id],
                         f"{player_stats.avg_rating_adj:.3f} ({player_stats.avg_rating_raw:.3f})",
                         f"{player_stats.avg_hints:.2f}",
                         f"{player_stats.avg_spangram_index:.2f}",
@@ -174,7 +113,7 @@ class StrandsCommandHandler(BaseCommandHandler):
                 if i <= self.MAX_DATAFRAME_ROWS:
                     df.loc[i] = [
                         player_stats.rank,
-                        self.utils.get_nickname(player_stats.user_id),
+                        names[player_stats.user_id],
                         f"{player_stats.avg_rating_raw:.3f}",
                         f"{player_stats.avg_hints:.2f}",
                         f"{player_stats.avg_spangram_index:.2f}",
@@ -182,43 +121,7 @@ class StrandsCommandHandler(BaseCommandHandler):
                         player_stats.missed_games,
                     ]
 
-        ranks_img = self.utils.get_image_from_df(df)
-
-        if ranks_img is not None:
-            with io.BytesIO() as image_binary:
-                ranks_img.save(image_binary, "PNG")
-                image_binary.seek(0)
-                await ctx.send(
-                    f"Leaderboard 🧩: {explanation_str}",
-                    file=discord.File(fp=image_binary, filename="image.png"),
-                )
-        else:
-            await ctx.reply(
-                "Sorry, there was an issue fetching ranks. Please try again later."
-            )
-
-    async def get_missing(self, ctx: commands.Context, *args: str) -> None:
-        if len(args) == 0:
-            puzzle_id = self.db.get_puzzle_by_date(self.utils.get_todays_date())
-        elif len(args) == 1 and re.match(r"^[#]?\d+$", args[0]):
-            puzzle_id = int(args[0].strip("# "))
-        else:
-            await ctx.reply("Couldn't understand command. Try `?help missing`")
-            return
-
-        missing_ids = [
-            user_id
-            for user_id in self.db.get_all_players()
-            if user_id not in self.db.get_players_by_puzzle_id(puzzle_id)
-        ]
-        if len(missing_ids) == 0:
-            await ctx.reply(f"All tracked players have submitted Puzzle #{puzzle_id}!")
-        else:
-            await ctx.reply(
-                "The following players are missing Puzzle #{}: <@{}>".format(
-                    puzzle_id, ">, <@".join(map(str, missing_ids))
-                )
-            )
+        return df
 
     async def get_entries(self, ctx: commands.Context, *args: str) -> None:
         if len(args) == 0:
@@ -229,9 +132,9 @@ class StrandsCommandHandler(BaseCommandHandler):
             await ctx.reply("Couldn't understand command. Try `?help entries`.")
             return
 
-        if user_id in self.db.get_all_players():
+        if user_id in await self.db.get_all_players_async():
             found_puzzles = [
-                str(p_id) for p_id in self.db.get_puzzles_by_player(user_id)
+                str(p_id) for p_id in await self.db.get_puzzles_by_player_async(user_id)
             ]
             if len(found_puzzles) == 0:
                 await ctx.reply(f"Couldn't find any recorded entries for <@{user_id}>.")
@@ -267,9 +170,9 @@ class StrandsCommandHandler(BaseCommandHandler):
 
         puzzle_ids.sort()
 
-        if user_id in self.db.get_all_players():
-            user_puzzles: list[StrandsPuzzleEntry] = self.db.get_entries_by_player(
-                user_id
+        if user_id in await self.db.get_all_players_async():
+            user_puzzles: list[StrandsPuzzleEntry] = (
+                await self.db.get_entries_by_player_async(user_id)
             )
             df = pd.DataFrame(
                 columns=["User", "Puzzle #", "Rating", "Hints", "🟡 Index", "Puzzle"]
@@ -297,14 +200,9 @@ class StrandsCommandHandler(BaseCommandHandler):
                         "?",
                         "?",
                     ]
-            entries_img = self.utils.get_image_from_df(df)
-            if entries_img is not None:
-                with io.BytesIO() as image_binary:
-                    entries_img.save(image_binary, "PNG")
-                    image_binary.seek(0)
-                    await ctx.reply(
-                        file=discord.File(fp=image_binary, filename="image.png")
-                    )
+            entries_png = await self.utils.get_png_from_df_async(df)
+            if entries_png is not None:
+                await ctx.reply(file=self.utils.get_file_from_png(entries_png))
             else:
                 await ctx.reply("Sorry, failed to fetch stats.")
         else:
@@ -320,7 +218,7 @@ class StrandsCommandHandler(BaseCommandHandler):
             for arg in args:
                 if self.utils.is_user(arg):
                     user_id = arg.strip("<@!> ")
-                    if user_id in self.db.get_all_players():
+                    if user_id in await self.db.get_all_players_async():
                         user_ids.append(user_id)
                     else:
                         unknown_ids.append(str(user_id))
@@ -338,70 +236,69 @@ class StrandsCommandHandler(BaseCommandHandler):
                     )
                     return
 
+        stats_png = await self._get_stats_png(user_ids)
+
+        if stats_png is not None:
+            if missing_users_str is None:
+                await ctx.reply(file=self.utils.get_file_from_png(stats_png))
+            else:
+                await ctx.reply(
+                    missing_users_str,
+                    file=self.utils.get_file_from_png(stats_png),
+                )
+        else:
+            await ctx.reply("Sorry, an error occurred while trying to fetch stats.")
+
+    async def _build_stats(
+        self, user_ids: list[str]
+    ) -> tuple[pd.DataFrame, dict | None]:
         df = pd.DataFrame(
             columns=["User", "Avg Rating", "Avg Hints", "Avg 🟡 Index", "🧩", "🚫"]
         )
+        all_time_stats = {
+            s.user_id: s for s in await self.db.get_all_time_stats_async(user_ids)
+        }
+        all_puzzle_count = len(await self.db.get_all_puzzles_async())
         for i, user_id in enumerate(user_ids):
-            puzzle_list = self.db.get_puzzles_by_player(user_id)
-            player_stats = StrandsPlayerStats(user_id, puzzle_list, self.db)
+            player_stats = all_time_stats.get(user_id)
+            if player_stats is None:
+                # no entries yet
+                player_stats = await self.db.run(
+                    StrandsPlayerStats, user_id, [], self.db
+                )
+                player_stats.missed_games = all_puzzle_count
             df.loc[i] = [
                 self.utils.get_nickname(user_id),
                 f"{player_stats.avg_rating_raw:.2f}",
                 f"{player_stats.avg_hints:.2f}",
                 f"{player_stats.avg_spangram_index:.2f}",
-                len(puzzle_list),
-                len(self.db.get_all_puzzles()) - len(puzzle_list),
+                all_puzzle_count - player_stats.missed_games,
+                player_stats.missed_games,
             ]
 
-        stats_img = self.utils.get_image_from_df(df)
-
-        hist_img = None
+        stats_df = df
+        chart = None
         if len(user_ids) < 5:
             valid_hints = ["0", "1", "2", "3", "4", "5", "6", "7"]
-            plt.rcParams.update({"font.size": 20})
 
-            df = pd.DataFrame(columns=["Player", "Hints", "Count"])
-            for i, user_id in enumerate(user_ids):
-                hint_counts = [0] * len(valid_hints)
-                entries: list[StrandsPuzzleEntry] = self.db.get_entries_by_player(
-                    user_id
-                )
-                for hints in [entry.hints for entry in entries]:
-                    hint_counts[hints] += 1
-                for j in range(0, len(valid_hints)):
-                    df.loc[i * len(valid_hints) + j] = [
+            hint_counts = await self.db.get_histograms_async(user_ids, "hints")
+            chart = bar_chart_spec(
+                valid_hints,
+                [
+                    (
                         self.utils.remove_emojis(self.utils.get_nickname(user_id)),
-                        valid_hints[j],
-                        hint_counts[j],
-                    ]
-            g = sns.catplot(x="Hints", y="Count", hue="Player", data=df, kind="bar")
-            for ax in g.axes.ravel():
-                for c in ax.containers:
-                    labels = ["%d" % v.get_height() for v in c]
-                    ax.bar_label(c, labels=labels, label_type="edge", fontsize=15)
-            fig = plt.gcf()
-            fig.subplots_adjust(bottom=0.2)
-            fig.set_size_inches(15, 5)
-            hist_img = self.utils.fig_to_image(fig)
-            hist_img = self.utils.resize_image(hist_img, width=stats_img.size[0])
-            plt.close()
-
-        if hist_img is not None:
-            stats_img = self.utils.combine_images(stats_img, hist_img)
-
-        if stats_img is not None:
-            stats_binary = self.utils.image_to_binary(stats_img)
-            if missing_users_str is None:
-                await ctx.reply(
-                    file=discord.File(fp=stats_binary, filename="image.png")
-                )
-            else:
-                await ctx.reply(
-                    missing_users_str,
-                    file=discord.File(fp=stats_binary, filename="image.png"),
-                )
-        else:
-            await ctx.reply("Sorry, an error occurred while trying to fetch stats.")
+                        [
+                            hint_counts[user_id].get(j, 0)
+                            for j in range(len(valid_hints))
+                        ],
+                    )
+                    for user_id in user_ids
+                ],
+                x_label="Hints",
+                y_label="Count",
+                size=(15, 5),
+            )
+        return stats_df, chart
 
     ######################
     #   OWNER METHODS    #
@@ -428,10 +325,11 @@ class StrandsCommandHandler(BaseCommandHandler):
             return
 
         if (
-            user_id in self.db.get_all_players()
-            and puzzle_id in self.db.get_all_puzzles()
+            user_id in await self.db.get_all_players_async()
+            and puzzle_id in await self.db.get_all_puzzles_async()
         ):
-            if self.db.remove_entry(user_id, puzzle_id):
+            if await self.db.remove_entry_async(user_id, puzzle_id):
+                await self._update_live_board(user_id)
                 await ctx.message.add_reaction("✅")
             else:
                 await ctx.message.add_reaction("❌")
@@ -451,7 +349,8 @@ class StrandsCommandHandler(BaseCommandHandler):
                 title = f"{args[0]} {args[1]}"
                 content = "\n".join(args[2:])
             if self.utils.is_strands_submission(title):
-                if self.db.add_entry(user_id, title, content):
+                if await self.db.add_entry_async(user_id, title, content):
+                    await self._update_live_board(user_id)
                     await ctx.message.add_reaction("✅")
                 else:
                     await ctx.message.add_reaction("❌")
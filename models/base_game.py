@@ -1,6 +1,11 @@
+import numpy as np
 from enum import Enum, auto
+from fractions import Fraction
 from typing import Protocol
 
+# float values are summed exactly as integers in units of 2**-FIXED_POINT_BITS
+FIXED_POINT_BITS = 52
+
 
 class PuzzleQueryType(Enum):
     SINGLE_PUZZLE = auto()
@@ -17,3 +22,44 @@ class BasePlayerStats(Protocol):
 class BasePuzzleEntry(Protocol):
     puzzle_id: int
     user_id: str
+
+
+def exact_mean(total: int, count: int) -> int | float:
+    """
+    Mean of integer data given its sum and count, typed the way statistics.mean
+    would return it: an int when the mean is whole, else a correctly rounded float.
+    """
+    value = Fraction(total) / count
+    if value.denominator == 1:
+        return int(value)
+    return float(value)
+
+
+def group_sums(positions: np.ndarray, values: np.ndarray, n: int) -> list[int]:
+    """Per-player sums of integer-valued data (NaN counts as 0)."""
+    sums = np.bincount(positions, weights=np.nan_to_num(values), minlength=n)
+    return [int(total) for total in sums]
+
+
+def group_fixed_point_sums(
+    positions: np.ndarray, values: np.ndarray, n: int
+) -> list[int]:
+    """
+    Exact per-player sums of float data, scaled by 2**FIXED_POINT_BITS. Every
+    value must be 0 or in [1, 2**10), which makes it a whole number of
+    2**-FIXED_POINT_BITS units. The scaled values are split into two halves so
+    neither half's sum loses precision in float64.
+    """
+    scaled = np.ldexp(values, FIXED_POINT_BITS).astype(np.int64)
+    high = np.bincount(positions, weights=scaled >> 31, minlength=n)
+    low = np.bincount(positions, weights=scaled & (2**31 - 1), minlength=n)
+    return [(int(h) << 31) + int(l) for h, l in zip(high, low)]
+
+
+def fixed_point_mean(scaled_total: int, count: int) -> float:
+    """Mean of float data from its scaled sum, rounded once like statistics.mean."""
+    return float(Fraction(scaled_total, count << FIXED_POINT_BITS))
+
+
+def to_fixed_point(value: float) -> int:
+    return int(value * 2**FIXED_POINT_BITS)
@@ -1,6 +1,6 @@
-import statistics as stats
+import numpy as np
 from data.base_data_handler import BaseDatabaseHandler
-from models.base_game import BasePlayerStats, BasePuzzleEntry
+from models.base_game import BasePlayerStats, BasePuzzleEntry, exact_mean, group_sums
 
 
 class ConnectionsPlayerStats(BasePlayerStats):
@@ -13,7 +13,7 @@ class ConnectionsPlayerStats(BasePlayerStats):
     ) -> None:
         self.user_id = user_id
 
-        player_puzzles = db.get_puzzles_by_player(self.user_id)
+        player_puzzles = set(db.get_puzzles_by_player(self.user_id))
         player_entries: list[ConnectionsPuzzleEntry] = db.get_entries_by_player(
             self.user_id, puzzle_list
         )
@@ -21,15 +21,53 @@ class ConnectionsPlayerStats(BasePlayerStats):
         self.missed_games = len([p for p in puzzle_list if p not in player_puzzles])
 
         if len(player_entries) > 0:
-            self.raw_mean = stats.mean([e.score for e in player_entries])
-            self.adj_mean = stats.mean(
-                [e.score for e in player_entries] + ([8] * self.missed_games)
-            )
+            self.__set_means(len(player_entries), sum(e.score for e in player_entries))
         else:
             self.raw_mean = 0
             self.adj_mean = 0
         self.rank = -1
 
+    @classmethod
+    def from_aggregates(
+        cls, user_id: str, missed_games: int, count: int, total_score: int
+    ) -> "ConnectionsPlayerStats":
+        """Build stats from a player's sums over a puzzle window (count > 0)."""
+        player_stats = cls.__new__(cls)
+        player_stats.user_id = user_id
+        player_stats.missed_games = missed_games
+        player_stats.__set_means(count, total_score)
+        player_stats.rank = -1
+        return player_stats
+
+    @classmethod
+    def from_arrays(
+        cls,
+        user_ids: list[str],
+        positions: np.ndarray,
+        columns: dict[str, np.ndarray],
+        puzzle_count: int,
+    ) -> list["ConnectionsPlayerStats"]:
+        """
+        Build every player's stats in one pass over a puzzle window's entries.
+        positions maps each entry to its player in user_ids; puzzle_count is the
+        number of puzzles in the window.
+        """
+        n = len(user_ids)
+        counts = np.bincount(positions, minlength=n)
+        scores = group_sums(positions, columns["score"], n)
+        return [
+            cls.from_aggregates(
+                user_id, puzzle_count - int(counts[i]), int(counts[i]), scores[i]
+            )
+            for i, user_id in enumerate(user_ids)
+        ]
+
+    def __set_means(self, count: int, total_score: int) -> None:
+        self.raw_mean = exact_mean(total_score, count)
+        self.adj_mean = exact_mean(
+            total_score + 8 * self.missed_games, count + self.missed_games
+        )
+
     def get_stat_list(self) -> tuple[float, float]:
         return self.raw_mean, self.adj_mean
 
@@ -37,12 +75,73 @@ class ConnectionsPlayerStats(BasePlayerStats):
 class ConnectionsPuzzleEntry(BasePuzzleEntry):
     # connections-specific details
     score: int
-    puzzle_str: str
+    grid: bytes | None
+
+    # row colors, packed 2 bits per cell so each row is a byte
+    GRID_COLORS: str = "🟨🟩🟦🟪"
+    GRID_BYTES: int = 16
 
     def __init__(
-        self, puzzle_id: int, user_id: str, score: int, puzzle_str: str
+        self,
+        puzzle_id: int,
+        user_id: str,
+        score: int,
+        grid: bytes | None,
+        puzzle_str: str | None,
     ) -> None:
         self.puzzle_id = puzzle_id
         self.user_id = user_id
         self.score = score
-        self.puzzle_str = puzzle_str
+        self.grid = grid
+        # only results the grid can't hold are stored as text
+        self._puzzle_str = puzzle_str
+
+    @property
+    def puzzle_str(self) -> str:
+        """The pasted result, decoded from the grid on first use."""
+        if self._puzzle_str is None:
+            self._puzzle_str = (
+                self.decode_grid(self.grid) if self.grid is not None else ""
+            )
+        return self._puzzle_str
+
+    @property
+    def rows(self) -> list[list[int]]:
+        """Each guess as its four color codes (indexes into GRID_COLORS)."""
+        if self.grid is None:
+            return [
+                [self.GRID_COLORS.index(c) for c in line if c in self.GRID_COLORS]
+                for line in self.puzzle_str.strip().split("\n")
+            ]
+        return [[(byte >> shift) & 3 for shift in (6, 4, 2, 0)] for byte in self.grid]
+
+    @property
+    def guess_order(self) -> list[int]:
+        """Color codes of the groups solved, in the order they were found."""
+        return [row[0] for row in self.rows if len(row) == 4 and len(set(row)) == 1]
+
+    @property
+    def mistakes(self) -> int:
+        return len(self.rows) - len(self.guess_order)
+
+    @classmethod
+    def encode_grid(cls, puzzle_str: str) -> bytes | None:
+        """Pack a result's rows, or None if it isn't just rows of four colors."""
+        lines = puzzle_str.strip().split("\n")
+        if len(lines) > cls.GRID_BYTES or any(
+            len(line) != 4 or any(c not in cls.GRID_COLORS for c in line)
+            for line in lines
+        ):
+            return None
+        grid = bytearray(len(lines))
+        for i, line in enumerate(lines):
+            for j, c in enumerate(line):
+                grid[i] |= cls.GRID_COLORS.index(c) << (6 - 2 * j)
+        return bytes(grid)
+
+    @classmethod
+    def decode_grid(cls, grid: bytes) -> str:
+        return "\n".join(
+            "".join(cls.GRID_COLORS[(byte >> shift) & 3] for shift in (6, 4, 2, 0))
+            for byte in bytes(grid)
+        )
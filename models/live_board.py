@@ -0,0 +1,97 @@
+from sortedcontainers import SortedKeyList
+from typing import Any, Callable
+from models.base_game import BasePlayerStats
+
+
+class LiveBoard:
+    """
+    Ranking of one puzzle's players, kept in order as entries come in.
+    - puzzle_id: the puzzle being ranked
+    - sort_key: ranking key for a player's stats, lowest first
+
+    Players with equal keys are ordered by user_id and players with equal stat
+    lists share a rank, the same as the ?ranks table. Updates are O(log n).
+    """
+
+    def __init__(
+        self, puzzle_id: int, sort_key: Callable[[BasePlayerStats], Any]
+    ) -> None:
+        self.puzzle_id = puzzle_id
+        self._board = SortedKeyList(key=lambda p: (sort_key(p), int(p.user_id)))
+        self._by_user: dict[str, BasePlayerStats] = {}
+
+    def __len__(self) -> int:
+        return len(self._board)
+
+    ####################
+    #  WRITE METHODS   #
+    ####################
+
+    def update(self, player_stats: BasePlayerStats) -> None:
+        """Add a player, or move them to where their new stats rank."""
+        self.remove(player_stats.user_id)
+        self._board.add(player_stats)
+        self._by_user[player_stats.user_id] = player_stats
+
+    def remove(self, user_id: str) -> None:
+        player_stats = self._by_user.pop(str(user_id), None)
+        if player_stats is not None:
+            self._board.remove(player_stats)
+
+    ####################
+    #   READ METHODS   #
+    ####################
+
+    def get_rank(self, user_id: str) -> int | None:
+        """The player's rank (1 is best), or None if they're not on the board."""
+        index = self.__index(user_id)
+        if index is None:
+            return None
+        return self.__tie_start(index) + 1
+
+    def get_ties(self, user_id: str) -> list[BasePlayerStats]:
+        """Other players sharing the player's rank."""
+        index = self.__index(user_id)
+        if index is None:
+            return []
+        start = self.__tie_start(index)
+        end = index + 1
+        while end < len(self._board) and self.__is_tied(end - 1, end):
+            end += 1
+        return [p for p in self._board[start:end] if p.user_id != str(user_id)]
+
+    def get_neighbors(
+        self, user_id: str
+    ) -> tuple[BasePlayerStats | None, BasePlayerStats | None]:
+        """The closest players ranked above and below the player, skipping ties."""
+        index = self.__index(user_id)
+        if index is None:
+            return None, None
+        start = self.__tie_start(index)
+        above = self._board[start - 1] if start > 0 else None
+        below = None
+        end = index + 1
+        while end < len(self._board):
+            if not self.__is_tied(end - 1, end):
+                below = self._board[end]
+                break
+            end += 1
+        return above, below
+
+    ####################
+    #  HELPER METHODS  #
+    ####################
+
+    def __index(self, user_id: str) -> int | None:
+        player_stats = self._by_user.get(str(user_id))
+        if player_stats is None:
+            return None
+        return self._board.index(player_stats)
+
+    def __tie_start(self, index: int) -> int:
+        while index > 0 and self.__is_tied(index - 1, index):
+            index -= 1
+        return index
+
+    def __is_tied(self, i: int, j: int) -> bool:
+        return self._board[i].get_stat_list() == self._board[j].get_stat_list()
@@ -1,6 +1,6 @@
-import statistics as stats
+import numpy as np
 from data.base_data_handler import BaseDatabaseHandler
-from models.base_game import BasePlayerStats, BasePuzzleEntry
+from models.base_game import BasePlayerStats, BasePuzzleEntry, exact_mean, group_sums
 import pandas as pd
 
 
@@ -19,7 +19,7 @@ class PipsPlayerStats(BasePlayerStats):
     ) -> None:
         self.user_id = user_id
 
-        player_puzzles = db.get_puzzles_by_player(self.user_id)
+        player_puzzles = set(db.get_puzzles_by_player(self.user_id))
         player_entries: list[PipsPuzzleEntry] = db.get_entries_by_player(
             self.user_id, puzzle_list
         )
@@ -27,56 +27,34 @@ class PipsPlayerStats(BasePlayerStats):
         self.missed_games = len([p for p in puzzle_list if p not in player_puzzles])
 
         if len(player_entries) > 0:
-            easy_entries = [e for e in player_entries if e.easy_seconds != None]
-            medium_entries = [e for e in player_entries if e.medium_seconds != None]
-            hard_entries = [e for e in player_entries if e.hard_seconds != None]
-            self.avg_easy_seconds = stats.mean(
-                [e.easy_seconds for e in easy_entries]
-                if len(easy_entries) > 0
-                else [-1.0]
-            )
-            self.avg_medium_seconds = stats.mean(
-                [e.medium_seconds for e in medium_entries]
-                if len(medium_entries) > 0
-                else [-1.0]
-            )
-            self.avg_hard_seconds = stats.mean(
-                [e.hard_seconds for e in hard_entries]
-                if len(hard_entries) > 0
-                else [-1.0]
-            )
-
-            self.easy_cookie_rate = stats.mean(
-                [1.0 if e.easy_cookie else 0.0 for e in easy_entries]
-                if len(easy_entries) > 0
-                else [-1.0]
-            )
-            self.medium_cookie_rate = stats.mean(
-                [1.0 if e.medium_cookie else 0.0 for e in medium_entries]
-                if len(medium_entries) > 0
-                else [-1.0]
-            )
-            self.hard_cookie_rate = stats.mean(
-                [1.0 if e.hard_cookie else 0.0 for e in hard_entries]
-                if len(hard_entries) > 0
-                else [-1.0]
-            )
-
-            avg_total_entries = [
+            levels = []
+            for level in ["easy", "medium", "hard"]:
+                played = [
+                    e for e in player_entries if getattr(e, f"{level}_seconds") != None
+                ]
+                levels.append(
+                    (
+                        len(played),
+                        sum(getattr(e, f"{level}_seconds") for e in played),
+                        len([e for e in played if getattr(e, f"{level}_cookie")]),
+                    )
+                )
+            all_levels = [
                 e
                 for e in player_entries
                 if e.easy_seconds != None
                 and e.medium_seconds != None
                 and e.hard_seconds != None
             ]
-
-            self.avg_total_seconds = stats.mean(
-                [
-                    e.easy_seconds + e.medium_seconds + e.hard_seconds
-                    for e in avg_total_entries
-                ]
-                if len(avg_total_entries) > 0
-                else [-1.0]
+            self.__set_means(
+                *levels,
+                (
+                    len(all_levels),
+                    sum(
+                        e.easy_seconds + e.medium_seconds + e.hard_seconds
+                        for e in all_levels
+                    ),
+                ),
             )
         else:
             self.avg_easy_seconds = -1.0
@@ -90,6 +68,100 @@ class PipsPlayerStats(BasePlayerStats):
             self.avg_total_seconds = -1.0
         self.rank = -1
 
+    @classmethod
+    def from_aggregates(
+        cls,
+        user_id: str,
+        missed_games: int,
+        easy: tuple[int, int, int],
+        medium: tuple[int, int, int],
+        hard: tuple[int, int, int],
+        total: tuple[int, int],
+    ) -> "PipsPlayerStats":
+        """
+        Build stats from a player's sums over a puzzle window. Each level is
+        (entries, total seconds, cookies) and total is (entries with all three
+        levels, their combined seconds).
+        """
+        player_stats = cls.__new__(cls)
+        player_stats.user_id = user_id
+        player_stats.missed_games = missed_games
+        player_stats.__set_means(easy, medium, hard, total)
+        player_stats.rank = -1
+        return player_stats
+
+    @classmethod
+    def from_arrays(
+        cls,
+        user_ids: list[str],
+        positions: np.ndarray,
+        columns: dict[str, np.ndarray],
+        puzzle_count: int,
+    ) -> list["PipsPlayerStats"]:
+        """
+        Build every player's stats in one pass over a puzzle window's entries,
+        with NaN for levels that weren't played. positions maps each entry to its
+        player in user_ids; puzzle_count is the number of puzzles in the window.
+        """
+        n = len(user_ids)
+        counts = np.bincount(positions, minlength=n)
+
+        levels = []
+        played = []
+        for level in ["easy", "medium", "hard"]:
+            seconds = columns[f"{level}_seconds"]
+            level_played = ~np.isnan(seconds)
+            cookies = level_played & (np.nan_to_num(columns[f"{level}_cookie"]) != 0)
+            levels.append(
+                (
+                    group_sums(positions, level_played, n),
+                    group_sums(positions, np.where(level_played, seconds, 0), n),
+                    group_sums(positions, cookies, n),
+                )
+            )
+            played.append(level_played)
+        all_levels = played[0] & played[1] & played[2]
+        combined = (
+            columns["easy_seconds"]
+            + columns["medium_seconds"]
+            + columns["hard_seconds"]
+        )
+        total = (
+            group_sums(positions, all_levels, n),
+            group_sums(positions, np.where(all_levels, combined, 0), n),
+        )
+
+        return [
+            cls.from_aggregates(
+                user_id,
+                puzzle_count - int(counts[i]),
+                *[tuple(column[i] for column in level) for level in levels],
+                tuple(column[i] for column in total),
+            )
+            for i, user_id in enumerate(user_ids)
+        ]
+
+    def __set_means(
+        self,
+        easy: tuple[int, int, int],
+        medium: tuple[int, int, int],
+        hard: tuple[int, int, int],
+        total: tuple[int, int],
+    ) -> None:
+        self.avg_easy_seconds = self.__mean_seconds(easy[0], easy[1])
+        self.avg_medium_seconds = self.__mean_seconds(medium[0], medium[1])
+        self.avg_hard_seconds = self.__mean_seconds(hard[0], hard[1])
+
+        self.easy_cookie_rate = easy[2] / easy[0] if easy[0] > 0 else -1.0
+        self.medium_cookie_rate = medium[2] / medium[0] if medium[0] > 0 else -1.0
+        self.hard_cookie_rate = hard[2] / hard[0] if hard[0] > 0 else -1.0
+
+        self.avg_total_seconds = self.__mean_seconds(total[0], total[1])
+
+    @staticmethod
+    def __mean_seconds(count: int, total_seconds: int) -> float:
+        return exact_mean(total_seconds, count) if count > 0 else -1.0
+
     def get_stat_list(self) -> tuple[float, float, float, float, float, float, float]:
         return (
             self.avg_easy_seconds,
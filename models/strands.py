@@ -1,6 +1,14 @@
-import statistics as stats
+import numpy as np
 from data.base_data_handler import BaseDatabaseHandler
-from models.base_game import BasePlayerStats, BasePuzzleEntry
+from models.base_game import (
+    BasePlayerStats,
+    BasePuzzleEntry,
+    exact_mean,
+    fixed_point_mean,
+    group_fixed_point_sums,
+    group_sums,
+    to_fixed_point,
+)
 
 
 class StrandsPlayerStats(BasePlayerStats):
@@ -10,12 +18,15 @@ class StrandsPlayerStats(BasePlayerStats):
     avg_rating_raw: float
     avg_rating_adj: float
 
+    # rating counted for every missed puzzle in the adjusted average
+    MISSED_RATING: float = 2.0
+
     def __init__(
         self, user_id: str, puzzle_list: list[int], db: BaseDatabaseHandler
     ) -> None:
         self.user_id = user_id
 
-        player_puzzles = db.get_puzzles_by_player(self.user_id)
+        player_puzzles = set(db.get_puzzles_by_player(self.user_id))
         player_entries: list[StrandsPuzzleEntry] = db.get_entries_by_player(
             self.user_id, puzzle_list
         )
@@ -23,13 +34,11 @@ class StrandsPlayerStats(BasePlayerStats):
         self.missed_games = len([p for p in puzzle_list if p not in player_puzzles])
 
         if len(player_entries) > 0:
-            self.avg_hints = stats.mean([e.hints for e in player_entries])
-            self.avg_spangram_index = stats.mean(
-                [e.spangram_index for e in player_entries if e.spangram_index > 0]
-            )
-            self.avg_rating_raw = stats.mean([e.rating for e in player_entries])
-            self.avg_rating_adj = stats.mean(
-                [e.rating for e in player_entries] + ([2.0] * self.missed_games)
+            self.__set_means(
+                len(player_entries),
+                sum(e.hints for e in player_entries),
+                [e.spangram_index for e in player_entries if e.spangram_index > 0],
+                sum(to_fixed_point(e.rating) for e in player_entries),
             )
         else:
             self.avg_hints = 0.0
@@ -38,6 +47,85 @@ class StrandsPlayerStats(BasePlayerStats):
             self.avg_rating_adj = 0.0
         self.rank = -1
 
+    @classmethod
+    def from_arrays(
+        cls,
+        user_ids: list[str],
+        positions: np.ndarray,
+        columns: dict[str, np.ndarray],
+        puzzle_count: int,
+    ) -> list["StrandsPlayerStats"]:
+        """
+        Build every player's stats in one pass over a puzzle window's entries.
+        columns needs the hints, spangram_index and rating entry columns;
+        positions maps each entry to its player in user_ids and puzzle_count is
+        the number of puzzles in the window.
+        """
+        n = len(user_ids)
+        counts = np.bincount(positions, minlength=n)
+        hints = group_sums(positions, columns["hints"], n)
+        spangram = columns["spangram_index"]
+        found = spangram > 0
+        spangram_counts = np.bincount(positions[found], minlength=n)
+        spangram_totals = group_sums(positions[found], spangram[found], n)
+        ratings = group_fixed_point_sums(positions, columns["rating"], n)
+
+        return [
+            cls.from_aggregates(
+                user_id,
+                puzzle_count - int(counts[i]),
+                int(counts[i]),
+                hints[i],
+                (int(spangram_counts[i]), spangram_totals[i]),
+                ratings[i],
+            )
+            for i, user_id in enumerate(user_ids)
+        ]
+
+    @classmethod
+    def from_aggregates(
+        cls,
+        user_id: str,
+        missed_games: int,
+        count: int,
+        total_hints: int,
+        spangram: tuple[int, int],
+        scaled_ratings: int,
+    ) -> "StrandsPlayerStats":
+        """
+        Build stats from a player's sums over a puzzle window (count > 0).
+        spangram is (entries with a spangram found, their index total) and
+        scaled_ratings is the ratings total in fixed point (see to_fixed_point).
+        """
+        player_stats = cls.__new__(cls)
+        player_stats.user_id = user_id
+        player_stats.missed_games = missed_games
+        player_stats.avg_hints = exact_mean(total_hints, count)
+        player_stats.avg_spangram_index = exact_mean(spangram[1], spangram[0])
+        player_stats.__set_rating_means(count, scaled_ratings)
+        player_stats.rank = -1
+        return player_stats
+
+    def __set_means(
+        self,
+        count: int,
+        total_hints: int,
+        spangram_indexes: list[int],
+        scaled_ratings: int,
+    ) -> None:
+        self.avg_hints = exact_mean(total_hints, count)
+        self.avg_spangram_index = exact_mean(
+            sum(spangram_indexes), len(spangram_indexes)
+        )
+        self.__set_rating_means(count, scaled_ratings)
+
+    def __set_rating_means(self, count: int, scaled_ratings: int) -> None:
+        self.avg_rating_raw = fixed_point_mean(scaled_ratings, count)
+        self.avg_rating_adj = fixed_point_mean(
+            scaled_ratings + to_fixed_point(self.MISSED_RATING) * self.missed_games,
+            count + self.missed_games,
+        )
+
     def get_stat_list(self) -> tuple[float, float, float, float]:
         return (
             self.avg_rating_raw,
@@ -51,38 +139,107 @@ class StrandsPuzzleEntry(BasePuzzleEntry):
     # strands-specific details
     hints: int
     spangram_index: int
+    word_count: int
     rating: float
-    puzzle_str: str
+    grid: bytes | None
 
     # contants
     HINT_PENALTY: float = 0.25
+    # grid symbols, packed 2 bits each with 0 marking the end
+    GRID_SYMBOLS: str = "🔵🟡💡"
+    GRID_BYTES: int = 32
 
     def __init__(
-        self, puzzle_id: int, user_id: str, hints: int, puzzle_str: str
+        self,
+        puzzle_id: int,
+        user_id: str,
+        hints: int,
+        grid: bytes | None,
+        puzzle_str: str | None,
+        spangram_index: int = None,
+        word_count: int = None,
+        rating: float = None,
     ) -> None:
         self.puzzle_id = puzzle_id
         self.user_id = user_id
         self.hints = hints
-        self.puzzle_str = self.__clean_puzzle_str(puzzle_str)
-        self.spangram_index = self.__get_spangram_index(self.puzzle_str)
-        self.rating = self.__get_rating(
-            self.hints, self.spangram_index, self.puzzle_str
+        self.grid = grid
+        # only results the grid can't hold are stored as text
+        self._raw_str = puzzle_str
+        self._puzzle_str = None
+        if rating is None:
+            # not stored with the entry, derive it from the result
+            spangram_index, word_count, rating = self.get_metrics(
+                hints, self.puzzle_str
+            )
+        self.spangram_index = int(spangram_index)
+        self.word_count = int(word_count)
+        self.rating = rating
+
+    @property
+    def puzzle_str(self) -> str:
+        """The result without whitespace, decoded from the grid on first use."""
+        if self._puzzle_str is None:
+            if self._raw_str is not None:
+                self._puzzle_str = self.__clean_puzzle_str(self._raw_str)
+            elif self.grid is not None:
+                self._puzzle_str = self.decode_grid(self.grid)
+            else:
+                self._puzzle_str = ""
+        return self._puzzle_str
+
+    @classmethod
+    def encode_grid(cls, puzzle_str: str) -> bytes | None:
+        """Pack a result's symbols, or None if it has anything else in it."""
+        puzzle_str = cls.__clean_puzzle_str(puzzle_str)
+        if len(puzzle_str) > cls.GRID_BYTES * 4 or any(
+            c not in cls.GRID_SYMBOLS for c in puzzle_str
+        ):
+            return None
+        grid = bytearray((len(puzzle_str) + 3) // 4)
+        for i, c in enumerate(puzzle_str):
+            grid[i // 4] |= (cls.GRID_SYMBOLS.index(c) + 1) << (6 - 2 * (i % 4))
+        return bytes(grid)
+
+    @classmethod
+    def decode_grid(cls, grid: bytes) -> str:
+        symbols = []
+        for byte in bytes(grid):
+            for shift in (6, 4, 2, 0):
+                code = (byte >> shift) & 3
+                if code == 0:
+                    return "".join(symbols)
+                symbols.append(cls.GRID_SYMBOLS[code - 1])
+        return "".join(symbols)
+
+    @classmethod
+    def get_metrics(cls, hints: int, puzzle_str: str) -> tuple[int, int, float]:
+        """(spangram_index, word_count, rating) for a pasted result."""
+        puzzle_str = cls.__clean_puzzle_str(puzzle_str)
+        spangram_index = cls.__get_spangram_index(puzzle_str)
+        word_count = puzzle_str.count("🔵")
+        return (
+            spangram_index,
+            word_count,
+            cls.__get_rating(hints, spangram_index, word_count),
         )
 
-    def __clean_puzzle_str(self, puzzle_str: str) -> str:
+    @staticmethod
+    def __clean_puzzle_str(puzzle_str: str) -> str:
         return puzzle_str.strip().replace("\n", "").replace(" ", "")
 
-    def __get_spangram_index(self, puzzle_str: str) -> int:
+    @staticmethod
+    def __get_spangram_index(puzzle_str: str) -> int:
         for index, item in enumerate(puzzle_str):
             if item == "🟡":
                 return index + 1
         return len(puzzle_str) + 1
 
-    def __get_rating(self, hints: int, spangram_index: int, puzzle_str: str) -> float:
-        word_count = puzzle_str.count("🔵")
-        hint_penalty = hints * self.HINT_PENALTY
+    @classmethod
+    def __get_rating(cls, hints: int, spangram_index: int, word_count: int) -> float:
+        hint_penalty = hints * cls.HINT_PENALTY
         if word_count > 0:
-            spangram_penalty = ((spangram_index - 1.0) / word_count) * self.HINT_PENALTY
+            spangram_penalty = ((spangram_index - 1.0) / word_count) * cls.HINT_PENALTY
             return 1.0 + spangram_penalty + hint_penalty
         else:
             return 1.0 + hint_penalty
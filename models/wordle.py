@@ -1,6 +1,14 @@
-import statistics as stats
+import numpy as np
 from data.base_data_handler import BaseDatabaseHandler
-from models.base_game import BasePlayerStats, BasePuzzleEntry
+from models.base_game import BasePlayerStats, BasePuzzleEntry, exact_mean, group_sums
+
+# packed grids: 2 bits per tile, 5 tiles per guess, guess i in bits 10i to 10i + 9
+GRID_ROW_BITS = 10
+GRID_MAX_ROWS = 6
+GRID_ROW_MASK = (1 << GRID_ROW_BITS) - 1
+GRID_CODES = {"⬜": 1, "⬛": 1, "🟨": 2, "🟩": 3}
+GRID_GREEN = 3
+GRID_YELLOW = 2
 
 
 class WordlePlayerStats(BasePlayerStats):
@@ -16,7 +24,7 @@ class WordlePlayerStats(BasePlayerStats):
     ) -> None:
         self.user_id = user_id
 
-        player_puzzles = db.get_puzzles_by_player(self.user_id)
+        player_puzzles = set(db.get_puzzles_by_player(self.user_id))
         player_entries: list[WordlePuzzleEntry] = db.get_entries_by_player(
             self.user_id, puzzle_list
         )
@@ -24,13 +32,13 @@ class WordlePlayerStats(BasePlayerStats):
         self.missed_games = len([p for p in puzzle_list if p not in player_puzzles])
 
         if len(player_entries) > 0:
-            self.raw_mean = stats.mean([e.score for e in player_entries])
-            self.adj_mean = stats.mean(
-                [e.score for e in player_entries] + ([7] * self.missed_games)
+            self.__set_means(
+                len(player_entries),
+                sum(e.score for e in player_entries),
+                sum(e.green for e in player_entries),
+                sum(e.yellow for e in player_entries),
+                sum(e.other for e in player_entries),
             )
-            self.avg_green = stats.mean([e.green for e in player_entries])
-            self.avg_yellow = stats.mean([e.yellow for e in player_entries])
-            self.avg_other = stats.mean([e.other for e in player_entries])
         else:
             self.raw_mean = 0
             self.adj_mean = 0
@@ -39,6 +47,72 @@ class WordlePlayerStats(BasePlayerStats):
             self.avg_other = 0
         self.rank = -1
 
+    @classmethod
+    def from_aggregates(
+        cls,
+        user_id: str,
+        missed_games: int,
+        count: int,
+        total_score: int,
+        total_green: int,
+        total_yellow: int,
+        total_other: int,
+    ) -> "WordlePlayerStats":
+        """Build stats from a player's sums over a puzzle window (count > 0)."""
+        player_stats = cls.__new__(cls)
+        player_stats.user_id = user_id
+        player_stats.missed_games = missed_games
+        player_stats.__set_means(
+            count, total_score, total_green, total_yellow, total_other
+        )
+        player_stats.rank = -1
+        return player_stats
+
+    @classmethod
+    def from_arrays(
+        cls,
+        user_ids: list[str],
+        positions: np.ndarray,
+        columns: dict[str, np.ndarray],
+        puzzle_count: int,
+    ) -> list["WordlePlayerStats"]:
+        """
+        Build every player's stats in one pass over a puzzle window's entries.
+        positions maps each entry to its player in user_ids; puzzle_count is the
+        number of puzzles in the window.
+        """
+        n = len(user_ids)
+        counts = np.bincount(positions, minlength=n)
+        totals = [
+            group_sums(positions, columns[col], n)
+            for col in ["score", "green", "yellow", "other"]
+        ]
+        return [
+            cls.from_aggregates(
+                user_id,
+                puzzle_count - int(counts[i]),
+                int(counts[i]),
+                *[total[i] for total in totals],
+            )
+            for i, user_id in enumerate(user_ids)
+        ]
+
+    def __set_means(
+        self,
+        count: int,
+        total_score: int,
+        total_green: int,
+        total_yellow: int,
+        total_other: int,
+    ) -> None:
+        self.raw_mean = exact_mean(total_score, count)
+        self.adj_mean = exact_mean(
+            total_score + 7 * self.missed_games, count + self.missed_games
+        )
+        self.avg_green = exact_mean(total_green, count)
+        self.avg_yellow = exact_mean(total_yellow, count)
+        self.avg_other = exact_mean(total_other, count)
+
     def get_stat_list(self) -> list[float, float, float, float, float]:
         return [
             self.raw_mean,
@@ -49,12 +123,71 @@ class WordlePlayerStats(BasePlayerStats):
         ]
 
 
+class WordleGridStats:
+    """
+    Per-guess averages over a player's packed grids.
+    - first_green / first_yellow: tiles of each color on the first guess
+    - green_after_2: greens on the second guess (5 if solved on the first)
+    """
+
+    count: int
+    first_green: float
+    first_yellow: float
+    green_after_2: float
+
+    @classmethod
+    def from_grids(
+        cls, user_ids: list[str], positions: np.ndarray, grids: np.ndarray
+    ) -> dict[str, "WordleGridStats"]:
+        """
+        Stats for every player in user_ids with at least one grid, computed with
+        bit operations over all of their grids at once. positions maps each
+        grid (int64) to its player in user_ids.
+        """
+        n = len(user_ids)
+        counts = np.bincount(positions, minlength=n)
+        first = grids & GRID_ROW_MASK
+        rows = sum(
+            ((grids >> (GRID_ROW_BITS * i)) & GRID_ROW_MASK) != 0
+            for i in range(GRID_MAX_ROWS)
+        )
+        # a board solved in one has no second guess, its last row counts instead
+        second = (grids >> (GRID_ROW_BITS * (np.minimum(rows, 2) - 1))) & GRID_ROW_MASK
+        totals = [
+            group_sums(positions, cls.__count_tiles(row, code), n)
+            for row, code in [
+                (first, GRID_GREEN),
+                (first, GRID_YELLOW),
+                (second, GRID_GREEN),
+            ]
+        ]
+
+        grid_stats = {}
+        for i, user_id in enumerate(user_ids):
+            count = int(counts[i])
+            if count == 0:
+                continue
+            player_grid_stats = cls()
+            player_grid_stats.count = count
+            player_grid_stats.first_green = exact_mean(totals[0][i], count)
+            player_grid_stats.first_yellow = exact_mean(totals[1][i], count)
+            player_grid_stats.green_after_2 = exact_mean(totals[2][i], count)
+            grid_stats[user_id] = player_grid_stats
+        return grid_stats
+
+    @staticmethod
+    def __count_tiles(rows: np.ndarray, code: int) -> np.ndarray:
+        """Tiles of one color in each packed row."""
+        return sum(((rows >> (2 * j)) & 3) == code for j in range(5)).astype(np.int64)
+
+
 class WordlePuzzleEntry(BasePuzzleEntry):
     # wordle-specific details
     score: int
     green: int
     yellow: int
     other: int
+    grid: int | None
 
     def __init__(
         self,
@@ -64,6 +197,7 @@ class WordlePuzzleEntry(BasePuzzleEntry):
         green: int,
         yellow: int,
         other: int,
+        grid: int | None = None,
     ) -> None:
         self.puzzle_id = puzzle_id
         self.user_id = user_id
@@ -71,3 +205,23 @@ class WordlePuzzleEntry(BasePuzzleEntry):
         self.green = green
         self.yellow = yellow
         self.other = other
+        self.grid = grid
+
+    @staticmethod
+    def encode_grid(puzzle: str) -> int | None:
+        """
+        Pack a result's rows of tiles into one integer, or None if it has no
+        rows (or more than six). Lines with anything besides tiles are skipped.
+        """
+        rows = [
+            line.strip()
+            for line in puzzle.split("\n")
+            if line.strip() and all(c in GRID_CODES for c in line.strip())
+        ]
+        if not rows or len(rows) > GRID_MAX_ROWS or any(len(row) != 5 for row in rows):
+            return None
+        grid = 0
+        for i, row in enumerate(rows):
+            for j, c in enumerate(row):
+                grid |= GRID_CODES[c] << (GRID_ROW_BITS * i + 2 * j)
+        return grid
@@ -0,0 +1,72 @@
+"""
+Compare trim_image against the per-pixel loop it replaced.
+
+    python scripts/bench_trim_image.py [screenshot.png ...]
+
+With no arguments, times a synthetic tall table screenshot (a short table
+on a mostly white page, like Chrome produces). Each image is checked to
+trim to exactly the same pixels before it's timed.
+"""
+
+import os, sys, timeit
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.rendering import trim_image
+
+
+def trim_image_loop(image: Image.Image) -> Image.Image:
+    # the original implementation, kept as the reference
+    if image is None:
+        return None
+    rgb_image = image.convert("RGB")
+    width, height = image.size
+    for y in reversed(range(height)):
+        for x in range(0, max(15, width)):
+            rgb = rgb_image.getpixel((x, y))
+            if rgb != (255, 255, 255):
+                # account for differences in browsers
+                if x < 10 and rgb in [(254, 254, 254), (240, 240, 240)]:
+                    return rgb_image.crop([5, 5, width, y])
+                else:
+                    return rgb_image.crop([5, 5, width, y + 8])
+
+    return rgb_image
+
+
+def make_screenshot(
+    width: int = 1200, height: int = 3000, rows: int = 12
+) -> Image.Image:
+    image = Image.new("RGBA", (width, height), (255, 255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([0, 0, width - 1, 28], fill=(240, 240, 240, 255))
+    for i in range(rows + 1):
+        y = 28 + i * 25
+        draw.line([0, y, width - 1, y], fill=(220, 220, 220, 255))
+        draw.text((20, y + 6), f"player {i}    3.52    41    2", fill=(33, 33, 33, 255))
+    return image
+
+
+def bench(name: str, image: Image.Image, number: int) -> None:
+    expected = trim_image_loop(image)
+    actual = trim_image(image)
+    if expected.size != actual.size or expected.tobytes() != actual.tobytes():
+        print(f"{name}: MISMATCH {expected.size} vs {actual.size}")
+        return
+    loop_time = timeit.timeit(lambda: trim_image_loop(image), number=number) / number
+    numpy_time = timeit.timeit(lambda: trim_image(image), number=number) / number
+    print(
+        f"{name} {image.size[0]}x{image.size[1]} -> {actual.size[0]}x{actual.size[1]}: "
+        f"loop {loop_time * 1000:.1f} ms, numpy {numpy_time * 1000:.1f} ms "
+        f"({loop_time / numpy_time:.0f}x)"
+    )
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:]
+    if len(paths) == 0:
+        bench("synthetic", make_screenshot(), number=5)
+        bench("blank", Image.new("RGB", (800, 1200), (255, 255, 255)), number=2)
+    for path in paths:
+        bench(os.path.basename(path), Image.open(path), number=5)
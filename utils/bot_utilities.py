@@ -1,28 +1,95 @@
 from math import floor
-import os
+import asyncio, os
 import discord, io, re
-import matplotlib.pyplot as plt
 from bokeh.io.export import get_screenshot_as_png
 from bokeh.models import ColumnDataSource, DataTable, TableColumn
-from datetime import date, datetime, timedelta, timezone
+from datetime import date, datetime, time, timedelta, timezone
 from discord.ext import commands
+from typing import Iterable
 from PIL import Image
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
 
+from utils.chrome_pool import ChromeDriverPool
+from utils.image_cache import ImageCache
 from utils.nyt_game import NYTGame
+from utils.render_pool import RenderPool
+from utils.rendering import (
+    RENDER_VERSION,
+    image_spec,
+    init_worker,
+    render_png,
+    table_spec,
+)
+from utils.single_flight import SingleFlight
 
 
 class BotUtilities:
+    RENDER_LOG_EVERY: int = 100
+
     def __init__(self, client: discord.Client, bot: commands.Bot) -> None:
         self.client: discord.Client = client
         self.bot: commands.Bot = bot
-        self.chrome_driver_path = (
-            os.environ.get("CHROME_DRIVER_PATH", "/usr/bin/chromedriver")
+        self.chrome_driver_path = os.environ.get(
+            "CHROME_DRIVER_PATH", "/usr/bin/chromedriver"
+        )
+        self.chrome_binary_path = os.environ.get(
+            "CHROME_BINARY_PATH", "/usr/bin/google-chrome"
+        )
+        self.chrome_pool = ChromeDriverPool(
+            self.chrome_driver_path,
+            self.chrome_binary_path,
+            size=int(os.environ.get("CHROME_POOL_SIZE", "2")),
+            max_renders=int(os.environ.get("CHROME_POOL_MAX_RENDERS", "100")),
+            checkout_timeout=float(os.environ.get("CHROME_POOL_TIMEOUT", "30")),
+        )
+        # "bokeh" (headless Chrome screenshot) or "pillow" (native drawing)
+        self.table_renderer = os.environ.get("TABLE_RENDERER", "bokeh").lower()
+        # fonts and PNG settings for the render workers, also part of each
+        # cached image's key so changing them doesn't serve old renders
+        self.render_settings = (
+            os.environ.get(
+                "TABLE_FONT_PATH",
+                "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+            ),
+            os.environ.get(
+                "TABLE_EMOJI_FONT_PATH",
+                "/usr/share/fonts/truetype/noto/NotoColorEmoji.ttf",
+            ),
+            int(os.environ.get("TABLE_FONT_SIZE", "16")),
+            int(os.environ.get("PNG_COMPRESS_LEVEL", "6")),
+            int(os.environ.get("PNG_COLORS", "0")),
         )
-        self.chrome_binary_path = (
-            os.environ.get("CHROME_BINARY_PATH", "/usr/bin/google-chrome")
+        # tables (pillow), screenshot trimming, charts and PNG encoding run here
+        self.render_pool = RenderPool(
+            size=int(os.environ.get("RENDER_POOL_SIZE", "2")),
+            max_jobs=int(os.environ.get("RENDER_POOL_MAX_JOBS", "100")),
+            timeout=float(os.environ.get("RENDER_POOL_TIMEOUT", "30")),
+            initializer=init_worker,
+            initargs=self.render_settings,
         )
+        # output size and encode time of every render, logged every RENDER_LOG_EVERY
+        self.render_count = 0
+        self.render_bytes = 0
+        self.encode_seconds = 0.0
+        # concurrent renders of the same image share one job
+        self._render_flight = SingleFlight()
+        self.image_cache = ImageCache(
+            max_bytes=int(os.environ.get("IMAGE_CACHE_MAX_BYTES", str(32 * 1024**2))),
+            disk_dir=os.environ.get("IMAGE_CACHE_DIR") or None,
+            disk_max_bytes=int(
+                os.environ.get("IMAGE_CACHE_DISK_MAX_BYTES", str(256 * 1024**2))
+            ),
+        )
+        # member id -> display name for the bot's guild, kept current by the
+        # member listeners; stored names cover players who have left
+        self.member_names: dict[str, str] = {}
+        self.stored_names: dict[str, str] = {}
+        # bumped whenever a name changes, so rendered tables can be reused until then
+        self.names_version = 0
+
+    def warm_up(self) -> None:
+        self.render_pool.start()
+        if self.table_renderer == "bokeh":
+            self.chrome_pool.start()
 
     # GAME TYPE
 
@@ -57,11 +124,45 @@ class BotUtilities:
     # QUERIES
 
     def get_nickname(self, user_id: str) -> str:
+        user_id = str(user_id)
+        name = self.member_names.get(user_id)
+        if name is None:
+            name = self.stored_names.get(user_id, "?")
+        return name
+
+    def get_nicknames(self, user_ids: Iterable[str]) -> dict[str, str]:
+        return {str(user_id): self.get_nickname(user_id) for user_id in user_ids}
+
+    # MEMBER NAME INDEX
+
+    def index_members(self) -> None:
         guild = self.bot.get_guild(self.bot.guild_id)
-        for member in guild.members:
-            if str(member.id) == str(user_id):
-                return member.display_name
-        return "?"
+        if guild is None:
+            return
+        # build a new dict and swap it in, so lookups never see a partial index
+        self.member_names = {
+            str(member.id): member.display_name for member in guild.members
+        }
+        self.names_version += 1
+
+    def set_member_name(self, member: discord.Member) -> None:
+        if member.guild.id == self.bot.guild_id:
+            if self.member_names.get(str(member.id)) != member.display_name:
+                self.member_names[str(member.id)] = member.display_name
+                self.names_version += 1
+
+    def remove_member_name(self, member: discord.Member) -> None:
+        if member.guild.id == self.bot.guild_id:
+            # keep showing their last known name instead of "?"
+            self.stored_names[str(member.id)] = member.display_name
+            self.member_names.pop(str(member.id), None)
+            self.names_version += 1
+
+    def add_stored_names(self, names: dict[str, str]) -> None:
+        for user_id, name in names.items():
+            if name and name != "?":
+                self.stored_names[user_id] = name
+        self.names_version += 1
 
     # VALIDATION
 
@@ -94,6 +195,12 @@ class BotUtilities:
     def get_todays_date(self) -> date:
         return datetime.now(timezone(timedelta(hours=-5), "EST")).date()
 
+    def get_seconds_until_rollover(self) -> float:
+        """Seconds until get_todays_date moves on to the next day."""
+        now = datetime.now(timezone(timedelta(hours=-5), "EST"))
+        tomorrow = datetime.combine(now.date() + timedelta(days=1), time(), now.tzinfo)
+        return (tomorrow - now).total_seconds() + 1
+
     def get_week_start(self, query_date: date):
         if query_date is not None and type(query_date) is date:
             return query_date - timedelta(days=(query_date.weekday() + 1) % 7)
@@ -136,7 +243,74 @@ class BotUtilities:
 
     # DATA FRAME TO IMAGE
 
-    def get_image_from_df(self, df) -> Image.Image:
+    async def get_png_from_df_async(self, df, chart: dict = None) -> bytes:
+        """
+        render_png_async, through the image cache. Concurrent calls for the
+        same table and chart share one render.
+        """
+        options = {
+            "renderer": self.table_renderer,
+            "settings": self.render_settings,
+            "version": RENDER_VERSION,
+        }
+        if chart is not None:
+            options["chart"] = chart
+        key = self.image_cache.make_key(df, **options)
+        png = await self.image_cache.get_async(key)
+        if png is None:
+            png = await self._render_flight.run(
+                key, lambda: self.__render_and_cache(key, df, chart)
+            )
+        return png
+
+    async def render_png_async(self, df, chart: dict = None) -> bytes | None:
+        """
+        Render df as a table, with an optional bar_chart_spec drawn under it, on
+        the render pool. Returns None if rendering failed.
+        """
+        spec = {"chart": chart}
+        if self.table_renderer == "pillow":
+            spec["table"] = table_spec(df)
+        else:
+            # Chrome already draws the table in its own process, the pool only trims it
+            screenshot = await asyncio.to_thread(self.__screenshot_df, df)
+            if screenshot is None:
+                return None
+            spec["image"] = image_spec(screenshot)
+        result = await self.render_pool.run(render_png, spec)
+        if result is None:
+            return None
+        self.__record_render(len(result["png"]), result["encode_seconds"])
+        return result["png"]
+
+    def get_file_from_png(
+        self, png: bytes, filename: str = "image.png"
+    ) -> discord.File:
+        return discord.File(fp=io.BytesIO(png), filename=filename)
+
+    async def __render_and_cache(self, key: str, df, chart: dict) -> bytes | None:
+        png = await self.render_png_async(df, chart)
+        if png is not None:
+            await self.image_cache.put_async(key, png)
+        return png
+
+    def __record_render(self, size: int, encode_seconds: float) -> None:
+        self.render_count += 1
+        self.render_bytes += size
+        self.encode_seconds += encode_seconds
+        if self.render_count % self.RENDER_LOG_EVERY == 0:
+            cache = self.image_cache.get_stats()
+            print(
+                f"Rendered {self.render_count} images: "
+                f"avg {self.render_bytes / self.render_count / 1024:.1f} KB, "
+                f"avg encode {self.encode_seconds / self.render_count * 1000:.1f} ms, "
+                f"{self._render_flight.shared} shared with a render in flight, "
+                f"cache {cache['hits']} hits / {cache['misses']} misses, "
+                f"{cache['bytes'] / 1024**2:.1f} MB in memory, "
+                f"{cache['disk_bytes'] / 1024**2:.1f} MB on disk"
+            )
+
+    def __screenshot_df(self, df) -> Image.Image:
         source = ColumnDataSource(df)
 
         df_columns = df.columns.values
@@ -152,75 +326,8 @@ class BotUtilities:
             autosize_mode="fit_columns",
         )
 
-        chrome_options = webdriver.ChromeOptions()
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--headless")
-        chrome_options.binary_location = self.chrome_binary_path
-
-        service = Service(executable_path=self.chrome_driver_path)
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-
-        generated: Image.Image = get_screenshot_as_png(data_table, driver=driver)
-        driver.quit()
-        return self._trim_image(generated)
-
-    def _trim_image(self, image: Image.Image) -> Image.Image:
-        if image is None:
-            return None
-        rgb_image = image.convert("RGB")
-        width, height = image.size
-        for y in reversed(range(height)):
-            for x in range(0, max(15, width)):
-                rgb = rgb_image.getpixel((x, y))
-                if rgb != (255, 255, 255):
-                    # account for differences in browsers
-                    if x < 10 and rgb in [(254, 254, 254), (240, 240, 240)]:
-                        return rgb_image.crop([5, 5, width, y])
-                    else:
-                        return rgb_image.crop([5, 5, width, y + 8])
-
-        return rgb_image
-
-    def fig_to_image(self, fig: plt.Figure) -> Image.Image:
-        buf = io.BytesIO()
-        fig.savefig(buf)
-        buf.seek(0)
-        img = Image.open(buf)
-        return img
-
-    def image_to_binary(self, img: Image.Image) -> io.BytesIO:
-        buf = io.BytesIO()
-        img.save(buf, "PNG")
-        buf.seek(0)
-        return buf
-
-    def combine_images(self, img1: Image.Image, img2: Image.Image) -> Image.Image:
-        widths, heights = zip(*(i.size for i in [img1, img2]))
-        w = max(widths)
-        h = sum(heights)
-        combo = Image.new("RGBA", (w, h))
-        combo.paste(img1, (0, 0))
-        combo.paste(img2, (0, img1.size[1]))
-        return combo
-
-    def resize_image(
-        self, image: Image.Image, width: int = None, height: int = None
-    ) -> Image.Image:
-        w, h = image.size
-        if width is None and height is None:
-            return image
-        if width is None:
-            r = height / float(h)
-            dim = (int(w * r), height)
-        else:
-            r = width / float(w)
-            dim = (width, int(h * r))
-        try:
-            return image.resize(dim)
-        except Exception as e:
-            print("Caught exception: " + str(e))
-            return None
+        with self.chrome_pool.driver() as driver:
+            return get_screenshot_as_png(data_table, driver=driver)
 
     def remove_emojis(self, data: str) -> str:
         emoj = re.compile(
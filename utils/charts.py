@@ -0,0 +1,96 @@
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+
+# shared chart style, passed to each artist instead of set in plt.rcParams
+FONT_SIZE = 20
+BAR_LABEL_SIZE = 15
+# total width of a category's group of bars
+GROUP_WIDTH = 0.8
+DEFAULT_DPI = 100
+COLORS = [
+    "#1f77b4",
+    "#ff7f0e",
+    "#2ca02c",
+    "#d62728",
+    "#9467bd",
+    "#8c564b",
+    "#e377c2",
+    "#7f7f7f",
+    "#bcbd22",
+    "#17becf",
+]
+
+
+def bar_chart_spec(
+    categories: list[str],
+    series: list[tuple[str, list[int]]],
+    x_label: str,
+    y_label: str,
+    legend_title: str = "Player",
+    size: tuple[float, float] = (10, 5),
+) -> dict:
+    """
+    A grouped bar chart: one group per category, with a bar in each group for
+    every (label, counts) series. size is in inches at DEFAULT_DPI.
+    """
+    return {
+        "categories": [str(category) for category in categories],
+        "series": [(str(label), [int(c) for c in counts]) for label, counts in series],
+        "x_label": x_label,
+        "y_label": y_label,
+        "legend_title": legend_title,
+        "size": size,
+    }
+
+
+def render_bar_chart(spec: dict, width: int = None) -> Image.Image:
+    """
+    Draw a bar_chart_spec into an RGBA image. With width set, the chart is
+    drawn at that many pixels wide (keeping its aspect ratio) rather than
+    drawn at DEFAULT_DPI and resized.
+    """
+    fig_width, fig_height = spec["size"]
+    dpi = width / fig_width if width else DEFAULT_DPI
+    fig = Figure(figsize=(fig_width, fig_height), dpi=dpi, layout="constrained")
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    x = np.arange(len(spec["categories"]))
+    series = spec["series"]
+    bar_width = GROUP_WIDTH / max(1, len(series))
+    for i, (label, counts) in enumerate(series):
+        offset = (i - (len(series) - 1) / 2) * bar_width
+        bars = ax.bar(
+            x + offset,
+            counts,
+            bar_width,
+            label=label,
+            color=COLORS[i % len(COLORS)],
+        )
+        ax.bar_label(
+            bars,
+            labels=["%d" % c for c in counts],
+            label_type="edge",
+            fontsize=BAR_LABEL_SIZE,
+        )
+
+    ax.set_xticks(x, spec["categories"])
+    ax.tick_params(labelsize=FONT_SIZE)
+    ax.set_xlabel(spec["x_label"], fontsize=FONT_SIZE)
+    ax.set_ylabel(spec["y_label"], fontsize=FONT_SIZE)
+    ax.margins(y=0.1)
+    ax.spines[["top", "right"]].set_visible(False)
+    if len(series) > 0:
+        ax.legend(
+            title=spec["legend_title"],
+            fontsize=FONT_SIZE,
+            title_fontsize=FONT_SIZE,
+            frameon=False,
+            loc="center left",
+            bbox_to_anchor=(1, 0.5),
+        )
+
+    canvas.draw()
+    return Image.fromarray(np.asarray(canvas.buffer_rgba()))
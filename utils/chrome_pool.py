@@ -0,0 +1,150 @@
+import queue, threading
+from contextlib import contextmanager
+from typing import Iterator
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+
+
+class PooledDriver:
+    def __init__(self, driver: webdriver.Chrome) -> None:
+        self.driver = driver
+        self.renders = 0
+
+
+class ChromeDriverPool:
+    """
+    Keeps a fixed number of headless Chrome drivers warm so renders only pay
+    for the screenshot, not for booting a browser.
+    - size: maximum number of live drivers
+    - max_renders: recycle a driver after this many renders
+    - checkout_timeout: seconds to wait for a free driver before giving up
+    """
+
+    def __init__(
+        self,
+        driver_path: str,
+        binary_path: str,
+        size: int = 2,
+        max_renders: int = 100,
+        checkout_timeout: float = 30.0,
+    ) -> None:
+        self._driver_path = driver_path
+        self._binary_path = binary_path
+        self._size = max(1, size)
+        self._max_renders = max(1, max_renders)
+        self._checkout_timeout = checkout_timeout
+        self._idle: queue.LifoQueue[PooledDriver] = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._live = 0
+        self._closed = False
+
+    ####################
+    #  POOL LIFECYCLE  #
+    ####################
+
+    def start(self) -> None:
+        """Pre-launch drivers up to the pool size. Blocks while Chrome boots."""
+        self._closed = False
+        for _ in range(self._size):
+            if not self._reserve_slot():
+                break
+            self._launch_into_pool()
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(pooled)
+
+    @contextmanager
+    def driver(self) -> Iterator[webdriver.Chrome]:
+        """
+        Check out a healthy driver, waiting if every driver is busy. A driver
+        that raises during use is treated as crashed and replaced.
+        """
+        pooled = self._checkout()
+        try:
+            yield pooled.driver
+        except Exception:
+            self._discard(pooled)
+            self._replenish()
+            raise
+        pooled.renders += 1
+        if pooled.renders >= self._max_renders or self._closed:
+            self._discard(pooled)
+            self._replenish()
+        else:
+            self._idle.put(pooled)
+
+    ####################
+    #  HELPER METHODS  #
+    ####################
+
+    def _checkout(self) -> PooledDriver:
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                if self._reserve_slot():
+                    return self._launch()
+                try:
+                    pooled = self._idle.get(timeout=self._checkout_timeout)
+                except queue.Empty:
+                    raise TimeoutError("Timed out waiting for a free Chrome driver")
+            if self._is_healthy(pooled):
+                return pooled
+            self._discard(pooled)
+
+    def _reserve_slot(self) -> bool:
+        with self._lock:
+            if self._live < self._size:
+                self._live += 1
+                return True
+            return False
+
+    def _release_slot(self) -> None:
+        with self._lock:
+            self._live -= 1
+
+    def _launch(self) -> PooledDriver:
+        try:
+            chrome_options = webdriver.ChromeOptions()
+            chrome_options.add_argument("--disable-dev-shm-usage")
+            chrome_options.add_argument("--no-sandbox")
+            chrome_options.add_argument("--headless")
+            chrome_options.binary_location = self._binary_path
+
+            service = Service(executable_path=self._driver_path)
+            return PooledDriver(
+                webdriver.Chrome(service=service, options=chrome_options)
+            )
+        except Exception:
+            self._release_slot()
+            raise
+
+    def _launch_into_pool(self) -> None:
+        try:
+            self._idle.put(self._launch())
+        except Exception as e:
+            print(f"Failed to launch Chrome driver: {e}")
+
+    def _replenish(self) -> None:
+        """Boot a replacement driver in the background to keep the pool warm."""
+        if not self._closed and self._reserve_slot():
+            threading.Thread(target=self._launch_into_pool, daemon=True).start()
+
+    def _discard(self, pooled: PooledDriver) -> None:
+        try:
+            pooled.driver.quit()
+        except Exception:
+            pass
+        self._release_slot()
+
+    def _is_healthy(self, pooled: PooledDriver) -> bool:
+        try:
+            return pooled.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
@@ -0,0 +1,162 @@
+import asyncio, hashlib, os, threading
+from collections import OrderedDict
+
+
+class ImageCache:
+    """
+    Content-addressed LRU cache of encoded PNG bytes.
+    - max_bytes: total size of PNGs kept in memory before evicting the least recently used
+    - disk_dir: optional directory for a second tier that survives restarts
+    - disk_max_bytes: total size of the files in disk_dir before removing the
+      least recently used (oldest mtime)
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        disk_dir: str = None,
+        disk_max_bytes: int = 256 * 1024 * 1024,
+    ) -> None:
+        self._max_bytes = max_bytes
+        self._disk_dir = disk_dir
+        self._disk_max_bytes = disk_max_bytes
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        # key -> file size, oldest mtime first
+        self._disk_entries: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.disk_size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        if self._disk_dir:
+            os.makedirs(self._disk_dir, exist_ok=True)
+            self.__scan_disk()
+
+    def make_key(self, *frames, **options) -> str:
+        """Hash the contents (columns + values) of each DataFrame plus the render options."""
+        digest = hashlib.sha256()
+        for df in frames:
+            if df is None:
+                digest.update(b"\x00none")
+            else:
+                digest.update(df.to_csv(index=False).encode("utf-8"))
+            digest.update(b"\x00frame")
+        for name in sorted(options):
+            digest.update(f"{name}={options[name]!r}\x00".encode("utf-8"))
+        return digest.hexdigest()
+
+    async def get_async(self, key: str) -> bytes | None:
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return png
+
+        png = None
+        if self._disk_dir:
+            # file I/O stays off the event loop
+            png = await asyncio.to_thread(self.__read_disk, key)
+        with self._lock:
+            if png is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.__store(key, png)
+            if key in self._disk_entries:
+                self._disk_entries.move_to_end(key)
+        return png
+
+    async def put_async(self, key: str, png: bytes) -> None:
+        with self._lock:
+            self.__store(key, png)
+        if self._disk_dir:
+            await asyncio.to_thread(self.__write_disk, key, png)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def get_stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size_bytes,
+                "disk_entries": len(self._disk_entries),
+                "disk_bytes": self.disk_size_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    ####################
+    #  HELPER METHODS  #
+    ####################
+
+    def __store(self, key: str, png: bytes) -> None:
+        if len(png) > self._max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size_bytes -= len(previous)
+        self._entries[key] = png
+        self.size_bytes += len(png)
+        while self.size_bytes > self._max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size_bytes -= len(evicted)
+
+    def __disk_path(self, key: str) -> str:
+        return os.path.join(self._disk_dir, f"{key}.png")
+
+    def __scan_disk(self) -> None:
+        """Pick up files left by a previous run, oldest mtime first."""
+        files = []
+        for entry in os.scandir(self._disk_dir):
+            if entry.is_file() and entry.name.endswith(".png"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        for _, key, size in sorted(files):
+            self._disk_entries[key] = size
+            self.disk_size_bytes += size
+        self.__prune_disk()
+
+    def __read_disk(self, key: str) -> bytes | None:
+        if not self._disk_dir:
+            return None
+        path = self.__disk_path(key)
+        try:
+            with open(path, "rb") as fh:
+                png = fh.read()
+            # a hit makes it the newest file, like move_to_end in memory
+            os.utime(path)
+            return png
+        except OSError:
+            return None
+
+    def __write_disk(self, key: str, png: bytes) -> None:
+        if not self._disk_dir or len(png) > self._disk_max_bytes:
+            return
+        path = self.__disk_path(key)
+        try:
+            with open(f"{path}.tmp", "wb") as fh:
+                fh.write(png)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            print(f"Failed to write image cache file {path}: {e}")
+            return
+        with self._lock:
+            self.disk_size_bytes -= self._disk_entries.pop(key, 0)
+            self._disk_entries[key] = len(png)
+            self.disk_size_bytes += len(png)
+            self.__prune_disk()
+
+    def __prune_disk(self) -> None:
+        # callers hold self._lock or are still in __init__
+        while self.disk_size_bytes > self._disk_max_bytes:
+            key, size = self._disk_entries.popitem(last=False)
+            self.disk_size_bytes -= size
+            try:
+                os.remove(self.__disk_path(key))
+            except OSError:
+                pass
@@ -0,0 +1,154 @@
+import asyncio, multiprocessing, threading
+from multiprocessing.pool import Pool
+from typing import Any, Callable
+
+
+class RenderPool:
+    """
+    Runs CPU-bound render jobs in worker processes, so a slow chart never
+    holds up the event loop (or its GIL).
+    - size: number of worker processes, 0 runs jobs on a background thread
+    - max_jobs: recycle a worker after this many jobs
+    - timeout: seconds a job may run before the workers are torn down
+    - initializer/initargs: run once in every worker (or locally when size is 0)
+    Jobs are module-level functions taking and returning picklable data. At
+    most one job per worker is handed to the pool at a time, so the timeout
+    only counts a job while it runs. A job that times out or takes its worker
+    down with it returns None, and the next job gets a fresh set of workers.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        max_jobs: int = 100,
+        timeout: float = 30.0,
+        initializer: Callable = None,
+        initargs: tuple = (),
+    ) -> None:
+        self._size = max(0, size)
+        self._max_jobs = max(1, max_jobs)
+        self._timeout = timeout
+        self._initializer = initializer
+        self._initargs = initargs
+        self._pool: Pool = None
+        self._lock = threading.Lock()
+        self._closed = False
+        # job -> the workers running it, so a teardown can fail its jobs at once
+        self._pending: dict[asyncio.Future, Pool] = {}
+        # a slot per worker, held from submit until the job's result is in
+        self._slots = asyncio.Semaphore(max(1, self._size))
+        # local jobs share one set of renderer globals, run them one at a time
+        self._local_lock = threading.Lock()
+        self._local_ready = False
+
+    ####################
+    #  POOL LIFECYCLE  #
+    ####################
+
+    def start(self) -> None:
+        """Spawn the workers ahead of the first job."""
+        if self._size > 0:
+            with self._lock:
+                self.__get_pool()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.terminate()
+
+    ####################
+    #       JOBS       #
+    ####################
+
+    async def run(self, func: Callable, *args: Any) -> Any:
+        """Run func(*args) on a worker and return its result, or None if it failed."""
+        if self._size == 0:
+            try:
+                return await asyncio.to_thread(self.__run_local, func, args)
+            except Exception as e:
+                print(f"Render job failed: {e}")
+                return None
+
+        # no deadline here: every running job frees its slot within the timeout
+        await self._slots.acquire()
+        try:
+            return await self.__run_pooled(func, args)
+        finally:
+            self._slots.release()
+
+    ####################
+    #  HELPER METHODS  #
+    ####################
+
+    async def __run_pooled(self, func: Callable, args: tuple) -> Any:
+        # callers hold a slot, so a worker is free and the job starts right away
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            pool = self.__get_pool()
+            if pool is None:
+                return None
+            pool.apply_async(
+                func,
+                args,
+                callback=lambda result: loop.call_soon_threadsafe(
+                    self.__resolve, future, result, None
+                ),
+                error_callback=lambda e: loop.call_soon_threadsafe(
+                    self.__resolve, future, None, e
+                ),
+            )
+        self._pending[future] = pool
+
+        try:
+            return await asyncio.wait_for(future, self._timeout)
+        except asyncio.TimeoutError:
+            # the worker is stuck or died mid-job, its result will never come
+            print(f"Render job timed out after {self._timeout}s, restarting workers")
+            await self.__restart(pool)
+            return None
+        except Exception as e:
+            print(f"Render job failed: {e}")
+            return None
+        finally:
+            self._pending.pop(future, None)
+
+    def __get_pool(self) -> Pool | None:
+        # callers hold self._lock
+        if self._pool is None and not self._closed:
+            # spawn, not fork: the bot process has live threads and sockets
+            self._pool = multiprocessing.get_context("spawn").Pool(
+                self._size, self._initializer, self._initargs, self._max_jobs
+            )
+        return self._pool
+
+    async def __restart(self, pool: Pool) -> None:
+        with self._lock:
+            if self._pool is not pool:
+                # already replaced by another job's timeout
+                return
+            self._pool = None
+        for future, job_pool in list(self._pending.items()):
+            if job_pool is pool and not future.done():
+                future.set_exception(RuntimeError("render workers were restarted"))
+        await asyncio.to_thread(pool.terminate)
+
+    def __resolve(
+        self, future: asyncio.Future, result: Any, error: BaseException | None
+    ) -> None:
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def __run_local(self, func: Callable, args: tuple) -> Any:
+        with self._local_lock:
+            if not self._local_ready:
+                if self._initializer is not None:
+                    self._initializer(*self._initargs)
+                self._local_ready = True
+            return func(*args)
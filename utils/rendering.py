@@ -0,0 +1,138 @@
+import io, time
+import numpy as np
+import pandas as pd
+from PIL import Image, ImageChops
+from utils.charts import render_bar_chart
+from utils.table_renderer import PillowTableRenderer
+
+# Jobs for RenderPool workers. Specs are plain dicts so they can be sent to
+# another process, and every job returns PNG bytes.
+
+# part of every cached image's key, bump it when a change here or in the
+# table or chart renderers changes the output
+RENDER_VERSION = 1
+
+# set in each worker by init_worker
+_table_renderer: PillowTableRenderer = None
+_compress_level: int = 6
+# palette size for the final PNG, 0 keeps full color
+_colors: int = 0
+
+
+def init_worker(
+    font_path: str,
+    emoji_font_path: str,
+    font_size: int,
+    compress_level: int = 6,
+    colors: int = 0,
+) -> None:
+    global _table_renderer, _compress_level, _colors
+    _table_renderer = PillowTableRenderer(
+        font_path, emoji_font_path, font_size=font_size
+    )
+    _compress_level = min(9, max(0, compress_level))
+    _colors = min(256, max(0, colors))
+
+
+####################
+#      SPECS       #
+####################
+
+
+def table_spec(df) -> dict:
+    """A DataFrame as the header and cell text the table renderer draws."""
+    return {
+        "columns": [str(column) for column in df.columns.values],
+        "rows": [[str(value) for value in row] for row in df.itertuples(index=False)],
+    }
+
+
+def image_spec(image: Image.Image) -> dict:
+    return {"mode": image.mode, "size": image.size, "pixels": image.tobytes()}
+
+
+####################
+#       JOBS       #
+####################
+
+
+def render_png(spec: dict) -> dict | None:
+    """
+    Render a table with an optional chart under it, as
+    {"png": bytes, "encode_seconds": float}.
+    - spec["table"]: a table_spec, drawn with the pillow renderer
+    - spec["image"]: an image_spec of a screenshot to trim, instead of a table
+    - spec["chart"]: a bar_chart_spec, or None
+    """
+    if spec.get("image") is not None:
+        image = spec["image"]
+        img = trim_image(Image.frombytes(image["mode"], image["size"], image["pixels"]))
+    else:
+        table = spec["table"]
+        img = _table_renderer.render(
+            pd.DataFrame(table["rows"], columns=table["columns"])
+        )
+    if img is None:
+        return None
+    frames = [img]
+    if spec.get("chart") is not None:
+        frames.append(render_bar_chart(spec["chart"], width=img.size[0]))
+    return encode_png(stack_images(frames))
+
+
+####################
+#  IMAGE HELPERS   #
+####################
+
+
+def trim_image(image: Image.Image) -> Image.Image:
+    """
+    Crop a table screenshot to just above its bottom-most non-white row,
+    dropping a 5px margin on the top and left.
+    """
+    if image is None:
+        return None
+    rgb_image = image.convert("RGB")
+    width, height = image.size
+    # white inverts to black, so the box covers every non-white pixel
+    bbox = ImageChops.invert(rgb_image).getbbox()
+    if bbox is None:
+        return rgb_image
+
+    y = bbox[3] - 1
+    row = np.asarray(rgb_image.crop((0, y, width, y + 1)))[0]
+    x = int(np.argmax((row != 255).any(axis=1)))
+    rgb = tuple(int(v) for v in row[x])
+    # account for differences in browsers
+    if x < 10 and rgb in [(254, 254, 254), (240, 240, 240)]:
+        return rgb_image.crop([5, 5, width, y])
+    else:
+        return rgb_image.crop([5, 5, width, y + 8])
+
+
+def stack_images(frames: list[Image.Image]) -> Image.Image:
+    """Paste frames top to bottom onto one white RGB canvas."""
+    if len(frames) == 1:
+        img = frames[0]
+        return img if img.mode == "RGB" else img.convert("RGB")
+    width = max(frame.size[0] for frame in frames)
+    height = sum(frame.size[1] for frame in frames)
+    canvas = Image.new("RGB", (width, height), (255, 255, 255))
+    y = 0
+    for frame in frames:
+        canvas.paste(frame, (0, y))
+        y += frame.size[1]
+    return canvas
+
+
+def encode_png(img: Image.Image) -> dict:
+    """The one PNG encode of a render, with the time it took."""
+    start = time.perf_counter()
+    if _colors > 0:
+        # tables and charts are mostly flat colors, a palette loses little
+        img = img.quantize(
+            _colors, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE
+        )
+    buf = io.BytesIO()
+    img.save(buf, "PNG", compress_level=_compress_level)
+    return {"png": buf.getvalue(), "encode_seconds": time.perf_counter() - start}
@@ -0,0 +1,34 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key. The first caller's work runs
+    as a task and anyone asking for that key before it finishes awaits the
+    same task, getting the same result (or exception). Nothing is kept once
+    the task is done, so the next call after that runs the work again.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, asyncio.Task] = {}
+        # calls answered by another caller's work
+        self.shared = 0
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is not None:
+            self.shared += 1
+        else:
+            call = asyncio.create_task(func())
+            self._calls[key] = call
+            call.add_done_callback(lambda task: self.__finish(key, task))
+        # a caller giving up (e.g. cancelled) doesn't cancel it for the rest
+        return await asyncio.shield(call)
+
+    def __finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # mark the exception retrieved even if every caller went away
+            task.exception()
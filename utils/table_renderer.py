@@ -0,0 +1,142 @@
+import re
+from PIL import Image, ImageDraw, ImageFont
+
+# emoji that show up in table headers/cells (🟩 🟨 ⬜ 🧩 🚫 🍪 🟡 ...)
+EMOJI_PATTERN = re.compile(
+    "("
+    "[\U0001f000-\U0001faff\u2600-\u27bf\u2b00-\u2bff]"
+    "[\ufe0f\u200d\U0001f000-\U0001faff]*"
+    ")"
+)
+
+
+class PillowTableRenderer:
+    """
+    Draws a DataFrame as a simple grid table with Pillow, as a browser-free
+    alternative to the Bokeh DataTable screenshot.
+    """
+
+    # color emoji fonts (e.g. Noto Color Emoji) only ship bitmaps at this size
+    EMOJI_NATIVE_SIZE: int = 109
+
+    BACKGROUND = (255, 255, 255)
+    HEADER_BACKGROUND = (240, 240, 240)
+    GRID_COLOR = (220, 220, 220)
+    TEXT_COLOR = (33, 33, 33)
+
+    def __init__(
+        self, font_path: str, emoji_font_path: str, font_size: int = 16
+    ) -> None:
+        self._font_size = font_size
+        self._font = self.__load_font(font_path, font_size)
+        self._emoji_font = self.__load_emoji_font(emoji_font_path)
+        self._emoji_cache: dict[str, Image.Image] = {}
+
+        ascent, descent = self._font.getmetrics()
+        self._line_height = max(ascent + descent, font_size + 4)
+        self._pad_x = font_size // 2 + 2
+        self._pad_y = font_size // 3 + 2
+
+    def render(self, df) -> Image.Image:
+        header = [str(column) for column in df.columns.values]
+        rows = [[str(value) for value in row] for row in df.itertuples(index=False)]
+
+        col_widths = [
+            max(self.__text_width(cell) for cell in column) + 2 * self._pad_x
+            for column in zip(header, *rows)
+        ]
+        row_height = self._line_height + 2 * self._pad_y
+        width = sum(col_widths) + 1
+        height = row_height * (len(rows) + 1) + 1
+
+        image = Image.new("RGB", (width, height), self.BACKGROUND)
+        draw = ImageDraw.Draw(image)
+        draw.rectangle([0, 0, width - 1, row_height], fill=self.HEADER_BACKGROUND)
+
+        for r, cells in enumerate([header] + rows):
+            top = r * row_height
+            x = 0
+            for c, cell in enumerate(cells):
+                self.__draw_cell(
+                    image, draw, cell, x + self._pad_x, top + row_height // 2
+                )
+                x += col_widths[c]
+            draw.line([(0, top), (width - 1, top)], fill=self.GRID_COLOR)
+        draw.line([(0, height - 1), (width - 1, height - 1)], fill=self.GRID_COLOR)
+
+        x = 0
+        for col_width in col_widths:
+            draw.line([(x, 0), (x, height - 1)], fill=self.GRID_COLOR)
+            x += col_width
+        draw.line([(width - 1, 0), (width - 1, height - 1)], fill=self.GRID_COLOR)
+
+        return image
+
+    ####################
+    #  HELPER METHODS  #
+    ####################
+
+    def __draw_cell(
+        self,
+        image: Image.Image,
+        draw: ImageDraw.ImageDraw,
+        text: str,
+        x: int,
+        y_mid: int,
+    ) -> None:
+        for segment in self.__split_emoji(text):
+            if EMOJI_PATTERN.fullmatch(segment) and self._emoji_font is not None:
+                glyph = self.__get_emoji(segment)
+                image.paste(glyph, (int(x), y_mid - glyph.size[1] // 2), glyph)
+                x += glyph.size[0]
+            else:
+                draw.text(
+                    (x, y_mid),
+                    segment,
+                    font=self._font,
+                    fill=self.TEXT_COLOR,
+                    anchor="lm",
+                )
+                x += self._font.getlength(segment)
+
+    def __text_width(self, text: str) -> int:
+        width = 0.0
+        for segment in self.__split_emoji(text):
+            if EMOJI_PATTERN.fullmatch(segment) and self._emoji_font is not None:
+                width += self.__get_emoji(segment).size[0]
+            else:
+                width += self._font.getlength(segment)
+        return int(round(width))
+
+    def __split_emoji(self, text: str) -> list[str]:
+        return [segment for segment in EMOJI_PATTERN.split(text) if segment]
+
+    def __get_emoji(self, emoji: str) -> Image.Image:
+        if emoji not in self._emoji_cache:
+            size = self.EMOJI_NATIVE_SIZE
+            canvas = Image.new("RGBA", (size * 2, size * 2), (0, 0, 0, 0))
+            ImageDraw.Draw(canvas).text(
+                (0, 0), emoji, font=self._emoji_font, embedded_color=True
+            )
+            bbox = canvas.getbbox() or (0, 0, size, size)
+            glyph = canvas.crop(bbox)
+            target = self._font_size + 2
+            scale = target / float(glyph.size[1])
+            self._emoji_cache[emoji] = glyph.resize(
+                (max(1, int(glyph.size[0] * scale)), target), Image.LANCZOS
+            )
+        return self._emoji_cache[emoji]
+
+    def __load_font(self, path: str, size: int) -> ImageFont.FreeTypeFont:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            print(f"Font not found at {path}, falling back to the default font.")
+            return ImageFont.load_default(size)
+
+    def __load_emoji_font(self, path: str) -> ImageFont.FreeTypeFont | None:
+        try:
+            return ImageFont.truetype(path, self.EMOJI_NATIVE_SIZE)
+        except OSError:
+            print(f"Emoji font not found at {path}, emoji will be drawn as text.")
+            return None